@@ -1,94 +1,298 @@
+import json
+from functools import partial
 import os
 from logger_config import setup_logger
 from memory import Memory
-from perception import format_tool_response
-from typing import Dict, Any, Optional
+from perception import format_tool_response, apply_param_aliases, tool_result_from_value
+from results import CALCULATION, POWERPOINT
+from retry import TOOL_RETRY, retry_async
+from agent_config import IDEMPOTENT_TOOLS, PURE_TOOLS
+from tool_cache import ToolCallCache, get_tool_cache
+from circuit_breaker import ToolGuard, get_tool_guard
+from shared_arrays import SHARED_ARRAY_PARAM, SharedArrayPool, get_shared_array_pool, is_descriptor
+from typing import Callable, Dict, Any, Optional
 import time
 
 # Setup logger
 logger = setup_logger('action', 'action.log')
 
+def _to_str(value: Any) -> str:
+    return value if type(value) is str else str(value)
+
+def _parse_array_string(value: str) -> list:
+    """Array parameters sometimes arrive as text: "[1, 2, 3]", "[[1, 2], [3]]" or "1, 2, 3"""
+    value = value.strip()
+    if value.startswith('['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            value = value[1:-1] if value.endswith(']') else value[1:]
+    return [item.strip() for item in value.split(',')] if value else []
+
+# Element conversions for scalar schema types
+_SCALAR_COERCERS = {
+    'integer': int,
+    'number': float,
+    'string': _to_str,
+}
+
+def compile_coercer(schema: dict) -> Callable[[Any], Any]:
+    """Build a function converting a value to the type described by a JSON schema, once per schema"""
+    if 'anyOf' in schema:
+        # Optional[...] and similar: use the first non-null alternative
+        options = [option for option in schema['anyOf'] if option.get('type') != 'null']
+        inner = compile_coercer(options[0]) if options else _to_str
+        return lambda value: None if value is None else inner(value)
+
+    schema_type = schema.get('type', 'string')
+    if schema_type == 'array':
+        items = schema.get('items') or {}
+        if items.get('type') == 'integer':
+            item = int  # the common case: map the builtin directly
+        elif 'anyOf' not in items and items.get('type') in (None, 'object'):
+            item = None  # objects (e.g. slide operations) and untyped items are passed through
+        else:
+            item = compile_coercer(items)
+
+        def coerce_array(value):
+            if isinstance(value, str):
+                value = _parse_array_string(value)
+            elif not isinstance(value, (list, tuple)):
+                raise ValueError(f"Invalid array format: {type(value).__name__}")
+            return list(value) if item is None else list(map(item, value))
+        return coerce_array
+
+    if schema_type in ('boolean', 'object'):
+        return lambda value: value
+    return _SCALAR_COERCERS.get(schema_type, _to_str)
+
+class CompiledTool:
+    """A tool with its parameter coercers prepared from the input schema"""
+
+    __slots__ = ('tool', 'name', 'params', 'required', 'shared_arrays')
+
+    def __init__(self, tool):
+        schema = tool.inputSchema or {}
+        self.tool = tool
+        self.name = tool.name
+        self.params = tuple(
+            (param_name, compile_coercer(param_info))
+            for param_name, param_info in schema.get('properties', {}).items()
+        )
+        self.required = frozenset(schema.get('required', ()))
+        # Tools with a shared_array parameter also take a descriptor (e.g. file_chars_to_int "codes") for a list
+        self.shared_arrays = SHARED_ARRAY_PARAM in schema.get('properties', {})
+
+    def coerce(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Arguments for a call, converted to the schema types"""
+        params = apply_param_aliases(self.name, params)
+        arguments = {}
+        for param_name, coerce in self.params:
+            value = params.get(param_name)
+            if value is None:
+                if param_name in self.required:
+                    raise ValueError(f"Required parameter {param_name} not provided for {self.name}")
+                continue
+            if self.shared_arrays and is_descriptor(value) and param_name != SHARED_ARRAY_PARAM:
+                arguments[param_name] = []
+                arguments[SHARED_ARRAY_PARAM] = value
+                continue
+            try:
+                arguments[param_name] = coerce(value)
+            except (ValueError, TypeError) as e:
+                shown = value if len(str(value)) <= 100 else f"{str(value)[:100]}..."
+                raise ValueError(f"Failed to convert parameter {param_name}={shown}: {e}")
+        return arguments
+
+# Operations accepted by the apply_slide_operations batch tool
+SLIDE_OPERATIONS = ("open_powerpoint", "draw_rectangle", "add_text_in_powerpoint", "close_powerpoint")
+
+class SlideTransaction:
+    """
+    Slide operations buffered on the agent and committed to the server as one apply_slide_operations
+    call. The server applies them all or none; leaving an `async with` block with an exception
+    discards the buffer without calling the server.
+    """
+
+    def __init__(self, action: "Action"):
+        self.action = action
+        self.operations = []
+        self.result = None
+        self.committed = False
+
+    def add(self, operation: str, params: Dict[str, Any] = None) -> "SlideTransaction":
+        if operation not in SLIDE_OPERATIONS:
+            raise ValueError(f"Unknown slide operation: {operation}")
+        self.operations.append({"operation": operation, "params": dict(params or {})})
+        return self
+
+    def open(self) -> "SlideTransaction":
+        return self.add("open_powerpoint")
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> "SlideTransaction":
+        return self.add("draw_rectangle", {"x1": x1, "y1": y1, "x2": x2, "y2": y2})
+
+    def add_text(self, text: str) -> "SlideTransaction":
+        return self.add("add_text_in_powerpoint", {"text": text})
+
+    def close(self) -> "SlideTransaction":
+        return self.add("close_powerpoint")
+
+    def rollback(self):
+        """Discard the buffered operations"""
+        self.operations = []
+
+    async def commit(self):
+        """Send the buffered operations as one batch; returns the tool result"""
+        operations, self.operations = self.operations, []
+        self.result = await self.action.commit_slide_operations(operations)
+        self.committed = self.result is not None
+        return self.result
+
+    async def __aenter__(self) -> "SlideTransaction":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+        else:
+            self.rollback()
+        return False
+
 class Action:
-    def __init__(self, session):
+    def __init__(self, session, memory: Memory, tool_cache: ToolCallCache = None, guard: ToolGuard = None,
+                 shared_arrays: SharedArrayPool = None):
         self.session = session
-        self.memory = Memory()
+        self.memory = memory
+        self.tool_cache = tool_cache if tool_cache is not None else get_tool_cache()
+        self.guard = guard if guard is not None else get_tool_guard()
+        self.shared_arrays = shared_arrays if shared_arrays is not None else get_shared_array_pool()
         self.tools = []
+        self._compiled = {}
         
     def set_tools(self, tools):
-        """Set available tools after session initialization"""
+        """Set available tools after session initialization and compile their argument coercers"""
         self.tools = tools
-        logger.info(f"Tools set: {[tool.name for tool in tools]}")
+        self._compiled = {tool.name: CompiledTool(tool) for tool in tools}
+        logger.info("Tools set: %s", [tool.name for tool in tools])
+        for compiled in self._compiled.values():
+            logger.debug("Tool %s schema: %s", compiled.name, compiled.tool.inputSchema)
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any] = None):
+        """Call a tool through the shared tool call cache"""
+        return await self.tool_cache.call(name, arguments, self._send_tool_call)
+
+    async def _send_tool_call(self, name: str, arguments: Dict[str, Any] = None):
+        """
+        Call a tool on the session, retrying transient failures for idempotent tools. Large array
+        arguments are sent as shared memory descriptors when enabled, and freed after the last attempt.
+        """
+        retry = partial(retry_async, TOOL_RETRY) if name in IDEMPOTENT_TOOLS else None
+        with self.shared_arrays.share_arguments(name, arguments) as arguments:
+            # Attempts within the tool's deadline; the breaker records one outcome for all of them
+            return await self.guard.call(name, self.session.call_tool, name, arguments=arguments, retry=retry)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Circuit breaker, tool call cache and shared array counters"""
+        return {
+            "breakers": self.guard.metrics(),
+            "cache": dict(self.tool_cache.stats),
+            "shared_arrays": dict(self.shared_arrays.stats),
+        }
+
+    def prepare_arguments(self, func_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert the parameters of a call to the types in the tool's input schema"""
+        compiled = self._compiled.get(func_name)
+        if compiled is None:
+            logger.error("Unknown tool: %s", func_name)
+            raise ValueError(f"Unknown tool: {func_name}")
+        return compiled.coerce(params)
+
+    def powerpoint_transaction(self) -> SlideTransaction:
+        """Start buffering slide operations, e.g. `async with action.powerpoint_transaction() as tx:`"""
+        return SlideTransaction(self)
+
+    async def commit_slide_operations(self, operations) -> Optional[Any]:
+        """
+        Apply slide operations on the server as one atomic batch and record the outcome.
+        Returns the tool result, or None if the batch failed and nothing was changed.
+        """
+        if not operations:
+            return None
+        operations = [dict(op, params=dict(op.get("params") or {})) for op in operations]
+        for op in operations:
+            # As for single operations, the final result text carries the calculated value
+            if op["operation"] == "add_text_in_powerpoint" and "Final Result:" in op["params"].get("text", ""):
+                calc_result = self.memory.get_last_calculation_result()
+                if calc_result:
+                    op["params"]["text"] = f"Final Result:\n{calc_result}"
+
+        names = [op["operation"] for op in operations]
+        logger.info("[Calling Tool] Committing %s slide operations: %s", len(operations), names)
+        arguments = {"operations": operations}
+        try:
+            result = await self._call_tool("apply_slide_operations", arguments=arguments)
+        except Exception as e:
+            logger.error("Error committing slide operations: %s", e)
+            self.memory.add_memory('iteration_response', f"Error in PowerPoint operations, nothing was changed: {str(e)}")
+            return None
+
+        response_str, value = format_tool_response(result, self.memory.current_iteration,
+                                                   "apply_slide_operations", {"operations": names})
+        metadata = {'tool': 'apply_slide_operations', 'arguments': arguments, 'result': value}
+        # The batch tool raises on failure, so the result is flagged rather than worded as an error
+        failed = getattr(result, 'isError', False)
+        if not failed:
+            iteration = self.memory.current_iteration
+            for op in operations:
+                self.memory.results.record(op["operation"], op["params"], value, iteration,
+                                           self.memory.run_id, POWERPOINT)
+            self.memory.results.record('apply_slide_operations', arguments, value, iteration,
+                                       self.memory.run_id, POWERPOINT)
+            metadata['kind'] = POWERPOINT
+            # PowerPoint stays open unless the batch ends by closing it
+            opened = [name for name in names if name in ("open_powerpoint", "close_powerpoint")]
+            if opened:
+                self.memory.set_powerpoint_state(opened[-1] == "open_powerpoint")
+            elif not self.memory.is_powerpoint_open:
+                self.memory.set_powerpoint_state(True)
+        self.memory.add_memory('tool_result', value)
+        self.memory.add_memory('iteration_response', response_str, metadata)
+        return None if failed else result
 
     async def execute_function_call(self, func_name: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Execute a function call with given parameters"""
-        logger.info(f"[Calling Tool] Function name: {func_name}")
-        logger.info(f"[Calling Tool] Parameters: {params}")
+        logger.debug("[Calling Tool] Function name: %s", func_name)
+        logger.debug("[Calling Tool] Parameters: %s", params)  # formatted only when enabled
         
         try:
-            # Find the matching tool to get its input schema
-            tool = next((t for t in self.tools if t.name == func_name), None)
-            if not tool:
-                logger.error(f"Unknown tool: {func_name}")
-                raise ValueError(f"Unknown tool: {func_name}")
-
-            logger.info(f"[Calling Tool] Found tool: {tool.name}")
-            logger.info(f"[Calling Tool] Tool schema: {tool.inputSchema}")
-
-            # Prepare arguments according to the tool's input schema
-            arguments = {}
-            schema_properties = tool.inputSchema.get('properties', {})
-            logger.debug(f"[Calling Tool] Schema properties: {schema_properties}")
-
-            for param_name, param_info in schema_properties.items():
-                # Use the correct parameter name from the tool's schema
-                param_value = params.get(param_name, params.get('numbers')) if func_name == 'int_list_to_exponential_sum' else params.get(param_name)
-                
-                if param_value is None:  # Check if parameter is provided
-                    if param_name in tool.inputSchema.get('required', []):
-                        raise ValueError(f"Required parameter {param_name} not provided for {func_name}")
-                    continue
-                    
-                param_type = param_info.get('type', 'string')
-                
-                logger.debug(f"[Calling Tool] Converting parameter {param_name} with value {param_value} to type {param_type}")
-                
-                # Convert the value to the correct type based on the schema
-                if param_type == 'integer':
-                    arguments[param_name] = int(param_value)
-                elif param_type == 'number':
-                    arguments[param_name] = float(param_value)
-                elif param_type == 'array':
-                    logger.debug(f"Processing array parameter {param_name} with value {param_value}")
-                    try:
-                        # Handle result from strings_to_chars_to_int function
-                        if isinstance(param_value, (list, tuple)):
-                            arguments[param_name] = [int(x) for x in param_value]
-                        elif isinstance(param_value, str):
-                            # Handle string representation of array
-                            if param_value.startswith('[') and param_value.endswith(']'):
-                                array_str = param_value.strip('[]')
-                                arguments[param_name] = [int(x.strip()) for x in array_str.split(',')] if array_str else []
-                            else:
-                                # Handle comma-separated string without brackets
-                                arguments[param_name] = [int(x.strip()) for x in param_value.split(',')] if ',' in param_value else [int(param_value)]
-                        else:
-                            logger.error(f"Invalid type for array parameter {param_name}: {type(param_value)}")
-                            raise ValueError(f"Invalid array format for parameter {param_name}")
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Error converting value to array: {str(e)}")
-                        raise ValueError(f"Failed to convert {param_value} to integer array: {str(e)}")
-                else:
-                    arguments[param_name] = str(param_value)
+            # Earlier results shown abridged in the prompt are passed by handle ("ref:<iteration>:<seq>")
+            arguments = self.prepare_arguments(func_name, self.memory.resolve_references(params))
+            logger.debug("[Calling Tool] Final arguments: %s", arguments)
 
-            logger.info(f"[Calling Tool] Final arguments: {arguments}")
-            logger.info(f"[Calling Tool] Calling tool {func_name}")
+            # Reuse an identical earlier call from this session instead of calling the tool again.
+            # Only pure tools: a tool reading a file can return something else after the file changed.
+            if func_name in PURE_TOOLS:
+                cached = self.memory.results.lookup(func_name, arguments)
+                if cached is not None:
+                    logger.info("[Calling Tool] Reusing result of %s from iteration %s", func_name, cached.iteration + 1)
+                    self.memory.reuse_result(cached)
+                    return tool_result_from_value(cached.value)
+
+            logger.info("[Calling Tool] Calling tool %s", func_name)
             
-            result = await self.session.call_tool(func_name, arguments=arguments)
-            logger.info(f"[Calling Tool] Raw result: {result}")
+            result = await self._call_tool(func_name, arguments=arguments)
             
-            response_str, iteration_result = format_tool_response(result, self.memory.current_iteration, func_name, arguments)
-            self.memory.add_memory('tool_result', iteration_result)
-            self.memory.add_memory('iteration_response', response_str)
+            response_str, value = format_tool_response(result, self.memory.current_iteration, func_name, arguments)
+            logger.info("[Calling Tool] Result: %s", response_str)
+            # The parsed value is shared by the memory item, its metadata and the result registry
+            metadata = {'tool': func_name, 'arguments': arguments, 'result': value}
+            if not getattr(result, 'isError', False):
+                self.memory.results.record(func_name, arguments, value, self.memory.current_iteration,
+                                           self.memory.run_id, CALCULATION)
+                metadata['kind'] = CALCULATION
+            self.memory.add_memory('tool_result', value)
+            self.memory.add_memory('iteration_response', response_str, metadata)
             
             return result
 
@@ -101,13 +305,19 @@ class Action:
 
     async def execute_powerpoint_operation(self, operation: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Execute a PowerPoint operation with given parameters"""
-        logger.info(f"[Calling Tool] PowerPoint operation: {operation}")
-        logger.info(f"[Calling Tool] PowerPoint parameters: {params}")
+        logger.info("[Calling Tool] PowerPoint operation: %s", operation)
+        logger.debug("[Calling Tool] PowerPoint parameters: %s", params)
         
         try:
+            if operation == "apply_slide_operations":
+                async with self.powerpoint_transaction() as transaction:
+                    for op in params.get("operations") or []:
+                        transaction.add(op.get("operation"), op.get("params"))
+                return transaction.result
+
             if operation == "open_powerpoint":
                 if not self.memory.is_powerpoint_open:
-                    result = await self.session.call_tool("open_powerpoint")
+                    result = await self._call_tool("open_powerpoint")
                     self.memory.set_powerpoint_state(True)
                 else:
                     self.memory.add_memory('iteration_response', "PowerPoint is already open")
@@ -116,7 +326,7 @@ class Action:
             elif operation == "draw_rectangle":
                 if self.memory.is_powerpoint_open:
                     try:
-                        result = await self.session.call_tool(
+                        result = await self._call_tool(
                             "draw_rectangle",
                             arguments=params
                         )
@@ -138,7 +348,7 @@ class Action:
                         if calc_result:
                             text = f"Final Result:\n{calc_result}"
                     
-                    result = await self.session.call_tool(
+                    result = await self._call_tool(
                         "add_text_in_powerpoint",
                         arguments={"text": text}
                     )
@@ -148,7 +358,7 @@ class Action:
                     
             elif operation == "close_powerpoint":
                 if self.memory.is_powerpoint_open:
-                    result = await self.session.call_tool("close_powerpoint")
+                    result = await self._call_tool("close_powerpoint")
                     self.memory.set_powerpoint_state(False)
                 else:
                     self.memory.add_memory('iteration_response', "PowerPoint is not open")
@@ -157,9 +367,16 @@ class Action:
                 self.memory.add_memory('iteration_response', f"Unknown PowerPoint operation: {operation}")
                 return None
             
-            response_str, iteration_result = format_tool_response(result, self.memory.current_iteration)
-            self.memory.add_memory('tool_result', iteration_result)
-            self.memory.add_memory('iteration_response', response_str)
+            response_str, value = format_tool_response(result, self.memory.current_iteration, operation)
+            metadata = {'tool': operation, 'arguments': params, 'result': value}
+            # The PowerPoint tools report failures as text rather than as tool errors
+            failed = getattr(result, 'isError', False) or "Error" in str(value)
+            if not failed:
+                self.memory.results.record(operation, params, value, self.memory.current_iteration,
+                                           self.memory.run_id, POWERPOINT)
+                metadata['kind'] = POWERPOINT
+            self.memory.add_memory('tool_result', value)
+            self.memory.add_memory('iteration_response', response_str, metadata)
             
             return result
             
@@ -1,28 +1,35 @@
+import argparse
+import json
 import os
 import sys
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
+from mcp import types
 import asyncio
 from google import genai
 from concurrent.futures import TimeoutError
 from functools import partial
 from logger_config import setup_logger
 from perception import (
-    clean_llm_response, parse_and_validate_response, format_tool_response
+    clean_llm_response, parse_and_validate_response, format_tool_response, action_validator
 )
-from memory import Memory
+from memory import Memory, memory_registry
+from memory_log import get_memory_log
+from retrieval import get_retrieval_index
 from decision import DecisionMaker
 from action import Action
-from prompt_config import MATH_AGENT_SYSTEM_PROMPT
+from capability_snapshot import build_system_prompt, load_snapshot, save_snapshot
+from agent_config import MCP_TRANSPORT, MCP_SHARDS, MEMORY_IDLE_TIMEOUT
+from transport import open_session
+from router import open_router
+from retry import LLM_RETRY, SESSION_RETRY, retry_async
+from tool_cache import get_tool_cache
+from circuit_breaker import get_tool_guard
+from speculation import Speculator
+from profiling import get_profiler
 
 # Setup logger
 logger = setup_logger('ai_agent', 'ai_agent.log')
 
-# Initialize global memory and decision maker
-memory = Memory()
-decision_maker = DecisionMaker()
-
 # Load environment variables from .env file
 logger.info('Loading environment variables')
 load_dotenv()
@@ -38,194 +45,247 @@ client = genai.Client(api_key=api_key)
 
 max_iterations = 10
 
+DEFAULT_QUERY = """Find the ASCII values of characters in HIMANSHU and then return sum of exponentials of those values. 
+                    Also, create a PowerPoint presentation showing the Final Answer inside a rectangle box."""
+
 async def generate_with_timeout(client, prompt, timeout=10):
     """Generate content with a timeout"""
     logger.info('Starting LLM generation')
-    logger.debug(f'Prompt length: {len(prompt)}')
-    logger.info(f'Prompt request: {prompt}')
+    logger.info('Prompt length: %s', len(prompt))
+    logger.debug('Prompt request: %s', prompt)
     try:
         # Convert the synchronous generate_content call to run in a thread
         loop = asyncio.get_event_loop()
+        # Profiled in the executor thread, where the request actually runs
+        generate = get_profiler().wrap("agent:llm", lambda: client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=prompt
+        ))
         response = await asyncio.wait_for(
-            loop.run_in_executor(
-                None, 
-                lambda: client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=prompt
-                )
-            ),
+            loop.run_in_executor(None, generate),
             timeout=timeout
         )
         logger.info('LLM generation completed successfully')
-        logger.info(f'Prompt response: {response.text}')
+        logger.debug('Prompt response: %s', response.text)
         return response
     except TimeoutError:
-        logger.error(f'LLM generation timed out after {timeout} seconds')
+        logger.error('LLM generation timed out after %s seconds', timeout)
         raise
     except Exception as e:
-        logger.error(f'Error in LLM generation: {str(e)}')
+        logger.error('Error in LLM generation: %s', e)
         raise
 
-def reset_state():
-    """Reset all state using memory layer"""
-    logger.debug('Resetting global state')
+async def execute_action(action: Action, response_json):
+    """Execute a validated function call or PowerPoint operation"""
+    if response_json.type == 'function_call':
+        await action.execute_function_call(response_json.function, response_json.params)
+    elif response_json.type == 'powerpoint':
+        await action.execute_powerpoint_operation(response_json.operation, response_json.params)
+
+def reset_state(memory: Memory, decision_maker: DecisionMaker):
+    """Reset all session state using memory layer"""
+    logger.debug('Resetting state of session %s', memory.session_id)
     memory.reset()
     decision_maker.reset()
-    logger.info('Global state reset completed')
+    logger.info('State reset completed for session %s', memory.session_id)
+
+def print_final_results(memory: Memory, decision_maker: DecisionMaker = None, speculator: Speculator = None):
+    """Print the iteration history of a run, LLM calls, prompt tokens saved by compaction and tool call metrics"""
+    print("\nFinal Results:")
+    for resp in memory.get_recent_memories(type='iteration_response'):
+        print(resp.content)
+
+    if decision_maker is not None:
+        planned = decision_maker.stats["planned"]
+        print(f"\nLLM calls: {decision_maker.stats['llm_calls']}, steps planned without the LLM: {planned}")
+        logger.info("Planner stats: %s", decision_maker.stats)
+
+    if speculator is not None and speculator.stats["started"]:
+        spec_stats = speculator.stats
+        print(f"Speculative tool calls: {spec_stats['started']}, hit rate {speculator.hit_rate:.0%}, "
+              f"{spec_stats['time_saved']:.2f}s of tool time overlapped with the LLM")
+        logger.info("Speculation stats: %s", spec_stats)
+
+    stats = memory.context.stats
+    print(f"\nPrompt context: {stats['context_tokens']} tokens sent over {stats['prompts']} prompts, "
+          f"{memory.context.tokens_saved} tokens saved by compaction")
+    logger.info("Context compaction stats: %s, saved %s tokens", stats, memory.context.tokens_saved)
+
+    cache_stats = get_tool_cache().stats
+    print(f"Tool calls: {cache_stats['calls']}, served from cache: {cache_stats['hits']}, "
+          f"joined in-flight: {cache_stats['coalesced']}")
+    logger.info("Tool call cache stats: %s", cache_stats)
+
+    breaker_metrics = get_tool_guard().metrics()
+    for tool, metrics in breaker_metrics.items():
+        if metrics['failures'] or metrics['rejected']:
+            print(f"Tool {tool}: circuit {metrics['state']}, {metrics['failures']} failure(s), "
+                  f"{metrics['timeouts']} timeout(s), {metrics['rejected']} call(s) rejected")
+    logger.info("Tool breaker metrics: %s", breaker_metrics)
+
+async def main(query: str = DEFAULT_QUERY, session_id: str = None, resume_run_id: str = None):
+    # Each query runs against its own session memory, so several can run concurrently.
+    # Sessions created here end with the query; named sessions stay until they go idle.
+    memory_log = get_memory_log()
+    retrieval_index = get_retrieval_index(memory_log)
+    memory_registry.schedule_eviction(MEMORY_IDLE_TIMEOUT)
+    if session_id:
+        memory = memory_registry.get_or_create(session_id, log=memory_log, index=retrieval_index)
+    else:
+        memory = memory_registry.create(log=memory_log, index=retrieval_index)
+    try:
+        await run_session(memory, query, resume_run_id)
+    finally:
+        if not session_id:
+            memory_registry.remove(memory.session_id)
 
-async def main():
+async def run_session(memory: Memory, query: str, resume_run_id: str = None):
     max_retries = 3
     retry_count = 0
+
+    decision_maker = DecisionMaker(memory, query)
+    speculator = Speculator()
+    profiler = get_profiler()
+
+    reset_state(memory, decision_maker)  # Reset once; reconnects resume from the last good iteration
+    if resume_run_id and memory.restore_from_log(resume_run_id):
+        print(f"Resuming run {resume_run_id} at iteration {memory.current_iteration + 1}")
+    elif memory.log:
+        print(f"Run id: {memory.run_id} (resume with: python agent.py --resume {memory.run_id})")
+    memory.checkpoint()
+    decision_maker.checkpoint()
     
     while retry_count < max_retries:
         try:
-            reset_state()  # Reset at the start of main
+            if retry_count:
+                memory.rollback_to_checkpoint()
+                decision_maker.rollback_to_checkpoint()
+                logger.info("Resuming from iteration %s", memory.current_iteration + 1)
             logger.info("Starting main execution")
             
-            # Create a single MCP server connection
-            logger.info("Establishing connection to MCP server")
-            server_params = StdioServerParameters(
-                command="python",
-                args=["mcp-server.py", "dev"]
-            )
-
-            async with stdio_client(server_params) as (read, write):
-                logger.info("Connection established, creating session")
-                async with ClientSession(read, write) as session:
-                    logger.info("Session created, initializing")
-                    try:
-                        await session.initialize()
-                        logger.info("Session initialized successfully")
-                    except Exception as e:
-                        logger.error(f"Failed to initialize session: {str(e)}")
-                        continue
-                    
-                    # Get available tools
+            # One MCP server connection, or a router over sharded server processes
+            if MCP_SHARDS:
+                logger.info("Starting sharded MCP servers: %s", MCP_SHARDS)
+                session_context = open_router()
+            else:
+                logger.info("Establishing connection to MCP server via %s transport", MCP_TRANSPORT)
+                session_context = open_session()
+            async with session_context as session:
+                logger.info("Session created, initializing")
+                init_result = await retry_async(SESSION_RETRY, session.initialize, name="session_init")
+                logger.info("Session initialized successfully")
+
+                # Reuse the tools and system prompt of an earlier start if the server is unchanged
+                snapshot = load_snapshot(init_result.serverInfo)
+                if snapshot is not None:
+                    tools, system_prompt = snapshot.tools, snapshot.system_prompt
+                    print(f"Using capability snapshot: {len(tools)} tools")
+                else:
                     logger.info("Requesting tool list")
-                    try:
-                        tools_result = await session.list_tools()
-                        tools = tools_result.tools
-                        logger.info(f"Successfully retrieved {len(tools)} tools")
-                        logger.debug(f"Available tools: {[tool.name for tool in tools]}")
-                    except Exception as e:
-                        logger.error(f"Failed to get tool list: {str(e)}")
-                        continue
+                    tools_result = await retry_async(SESSION_RETRY, session.list_tools, name="list_tools")
+                    tools = tools_result.tools
+                    logger.info("Successfully retrieved %s tools", len(tools))
+                    system_prompt = build_system_prompt(tools)
+                    save_snapshot(init_result.serverInfo, tools, system_prompt)
+                    print(f"System prompt created with {len(tools)} tools")
+                logger.debug("Available tools: %s", [tool.name for tool in tools])
+                logger.debug("System prompt: %s", system_prompt)
 
-                    # Initialize action layer with session and tools
-                    action = Action(session)
-                    action.set_tools(tools)
-                    
-                    # Create system prompt with available tools
-                    print("Creating system prompt...")
-                    print(f"Number of tools: {len(tools)}")
-                    
-                    try:
-                        tools_description = []
-                        for i, tool in enumerate(tools):
-                            try:
-                                params = tool.inputSchema
-                                desc = getattr(tool, 'description', 'No description available')
-                                name = getattr(tool, 'name', f'tool_{i}')
-                                
-                                if 'properties' in params:
-                                    param_details = []
-                                    for param_name, param_info in params['properties'].items():
-                                        param_type = param_info.get('type', 'unknown')
-                                        param_details.append(f"{param_name}: {param_type}")
-                                    params_str = ', '.join(param_details)
-                                else:
-                                    params_str = 'no parameters'
-
-                                tool_desc = f"{i+1}. {name}({params_str}) - {desc}"
-                                tools_description.append(tool_desc)
-                                print(f"Added description for tool: {tool_desc}")
-                            except Exception as e:
-                                print(f"Error processing tool {i}: {e}")
-                                tools_description.append(f"{i+1}. Error processing tool")
-                        
-                        tools_description = "\n".join(tools_description)
-                        print("Successfully created tools description")
-                    except Exception as e:
-                        print(f"Error creating tools description: {e}")
-                        tools_description = "Error loading tools"
-                    
-                    print("Creating system prompt...")
-                    system_prompt = MATH_AGENT_SYSTEM_PROMPT + """\nAvailable Tools: """ + tools_description
-                    print("System prompt created\n", system_prompt)
+                # Initialize action layer with session and tools
+                action = Action(session, memory)
+                action.set_tools(tools)
+                action_validator.set_tools(tools)
 
-                    query = """Find the ASCII values of characters in HIMANSHU and then return sum of exponentials of those values. 
-                    Also, create a PowerPoint presentation showing the Final Answer inside a rectangle box."""
-                    print("Starting iteration loop...")
+                print("Starting iteration loop...")
                     
-                    while memory.current_iteration < max_iterations:
-                        print(f"\n--- Iteration {memory.current_iteration + 1} ---")
+                while memory.current_iteration < max_iterations:
+                    print(f"\n--- Iteration {memory.current_iteration + 1} ---")
                         
-                        # Get next action from decision maker
-                        current_state = {
-                            "iteration": memory.current_iteration,
-                            "powerpoint_open": memory.is_powerpoint_open,
-                            "last_response": memory.last_response
-                        }
+                    # Get next action from decision maker
+                    current_state = {
+                        "iteration": memory.current_iteration,
+                        "powerpoint_open": memory.is_powerpoint_open,
+                        "last_response": memory.last_response
+                    }
                         
+                    with profiler.capture("agent:decision"):
                         next_action = await decision_maker.decide_next_action(current_state)
-                        if not next_action or not decision_maker.validate_decision(next_action):
-                            logger.error("Invalid or no decision returned")
-                            break
-
-                        # If we have a final answer, we're done
-                        if next_action["type"] == "final_answer":
-                            value = next_action["value"]
-                            memory.add_memory('iteration_response', f"Final answer: {value}")
-                            print("\nFinal Results:")
-                            for resp in memory.get_recent_memories(type='iteration_response'):
-                                print(resp.content)
-                            return
-
-                        # Get context from memory for the prompt
-                        context = memory.get_context_for_prompt()
-                        current_query = query if not context else f"{query}\n\n{context}"
-
-                        # Prepare prompt with current phase information
-                        phase_context = ""
-                        if "phase" in next_action:
-                            phase_context = f"\nCurrent phase: {next_action['phase']}"
-                            if "status" in next_action:
-                                phase_context += f"\nStatus: {next_action['status']}"
-                        prompt = f"{system_prompt}\n\nQuery: {current_query}{phase_context}"
-
-                        # Get model's response with timeout
-                        try:
-                            response = await generate_with_timeout(client, prompt)
-                            response_text = clean_llm_response(response.text)
-                            print(f"LLM Response: {response_text}")
-                            memory.add_memory('llm_response', response_text)
+                    if not next_action or not decision_maker.validate_decision(next_action):
+                        logger.error("Invalid or no decision returned")
+                        break
+
+                    # If we have a final answer, we're done
+                    if next_action["type"] == "final_answer":
+                        value = next_action["value"]
+                        memory.add_memory('iteration_response', f"Final answer: {value}")
+                        print_final_results(memory, decision_maker, speculator)
+                        return
+
+                    # Fully determined steps are executed without asking the model
+                    if next_action.get("deterministic"):
+                        response_json = decision_maker.planned_action(next_action)
+                        print(f"Planned action ({decision_maker.state}): {response_json.model_dump_json()}")
+                        with profiler.capture("agent:action"):
+                            await execute_action(action, response_json)
+                        memory.increment_iteration()
+                        memory.checkpoint()
+                        decision_maker.checkpoint()
+                        continue
+
+                    # Get context from memory for the prompt
+                    with profiler.capture("agent:context"):
+                        context = memory.get_context_for_prompt(query)
+                    current_query = query if not context else f"{query}\n\n{context}"
+
+                    # Prepare prompt with current phase information
+                    phase_context = ""
+                    if "phase" in next_action:
+                        phase_context = f"\nCurrent phase: {next_action['phase']}"
+                        if "status" in next_action:
+                            phase_context += f"\nStatus: {next_action['status']}"
+                    elif next_action["type"] == "powerpoint":
+                        phase_context = f"\nNext step: {json.dumps(next_action)}"
+                    prompt = f"{system_prompt}\n\nQuery: {current_query}{phase_context}"
+
+                    # Run the likely next tool call while the model thinks
+                    prediction = decision_maker.predict_next_call()
+                    if prediction and speculator.start(action, *prediction):
+                        decision_maker.speculation_sent(prediction)
+
+                    # Get model's response with timeout
+                    try:
+                        decision_maker.stats["llm_calls"] += 1
+                        response = await retry_async(LLM_RETRY, generate_with_timeout, client, prompt, name="llm_call")
+                        response_text = clean_llm_response(response.text)
+                        print(f"LLM Response: {response_text}")
+                        memory.add_memory('llm_response', response_text)
+                        with profiler.capture("agent:perception"):
                             response_json = parse_and_validate_response(response_text)
+                        speculator.resolve(action, response_json)
                             
-                        except Exception as e:
-                            logger.error(f"Failed to get or parse LLM response: {e}")
-                            break
-
-                        # Execute action based on response type
-                        if response_json.type == 'function_call':
-                            await action.execute_function_call(response_json.function, response_json.params)
-                        elif response_json.type == 'powerpoint':
-                            await action.execute_powerpoint_operation(response_json.operation, response_json.params)
-                        elif response_json.type == 'final_answer':
-                            value = response_json.value
-                            memory.add_memory('iteration_response', f"Final answer: {value}")
-                            break
-                        
-                        memory.increment_iteration()
-                        
-                    if memory.current_iteration >= max_iterations:
-                        print("Reached maximum iterations")
+                    except Exception as e:
+                        speculator.discard()
+                        logger.error("Failed to get or parse LLM response: %s", e)
+                        break
+
+                    # Execute action based on response type
+                    if response_json.type == 'final_answer':
+                        value = response_json.value
+                        memory.add_memory('iteration_response', f"Final answer: {value}")
                         break
+                    with profiler.capture("agent:action"):
+                        await execute_action(action, response_json)
                         
-                    print("\nFinal Results:")
-                    for resp in memory.get_recent_memories(type='iteration_response'):
-                        print(resp.content)
+                    memory.increment_iteration()
+                    memory.checkpoint()
+                    decision_maker.checkpoint()
                         
-                    return
+                if memory.current_iteration >= max_iterations:
+                    print("Reached maximum iterations")
+                    break
+                        
+                print_final_results(memory, decision_maker, speculator)
+                return
                     
         except Exception as e:
             print(f"Error in main loop: {e}")
@@ -233,10 +293,20 @@ async def main():
             if retry_count >= max_retries:
                 print("Maximum retries reached")
                 break
-            print(f"Retrying... ({retry_count}/{max_retries})")
+            delay = SESSION_RETRY.delay_for(retry_count)
+            print(f"Retrying in {delay:.1f}s... ({retry_count}/{max_retries})")
+            await asyncio.sleep(delay)
             continue
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Math agent with PowerPoint visualization")
+    parser.add_argument("--resume", metavar="RUN_ID", help="resume a logged run from its last completed iteration")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(resume_run_id=args.resume))
+    finally:
+        memory_log = get_memory_log()
+        if memory_log:
+            memory_log.close()
 
 
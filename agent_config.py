@@ -0,0 +1,188 @@
+"""Configuration file for agent runtime settings"""
+import os
+import tempfile
+
+def _mapping(value: str, convert=int) -> dict:
+    """Parse "name=value,name=value" into a dict, converting the values"""
+    return {
+        name.strip(): convert(number)
+        for name, number in (item.split("=") for item in value.split(",") if item.strip())
+    }
+
+# Transport used to reach the MCP server:
+#   "stdio"  - spawn mcp-server.py as a child process and talk JSON over pipes
+#   "memory" - import the FastMCP server in-process and connect through memory streams
+#   "sse"    - connect over HTTP to a server started with `python mcp-server.py sse`
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").lower()
+
+# Endpoint of a server run with the sse transport (its port is set with FASTMCP_PORT)
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8000/sse")
+
+# Path of the MCP server script, used by both transports
+MCP_SERVER_SCRIPT = os.getenv(
+    "MCP_SERVER_SCRIPT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp-server.py")
+)
+
+# Tools exposed by this server process, e.g. MCP_SERVER_TOOLS="add,multiply"; empty exposes all.
+# The agent sets it for each shard it starts (see MCP_SHARDS).
+MCP_SERVER_TOOLS = frozenset(name.strip() for name in os.getenv("MCP_SERVER_TOOLS", "").split(",") if name.strip())
+
+# Run the MCP server without launching PowerPoint (automatic when the Windows GUI modules are missing)
+MCP_HEADLESS = os.getenv("MCP_HEADLESS", "0") == "1"
+
+# Slide previews rendered by the server, cached by slide content: renders kept, pixels per inch
+SLIDE_RENDER_CACHE_SIZE = int(os.getenv("SLIDE_RENDER_CACHE_SIZE", "64"))
+SLIDE_RENDER_DPI = int(os.getenv("SLIDE_RENDER_DPI", "96"))
+
+# Zero-copy array arguments for a server on the same host (opt-in). Integer or float lists of at
+# least SHARED_ARRAY_MIN_ITEMS items passed to the tools in SHARED_ARRAY_TOOLS (tool=parameter) are
+# written to shared memory ("shm") or a memory-mapped temp file ("mmap"); only a descriptor is sent.
+SHARED_ARRAYS_ENABLED = os.getenv("SHARED_ARRAYS_ENABLED", "0") == "1"
+SHARED_ARRAY_BACKEND = os.getenv("SHARED_ARRAY_BACKEND", "shm").lower()
+SHARED_ARRAY_MIN_ITEMS = int(os.getenv("SHARED_ARRAY_MIN_ITEMS", "1024"))
+SHARED_ARRAY_TOOLS = _mapping(os.getenv(
+    "SHARED_ARRAY_TOOLS", "add_list=l,int_list_to_exponential_sum=int_list"
+), str.strip)
+
+# Characters read per chunk when file_chars_to_int streams a text file to code points
+TEXT_STREAM_CHUNK_CHARS = int(os.getenv("TEXT_STREAM_CHUNK_CHARS", "65536"))
+# The only directory file_chars_to_int writes code point files to; the newest TEXT_STREAM_SCRATCH_KEEP are kept
+TEXT_STREAM_SCRATCH_DIR = os.getenv("TEXT_STREAM_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "mcp_text_stream"))
+TEXT_STREAM_SCRATCH_KEEP = int(os.getenv("TEXT_STREAM_SCRATCH_KEEP", "16"))
+
+# Retry policies (per operation): maximum attempts and exponential backoff bounds in seconds
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "10.0"))
+
+TOOL_RETRY_ATTEMPTS = int(os.getenv("TOOL_RETRY_ATTEMPTS", "3"))
+TOOL_RETRY_BASE_DELAY = float(os.getenv("TOOL_RETRY_BASE_DELAY", "0.2"))
+TOOL_RETRY_MAX_DELAY = float(os.getenv("TOOL_RETRY_MAX_DELAY", "2.0"))
+
+SESSION_RETRY_ATTEMPTS = int(os.getenv("SESSION_RETRY_ATTEMPTS", "3"))
+SESSION_RETRY_BASE_DELAY = float(os.getenv("SESSION_RETRY_BASE_DELAY", "0.5"))
+SESSION_RETRY_MAX_DELAY = float(os.getenv("SESSION_RETRY_MAX_DELAY", "5.0"))
+
+# Tools that can safely be called again with the same arguments.
+# Only these are retried automatically; PowerPoint operations have side effects.
+IDEMPOTENT_TOOLS = frozenset({
+    "add", "add_list", "subtract", "multiply", "divide", "power", "sqrt", "cbrt",
+    "factorial", "log", "remainder", "sin", "cos", "tan", "mine",
+    "create_thumbnail", "strings_to_chars_to_int", "int_list_to_exponential_sum",
+    "fibonacci_numbers", "file_chars_to_int",
+})
+
+# Sharded tool routing: MCP_SHARDS="math=4,slides=1" starts that many stdio server processes for each
+# tool group, and the agent routes every call by tool name to the least-loaded healthy replica.
+# Empty uses the single server of MCP_TRANSPORT. A replica that fails is skipped for ROUTER_COOLDOWN
+# seconds; calls to idempotent tools fail over to another replica.
+MCP_SHARDS = _mapping(os.getenv("MCP_SHARDS", ""))
+SHARD_GROUPS = {
+    "all": frozenset(),  # every tool
+    "math": IDEMPOTENT_TOOLS,
+    "slides": frozenset({
+        "open_powerpoint", "draw_rectangle", "add_text_in_powerpoint", "close_powerpoint",
+        "apply_slide_operations", "render_slide",
+    }),
+}
+ROUTER_COOLDOWN = float(os.getenv("ROUTER_COOLDOWN", "10"))
+
+# Tools whose result depends only on their arguments. Their results are cached process-wide
+# (shared by all sessions) for TOOL_CACHE_TTL seconds, at most TOOL_CACHE_MAX_ENTRIES of them.
+# create_thumbnail and file_chars_to_int are idempotent but read files that may change, so they are not pure.
+PURE_TOOLS = IDEMPOTENT_TOOLS - {"create_thumbnail", "file_chars_to_int"}
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "512"))
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "600"))
+
+# Deadline in seconds for a tool call; PowerPoint operations wait on the GUI and get longer ones.
+# Per-tool overrides, e.g. TOOL_TIMEOUTS="factorial=5,open_powerpoint=120"
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+TOOL_TIMEOUTS = _mapping(os.getenv(
+    "TOOL_TIMEOUTS",
+    "open_powerpoint=90,draw_rectangle=60,add_text_in_powerpoint=60,close_powerpoint=30,apply_slide_operations=90"
+), float)
+
+# Circuit breaker per tool: open after this many consecutive failures or timeouts, fail fast
+# while open, and let one probe call through after the reset timeout (half-open)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Let the decision layer execute fully determined steps (the follow-up calculation and the
+# PowerPoint visualization) without asking the LLM. Set to 0 to send every step to the model.
+PLANNER_BYPASS_LLM = os.getenv("PLANNER_BYPASS_LLM", "1") == "1"
+
+# While the LLM decides a step, run the predicted next call of a pure tool concurrently;
+# the result is used if the model asks for the same call and ignored otherwise
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "1") == "1"
+
+# Memory retention: each memory type is kept in a ring buffer of at most this many items
+MEMORY_DEFAULT_CAP = int(os.getenv("MEMORY_DEFAULT_CAP", "1000"))
+# Per-type overrides, e.g. MEMORY_TYPE_CAPS="llm_response=200,tool_result=200"
+MEMORY_TYPE_CAPS = _mapping(os.getenv("MEMORY_TYPE_CAPS", ""))
+# Named sessions not accessed for this many seconds are evicted from the session registry
+# (checked every quarter of the timeout while the agent runs; 0 keeps them until removed)
+MEMORY_IDLE_TIMEOUT = float(os.getenv("MEMORY_IDLE_TIMEOUT", "1800"))
+
+# Prompt context compaction: approximate token budget for the memory context in each prompt,
+# number of most recent iterations kept verbatim, and the longest value rendered inline
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "2"))
+CONTEXT_MAX_VALUE_CHARS = int(os.getenv("CONTEXT_MAX_VALUE_CHARS", "300"))
+
+# Durable memory log (SQLite in WAL mode). Set MEMORY_LOG_PATH="" to disable persistence.
+MEMORY_LOG_PATH = os.getenv(
+    "MEMORY_LOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_log.db")
+)
+# Events buffered before a write when an iteration runs long; every completed iteration is committed
+MEMORY_LOG_BATCH_SIZE = int(os.getenv("MEMORY_LOG_BATCH_SIZE", "64"))
+
+# Tool list and system prompt cached from earlier starts, keyed by the server's declared version
+# (a hash of mcp-server.py) and the prompt. Set CAPABILITY_SNAPSHOT_PATH="" to always list tools.
+CAPABILITY_SNAPSHOT_PATH = os.getenv(
+    "CAPABILITY_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "capability_snapshot.json")
+)
+
+# Maximum number of distinct tool results kept per session for reuse
+RESULT_REGISTRY_MAX_ENTRIES = int(os.getenv("RESULT_REGISTRY_MAX_ENTRIES", "1024"))
+
+# Cross-session retrieval of earlier iterations (BM25 over the durable memory log)
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "1") == "1"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_MAX_DOCS = int(os.getenv("RETRIEVAL_MAX_DOCS", "200000"))
+# Longest text indexed per iteration; large tool outputs are cut before indexing
+RETRIEVAL_MAX_DOC_CHARS = int(os.getenv("RETRIEVAL_MAX_DOC_CHARS", "1000"))
+
+# Rendering of tool results in iteration responses, logs and prompts: lists longer than
+# RESULT_MAX_ITEMS are shown as head/tail with length, min/max and checksum; text is cut at RESULT_MAX_CHARS.
+# Per-tool item limits, e.g. RESULT_TOOL_MAX_ITEMS="fibonacci_numbers=10,strings_to_chars_to_int=64"
+RESULT_MAX_ITEMS = int(os.getenv("RESULT_MAX_ITEMS", "20"))
+RESULT_MAX_CHARS = int(os.getenv("RESULT_MAX_CHARS", "500"))
+RESULT_TOOL_MAX_ITEMS = _mapping(os.getenv("RESULT_TOOL_MAX_ITEMS", "strings_to_chars_to_int=64"))
+
+# On-demand profiling, off unless targets are selected: tool names and agent stages (agent:decision,
+# agent:context, agent:llm, agent:perception, agent:action), or "*", e.g. PROFILE_TARGETS="factorial,agent:llm".
+# One in PROFILE_SAMPLE_RATE calls of a target is run under cProfile (and tracemalloc with PROFILE_MEMORY=1);
+# captures go to PROFILE_DIR, keeping the newest PROFILE_MAX_CAPTURES.
+PROFILE_TARGETS = frozenset(name.strip() for name in os.getenv("PROFILE_TARGETS", "").split(",") if name.strip())
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "10"))
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "profiles")
+)
+PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "50"))
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "1") == "1"
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "20"))
+
+# Logging pipeline: records are queued and written to logs/ by a background thread.
+# LOG_LEVEL applies to all modules unless overridden per logger, e.g. LOG_LEVELS="decision=DEBUG,retrieval=WARNING".
+# LOG_SAMPLE_RATES keeps 1 in N records below WARNING for hot-path loggers, e.g. "tool_cache=10".
+# Messages longer than LOG_MAX_MESSAGE_CHARS are truncated; LOG_FORMAT is "text" or "json" (JSON lines).
+LOG_ENABLED = os.getenv("LOG_ENABLED", "1") == "1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = _mapping(os.getenv("LOG_LEVELS", ""), str.upper)
+LOG_SAMPLE_RATES = _mapping(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
@@ -0,0 +1,85 @@
+"""Micro-benchmark of tool argument coercion: previous per-call schema walk vs precompiled coercers"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from action import CompiledTool
+
+TOOLS = [
+    SimpleNamespace(name=f'tool_{i}', inputSchema={
+        'properties': {'a': {'type': 'integer'}, 'b': {'type': 'integer'}}, 'required': ['a', 'b']})
+    for i in range(20)
+] + [
+    SimpleNamespace(name='add', inputSchema={
+        'properties': {'a': {'type': 'integer'}, 'b': {'type': 'integer'}}, 'required': ['a', 'b']}),
+    SimpleNamespace(name='strings_to_chars_to_int', inputSchema={
+        'properties': {'string': {'type': 'string'}}, 'required': ['string']}),
+    SimpleNamespace(name='int_list_to_exponential_sum', inputSchema={
+        'properties': {'int_list': {'type': 'array', 'items': {'type': 'integer'}}}, 'required': ['int_list']}),
+]
+
+def legacy_coerce(tools, func_name, params):
+    """The previous execute_function_call argument preparation (without logging)"""
+    tool = next((t for t in tools if t.name == func_name), None)
+    if not tool:
+        raise ValueError(f"Unknown tool: {func_name}")
+    arguments = {}
+    for param_name, param_info in tool.inputSchema.get('properties', {}).items():
+        param_value = params.get(param_name, params.get('numbers')) if func_name == 'int_list_to_exponential_sum' else params.get(param_name)
+        if param_value is None:
+            if param_name in tool.inputSchema.get('required', []):
+                raise ValueError(f"Required parameter {param_name} not provided for {func_name}")
+            continue
+        param_type = param_info.get('type', 'string')
+        if param_type == 'integer':
+            arguments[param_name] = int(param_value)
+        elif param_type == 'number':
+            arguments[param_name] = float(param_value)
+        elif param_type == 'array':
+            if isinstance(param_value, (list, tuple)):
+                arguments[param_name] = [int(x) for x in param_value]
+            elif param_value.startswith('[') and param_value.endswith(']'):
+                array_str = param_value.strip('[]')
+                arguments[param_name] = [int(x.strip()) for x in array_str.split(',')] if array_str else []
+            else:
+                arguments[param_name] = [int(x.strip()) for x in param_value.split(',')] if ',' in param_value else [int(param_value)]
+        else:
+            arguments[param_name] = str(param_value)
+    return arguments
+
+def rate(fn, calls, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, params in calls:
+            fn(name, params)
+    return repeat * len(calls) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100000, help='elements in the large array argument')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    values = [rng.randrange(32, 127) for _ in range(args.size)]
+    compiled = {tool.name: CompiledTool(tool) for tool in TOOLS}
+
+    def compiled_coerce(name, params):
+        return compiled[name].coerce(params)
+
+    cases = [
+        ('small scalar call', [('add', {'a': 5, 'b': '7'})], args.repeat * 5000),
+        ('array of ints', [('int_list_to_exponential_sum', {'int_list': values})], args.repeat),
+        ('array as string', [('int_list_to_exponential_sum', {'int_list': str(values)})], args.repeat),
+        ('array via alias', [('int_list_to_exponential_sum', {'numbers': values})], args.repeat),
+    ]
+    print(f"{'case':<20} {'previous calls/s':>18} {'compiled calls/s':>18} {'speedup':>8}")
+    for label, calls, repeat in cases:
+        assert legacy_coerce(TOOLS, *calls[0]) == compiled_coerce(*calls[0])
+        before = rate(lambda n, p: legacy_coerce(TOOLS, n, p), calls, repeat)
+        after = rate(compiled_coerce, calls, repeat)
+        print(f"{label:<20} {before:>18,.1f} {after:>18,.1f} {after / before:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Load generator and soak test for the MCP server: N client sessions replay a weighted mix of
+tool calls at a target rate and report throughput, latency percentiles, errors and server RSS"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+
+from mcp import ClientSession
+
+from decision import visualization_operations
+from router import open_router
+from transport import open_transport
+
+DEFAULT_MIX = (
+    "add=30,multiply=20,factorial=10,strings_to_chars_to_int=10,int_list_to_exponential_sum=10,"
+    "add_list=10,fibonacci_numbers=5,apply_slide_operations=5"
+)
+
+def argument_factories(list_size: int):
+    """Tool -> function building random arguments for one call"""
+    return {
+        "add": lambda rng: {"a": rng.randrange(1000), "b": rng.randrange(1000)},
+        "subtract": lambda rng: {"a": rng.randrange(1000), "b": rng.randrange(1000)},
+        "multiply": lambda rng: {"a": rng.randrange(1000), "b": rng.randrange(1000)},
+        "power": lambda rng: {"a": rng.randrange(2, 10), "b": rng.randrange(20)},
+        "sqrt": lambda rng: {"a": rng.randrange(10 ** 6)},
+        "factorial": lambda rng: {"a": rng.randrange(10, 200)},
+        "strings_to_chars_to_int": lambda rng: {
+            "string": "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(16))},
+        "int_list_to_exponential_sum": lambda rng: {"int_list": [rng.randrange(128) for _ in range(list_size)]},
+        "add_list": lambda rng: {"l": [rng.randrange(1000) for _ in range(list_size)]},
+        "fibonacci_numbers": lambda rng: {"n": rng.randrange(10, 100)},
+        "apply_slide_operations": lambda rng: {"operations": visualization_operations(rng.random())},
+        "render_slide": lambda rng: {"index": 0},
+    }
+
+def parse_mix(mix: str, factories: dict):
+    """"tool=weight,..." -> (tools, weights), checking every tool has an argument factory"""
+    tools, weights = [], []
+    for item in mix.split(","):
+        name, weight = item.split("=")
+        if name.strip() not in factories:
+            raise SystemExit(f"No argument factory for tool {name.strip()}; choose from {sorted(factories)}")
+        tools.append(name.strip())
+        weights.append(float(weight))
+    return tools, weights
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def rss_bytes(pid: int):
+    """Resident set size of a process from /proc, None where that is not available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+def child_pids(pid: int = None) -> list:
+    """Direct children of a process (the stdio servers this generator spawned)"""
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+class Stats:
+    """Latencies and errors per tool, for the whole run and for the current report window"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.window = []
+        self.window_errors = 0
+
+    def record(self, tool: str, latency: float, ok: bool):
+        self.latencies[tool].append(latency)
+        self.window.append(latency)
+        if not ok:
+            self.errors[tool] += 1
+            self.window_errors += 1
+
+    def take_window(self):
+        window, errors = sorted(self.window), self.window_errors
+        self.window, self.window_errors = [], 0
+        return window, errors
+
+async def call(session: ClientSession, tool: str, arguments: dict, scheduled: float, timeout: float, stats: Stats):
+    """One tool call; latency is measured from the scheduled start so a slow server is not hidden"""
+    try:
+        result = await asyncio.wait_for(session.call_tool(tool, arguments=arguments), timeout)
+        ok = not result.isError
+    except Exception:
+        ok = False
+    stats.record(tool, time.perf_counter() - scheduled, ok)
+
+async def open_loop(sessions, pick, args, stats, deadline):
+    """Start calls at the target rate whether or not earlier ones finished"""
+    interval = 1.0 / args.rate
+    pending = set()
+    next_start = time.perf_counter()
+    i = 0
+    while next_start < deadline:
+        delay = next_start - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tool, arguments = pick()
+        task = asyncio.create_task(call(sessions[i % len(sessions)], tool, arguments, next_start, args.timeout, stats))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        i += 1
+        next_start += interval
+    if pending:
+        await asyncio.wait(pending)
+
+async def closed_loop(sessions, pick, args, stats, deadline):
+    """Each session sends its next call as soon as the previous one returns"""
+    async def worker(session):
+        while time.perf_counter() < deadline:
+            tool, arguments = pick()
+            await call(session, tool, arguments, time.perf_counter(), args.timeout, stats)
+    await asyncio.gather(*(worker(session) for session in sessions))
+
+def server_pids(args) -> list:
+    if args.transport == "stdio" or args.shards:
+        return child_pids()
+    if args.transport == "memory":
+        return [os.getpid()]
+    return [args.server_pid] if args.server_pid else []
+
+async def reporter(args, stats, started, stop: asyncio.Event):
+    print(f"{'time s':>7} {'calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'RSS MB':>8}")
+    last = started
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), args.interval)
+        except asyncio.TimeoutError:
+            pass
+        now = time.perf_counter()
+        window, errors = stats.take_window()
+        rss = [rss_bytes(pid) for pid in server_pids(args)]
+        rss_mb = sum(r for r in rss if r) / 1e6 if any(rss) else float("nan")
+        print(
+            f"{now - started:>7.1f} {len(window) / max(now - last, 1e-9):>9.1f} "
+            f"{percentile(window, 0.5) * 1000:>8.2f} {percentile(window, 0.95) * 1000:>8.2f} "
+            f"{percentile(window, 0.99) * 1000:>8.2f} {errors:>7} {rss_mb:>8.1f}"
+        )
+        last = now
+
+def print_summary(stats: Stats, elapsed: float):
+    print(f"\n{'tool':<28} {'calls':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = []
+    for tool in sorted(stats.latencies):
+        latencies = sorted(stats.latencies[tool])
+        everything.extend(latencies)
+        print(
+            f"{tool:<28} {len(latencies):>7} {stats.errors[tool]:>7} {percentile(latencies, 0.5) * 1000:>8.2f} "
+            f"{percentile(latencies, 0.95) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+            f"{latencies[-1] * 1000:>8.2f}"
+        )
+    everything.sort()
+    errors = sum(stats.errors.values())
+    print(
+        f"\n{len(everything)} calls in {elapsed:.1f}s: {len(everything) / elapsed:.1f} calls/s, "
+        f"p50 {percentile(everything, 0.5) * 1000:.2f} ms, p99 {percentile(everything, 0.99) * 1000:.2f} ms, "
+        f"error rate {errors / max(len(everything), 1):.2%}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=200.0, help="calls per second over all sessions; 0 = as fast as possible")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds; use a long duration for a soak test")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted tool mix, tool=weight,...")
+    parser.add_argument("--list-size", type=int, default=100, help="items in list arguments")
+    parser.add_argument("--transport", default="stdio", choices=("stdio", "memory", "sse"))
+    parser.add_argument("--url", default=None, help="sse endpoint (default MCP_SERVER_URL)")
+    parser.add_argument("--server-pid", type=int, default=None, help="pid of the sse server, for RSS")
+    parser.add_argument("--shards", default=None,
+                        help="route all sessions' calls over sharded stdio servers, e.g. math=4,slides=1")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-call timeout in seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between reports")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    factories = argument_factories(args.list_size)
+    tools, weights = parse_mix(args.mix, factories)
+
+    def pick():
+        tool = rng.choices(tools, weights)[0]
+        return tool, factories[tool](rng)
+
+    # stdio servers are spawned headless (PowerPoint is never launched) with this environment
+    env = {**os.environ, "MCP_HEADLESS": "1"}
+    stats = Stats()
+    async with AsyncExitStack() as stack:
+        # One stdio server process per session; memory and sse sessions share one server.
+        # With --shards, all sessions share one router over the shard processes.
+        sessions = []
+        if args.shards:
+            shards = {group.strip(): int(count) for group, count in (item.split("=") for item in args.shards.split(","))}
+            router = await stack.enter_async_context(open_router(shards, env=env))
+            await router.initialize()
+            sessions = [router] * args.sessions
+        for _ in range(0 if args.shards else args.sessions):
+            read, write = await stack.enter_async_context(open_transport(args.transport, env=env, url=args.url))
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            sessions.append(session)
+        print(f"{len(sessions)} {'router (' + args.shards + ')' if args.shards else args.transport} sessions, "
+              f"mix {args.mix}, rate {args.rate or 'unbounded'} calls/s for {args.duration:.0f}s")
+
+        started = time.perf_counter()
+        stop = asyncio.Event()
+        report = asyncio.create_task(reporter(args, stats, started, stop))
+        run = open_loop if args.rate > 0 else closed_loop
+        await run(sessions, pick, args, stats, started + args.duration)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await report
+        if args.shards:
+            print(f"\nRouter: {sessions[0].metrics()}")
+    print_summary(stats, elapsed)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Micro-benchmark of bounded memory storage: append throughput, recent-item lookups and RSS"""
+import argparse
+import gc
+import logging
+import os
+import resource
+import time
+
+from memory import Memory
+
+TYPES = ('llm_response', 'tool_result', 'iteration_response')
+
+def rss_mb() -> float:
+    """Current resident set size in MB (falls back to peak RSS off Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def time_per_call(fn, repeat: int) -> float:
+    """Average seconds per call of fn"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def bench_bounded(n: int, cap: int, lookups: int):
+    memory = Memory(session_id=f'bench-{n}', default_cap=cap)
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    for i in range(n):
+        memory.add_memory(TYPES[i % 3], f'In the {i} iteration the operation returned {i}.')
+        if i % 3 == 2:
+            memory.increment_iteration()
+    append_s = time.perf_counter() - start
+    recent = time_per_call(lambda: memory.get_recent_memories(limit=5, type='iteration_response'), lookups)
+    by_iter = time_per_call(lambda: memory.get_iteration_memories(memory.current_iteration - 1), lookups)
+    return {
+        'append_per_s': n / append_s,
+        'recent_us': recent * 1e6,
+        'by_iteration_us': by_iter * 1e6,
+        'retained': len(memory.store),
+        'rss_delta_mb': rss_mb() - rss_before,
+    }
+
+def bench_unbounded_list(n: int, lookups: int):
+    """The previous storage: one growing list filtered on every lookup"""
+    memories = []
+    rss_before = rss_mb()
+    for i in range(n):
+        memories.append((TYPES[i % 3], f'In the {i} iteration the operation returned {i}.'))
+    recent = time_per_call(lambda: [m for m in memories if m[0] == 'iteration_response'][-5:], lookups)
+    return {'recent_us': recent * 1e6, 'rss_delta_mb': rss_mb() - rss_before}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100000,300000,1000000')
+    parser.add_argument('--cap', type=int, default=1000, help='ring buffer size per memory type')
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--baseline', action='store_true', help='also measure the unbounded list storage')
+    args = parser.parse_args()
+
+    logging.getLogger('memory').setLevel(logging.WARNING)
+
+    print(f"{'items':>9} {'appends/s':>11} {'recent(5) us':>13} {'by_iter us':>11} {'retained':>9} {'RSS +MB':>8}")
+    for n in (int(x) for x in args.sizes.split(',')):
+        gc.collect()
+        r = bench_bounded(n, args.cap, args.lookups)
+        print(f"{n:>9} {r['append_per_s']:>11.0f} {r['recent_us']:>13.2f} {r['by_iteration_us']:>11.2f} "
+              f"{r['retained']:>9} {r['rss_delta_mb']:>8.1f}")
+
+    if args.baseline:
+        print("\nUnbounded list baseline")
+        print(f"{'items':>9} {'recent(5) us':>13} {'RSS +MB':>8}")
+        for n in (int(x) for x in args.sizes.split(',')):
+            gc.collect()
+            r = bench_unbounded_list(n, max(1, args.lookups // 1000))
+            print(f"{n:>9} {r['recent_us']:>13.2f} {r['rss_delta_mb']:>8.1f}")
+
+if __name__ == '__main__':
+    main()
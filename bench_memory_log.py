@@ -0,0 +1,58 @@
+"""Benchmark the per-iteration cost of persisting memory to the durable SQLite log"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from memory import Memory
+from memory_log import SQLiteMemoryLog
+
+def run_iterations(memory: Memory, iterations: int, payload: str) -> float:
+    """Simulate agent iterations (LLM response, tool result, iteration response); return seconds per iteration"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        memory.add_memory('llm_response', '{"type": "function_call", "function": "add", "params": {"a": 1, "b": 2}}')
+        memory.add_memory('tool_result', [payload])
+        memory.add_memory('iteration_response', f"In the {i + 1} iteration you called add with {{'a': 1, 'b': 2}} parameters, "
+                                                f"and the function returned {payload}.",
+                          {'tool': 'add', 'arguments': {'a': 1, 'b': 2}, 'result': [payload]})
+        memory.increment_iteration()
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--payload-bytes', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    logging.getLogger('memory').setLevel(logging.WARNING)
+    payload = 'x' * args.payload_bytes
+
+    in_memory = run_iterations(Memory('bench-plain'), args.iterations, payload)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench_memory_log.db')
+        log = SQLiteMemoryLog(path, batch_size=args.batch_size)
+        persisted = run_iterations(Memory('bench-log', log=log), args.iterations, payload)
+        log.close()
+        size_mb = os.path.getsize(path) / 2**20
+
+        start = time.perf_counter()
+        restored = Memory('bench-restore', log=SQLiteMemoryLog(path))
+        run_id = next(r['run_id'] for r in restored.log.list_runs() if r['session_id'] == 'bench-log')
+        restored.restore_from_log(run_id)
+        restore_s = time.perf_counter() - start
+        restored.log.close()
+
+    events = args.iterations * 4
+    print(f"iterations:            {args.iterations}")
+    print(f"in-memory only:        {in_memory * 1e6:8.1f} us/iteration")
+    print(f"with durable log:      {persisted * 1e6:8.1f} us/iteration "
+          f"(+{(persisted - in_memory) * 1e6:.1f} us, {events / (persisted * args.iterations):,.0f} events/s)")
+    print(f"database size:         {size_mb:8.2f} MB")
+    print(f"restore of full run:   {restore_s * 1e3:8.1f} ms ({restored.current_iteration} iterations)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Fuzz-test and benchmark the incremental JSON extractor against the previous regex fallback"""
+import argparse
+import json
+import random
+import re
+import string
+import time
+
+from perception import JsonObjectExtractor, extract_json_object
+
+PROSE = [
+    "Sure! Here is the next step:", "I will now compute the value.", "Let me think {about} this.",
+    "Result follows", "Note: values are \"approximate\".", "", "```json", "```", "Done.",
+]
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randrange(7 if depth < 3 else 4)
+    if kind == 0:
+        return rng.randrange(-10**6, 10**6)
+    if kind == 1:
+        return rng.random() * 10 ** rng.randrange(40)
+    if kind == 2:
+        return ''.join(rng.choice(string.ascii_letters + ' {}[]"\\:,\n') for _ in range(rng.randrange(12)))
+    if kind == 3:
+        return rng.choice([None, True, False])
+    if kind in (4, 5):
+        return {f"k{i}": random_value(rng, depth + 1) for i in range(rng.randrange(4))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randrange(5))]
+
+def random_action(rng: random.Random) -> dict:
+    kind = rng.randrange(3)
+    if kind == 0:
+        return {"type": "function_call", "function": rng.choice(["add", "strings_to_chars_to_int"]),
+                "params": random_value(rng, 1) if rng.random() < 0.5 else {"int_list": [rng.randrange(128) for _ in range(8)]}}
+    if kind == 1:
+        return {"type": "powerpoint", "operation": "add_text_in_powerpoint",
+                "params": {"text": "Final Result:\n" + str(rng.random()), "style": {"bold": True, "size": 28}}}
+    return {"type": "final_answer", "value": rng.random() * 1e36}
+
+def wrap(rng: random.Random, obj: dict) -> str:
+    body = json.dumps(obj, indent=rng.choice([None, 2]))
+    before = rng.choice(PROSE)
+    after = rng.choice(PROSE) + (" {\"type\": \"other\"}" if rng.random() < 0.2 else "")
+    if rng.random() < 0.5:
+        body = f"```json\n{body}\n```"
+    return f"{before}\n{body}\n{after}"
+
+def chunked(rng: random.Random, text: str):
+    pos = 0
+    while pos < len(text):
+        size = rng.randrange(1, 16)
+        yield text[pos:pos + size]
+        pos += size
+
+def legacy_extract(text: str):
+    """The previous fallback path in parse_and_validate_response"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        match = re.search(r'\{[^}]+\}', text)
+        if not match:
+            return None
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+
+def fuzz(cases: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(cases):
+        obj = random_action(rng)
+        text = wrap(rng, obj)
+
+        whole, _ = extract_json_object(text)
+        extractor = JsonObjectExtractor()
+        streamed = None
+        for chunk in chunked(rng, text):
+            streamed = extractor.feed(chunk)
+            if streamed is not None:
+                break
+        if streamed is None:
+            streamed = extractor.finish()
+
+        if whole != obj or streamed != obj:
+            failures += 1
+            if failures <= 5:
+                print(f"MISMATCH\n  text: {text!r}\n  whole: {whole!r}\n  streamed: {streamed!r}")
+    return failures
+
+def adversarial_inputs(n: int):
+    """Inputs that made a rescanning extractor quadratic, with the object expected from each"""
+    return [
+        ("nested unclosed prose", "{a" * n + "}" * n, None),
+        ("unclosed braces before an object", "{" * n + '{"a": 1}', {"a": 1}),
+        ("nested objects failing at the end", '{"a":' * min(n, 500) + '1,}' + '}' * (min(n, 500) - 1), None),
+        ("stray braces only", "{" * n, None),
+        ("closing braces only", "}" * n + '{"a": 1}', {"a": 1}),
+    ]
+
+def adversarial(n: int, time_limit: float) -> int:
+    """Extract from each adversarial input within time_limit seconds; returns the number of failures"""
+    failures = 0
+    print(f"{'adversarial input (n=' + str(n) + ')':<36} {'ms':>9}")
+    for label, text, expected in adversarial_inputs(n):
+        start = time.perf_counter()
+        obj, _ = extract_json_object(text)
+        elapsed = time.perf_counter() - start
+        ok = obj == expected and elapsed <= time_limit
+        failures += not ok
+        print(f"{label:<36} {elapsed * 1000:>9.1f}{'' if ok else '  FAILED'}")
+    return failures
+
+def bench(cases: int, seed: int):
+    rng = random.Random(seed)
+    pairs = [(obj, wrap(rng, obj)) for obj in (random_action(rng) for _ in range(cases))]
+
+    start = time.perf_counter()
+    new_ok = sum(extract_json_object(text)[0] == obj for obj, text in pairs)
+    new_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    old_ok = sum(legacy_extract(text) == obj for obj, text in pairs)
+    old_s = time.perf_counter() - start
+
+    print(f"{'path':<10} {'success':>9} {'us/response':>12}")
+    print(f"{'regex':<10} {old_ok / cases:>8.1%} {old_s / cases * 1e6:>12.1f}")
+    print(f"{'extractor':<10} {new_ok / cases:>8.1%} {new_s / cases * 1e6:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fuzz', type=int, default=20000, help='number of fuzz cases')
+    parser.add_argument('--bench', type=int, default=20000, help='number of benchmark responses')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--adversarial-size', type=int, default=8000, help='size of the adversarial inputs')
+    parser.add_argument('--time-limit', type=float, default=1.0, help='seconds allowed per adversarial input')
+    args = parser.parse_args()
+
+    failures = fuzz(args.fuzz, args.seed)
+    print(f"fuzz: {args.fuzz - failures}/{args.fuzz} responses extracted correctly (whole and streamed)\n")
+    failures += adversarial(args.adversarial_size, args.time_limit)
+    print()
+    bench(args.bench, args.seed + 1)
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
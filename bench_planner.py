@@ -0,0 +1,127 @@
+"""LLM calls and latency per query: every step sent to the model (with and without speculative
+tool calls) vs the planner executing determined steps"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from types import SimpleNamespace
+
+import decision
+from action import Action
+from circuit_breaker import ToolGuard
+from decision import DecisionMaker, visualization_operations
+from memory import Memory
+from perception import parse_and_validate_response
+from speculation import Speculator
+from tool_cache import ToolCallCache
+
+QUERY = "Find the ASCII values of characters in HIMANSHU and then return sum of exponentials of those values."
+# Does not name the follow-up, so the model decides it (and the planner can only speculate)
+OPEN_QUERY = "Find the ASCII values of characters in HIMANSHU and then compute the answer from them."
+
+TOOLS = [
+    SimpleNamespace(name='strings_to_chars_to_int', inputSchema={
+        'properties': {'string': {'type': 'string'}}, 'required': ['string']}),
+    SimpleNamespace(name='int_list_to_exponential_sum', inputSchema={
+        'properties': {'int_list': {'type': 'array', 'items': {'type': 'integer'}}}, 'required': ['int_list']}),
+]
+
+def text_result(*texts):
+    return SimpleNamespace(content=[SimpleNamespace(text=text) for text in texts], isError=False)
+
+class FakeSession:
+    """Answers the tools of the canonical query"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    async def call_tool(self, name, arguments=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if name == 'strings_to_chars_to_int':
+            return text_result(*(str(ord(c)) for c in arguments['string']))
+        if name == 'int_list_to_exponential_sum':
+            return text_result(json.dumps(sum(math.exp(i) for i in arguments['int_list'])))
+        return text_result(f"{name} completed")
+
+class ScriptedModel:
+    """Stands in for Gemini: answers with the step a well-behaved model takes on the canonical query"""
+
+    def __init__(self, memory: Memory, latency: float):
+        self.memory = memory
+        self.latency = latency
+        self.calls = 0
+
+    async def respond(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        results = self.memory.results
+        run_id = self.memory.run_id
+        chars = results.latest('strings_to_chars_to_int', run_id=run_id)
+        final = results.latest('int_list_to_exponential_sum', run_id=run_id)
+        if chars is None:
+            action = {"type": "function_call", "function": "strings_to_chars_to_int", "params": {"string": "HIMANSHU"}}
+        elif final is None:
+            action = {"type": "function_call", "function": "int_list_to_exponential_sum", "params": {"int_list": chars.value}}
+        else:
+            action = {"type": "powerpoint", "operation": "apply_slide_operations",
+                      "params": {"operations": visualization_operations(final.value)}}
+        return json.dumps(action)
+
+async def run_query(bypass: bool, speculate: bool, latency: float, tool_latency: float, query: str = QUERY,
+                    max_iterations: int = 10):
+    decision.PLANNER_BYPASS_LLM = bypass
+    memory = Memory(f"bench-planner-{bypass}-{speculate}")
+    memory.reset()
+    session = FakeSession(tool_latency)
+    action = Action(session, memory, ToolCallCache(), ToolGuard())
+    action.set_tools(TOOLS)
+    decision_maker = DecisionMaker(memory, query)
+    model = ScriptedModel(memory, latency)
+    speculator = Speculator(enabled=speculate)
+
+    start = time.perf_counter()
+    while memory.current_iteration < max_iterations:
+        next_action = await decision_maker.decide_next_action({})
+        if next_action["type"] == "final_answer":
+            break
+        if next_action.get("deterministic"):
+            response_json = decision_maker.planned_action(next_action)
+        else:
+            prediction = decision_maker.predict_next_call()
+            if prediction and speculator.start(action, *prediction):
+                decision_maker.speculation_sent(prediction)
+            response_json = parse_and_validate_response(await model.respond())
+            speculator.resolve(action, response_json)
+        if response_json.type == 'function_call':
+            await action.execute_function_call(response_json.function, response_json.params)
+        else:
+            await action.execute_powerpoint_operation(response_json.operation, response_json.params)
+        memory.increment_iteration()
+    return model.calls, session.calls, time.perf_counter() - start, speculator, next_action
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='simulated seconds per LLM call')
+    parser.add_argument('--tool-latency', type=float, default=0.3, help='simulated seconds per tool call')
+    args = parser.parse_args()
+
+    modes = (
+        ("every step via LLM", False, False, QUERY),
+        ("every step via LLM + spec.", False, True, QUERY),
+        ("planner bypasses LLM", True, False, QUERY),
+        ("planner, open query + spec.", True, True, OPEN_QUERY),
+    )
+    print(f"{'mode':<28} {'LLM calls':>10} {'tool calls':>11} {'seconds':>8} {'spec. hits':>11} {'overlap s':>10}")
+    for label, bypass, speculate, query in modes:
+        llm_calls, tool_calls, seconds, speculator, final = asyncio.run(
+            run_query(bypass, speculate, args.llm_latency, args.tool_latency, query))
+        hits = f"{speculator.stats['hits']}/{speculator.stats['started']}"
+        print(f"{label:<28} {llm_calls:>10} {tool_calls:>11} {seconds:>8.2f} {hits:>11} "
+              f"{speculator.stats['time_saved']:>10.2f}")
+    print(f"\nFinal answer: {final['value']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark build and query latency of the BM25 retrieval index at 1e5+ stored iterations"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import time
+
+from retrieval import RetrievalIndex
+
+TOOLS = ['add', 'subtract', 'multiply', 'power', 'factorial', 'fibonacci_numbers',
+         'strings_to_chars_to_int', 'int_list_to_exponential_sum', 'sqrt', 'log']
+WORDS = ['HIMANSHU', 'ALICE', 'PYTHON', 'AGENT', 'MATRIX', 'GEMINI', 'SLIDE', 'VECTOR', 'KERNEL', 'ORBIT']
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def synthetic_response(rng: random.Random, i: int) -> str:
+    tool = rng.choice(TOOLS)
+    if tool == 'strings_to_chars_to_int':
+        word = rng.choice(WORDS) + str(rng.randrange(1000))
+        return (f"In the {i % 10 + 1} iteration you called {tool} with {{'string': '{word}'}} parameters, "
+                f"and the function returned [{', '.join(str(ord(c)) for c in word)}].")
+    a, b = rng.randrange(10**6), rng.randrange(10**3)
+    return (f"In the {i % 10 + 1} iteration you called {tool} with {{'a': {a}, 'b': {b}}} parameters, "
+            f"and the function returned {rng.random() * 10**rng.randrange(12):.6g}.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--max-docs', type=int, default=200000, help='index memory cap')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = [synthetic_response(rng, i) for i in range(args.docs)]
+
+    index = RetrievalIndex(max_docs=args.max_docs)
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        index.add(text, {'run_id': f'run-{i // 10}', 'iteration': i % 10})
+    build_s = time.perf_counter() - start
+    rss_delta = rss_mb() - rss_before
+
+    queries = [
+        f"Find the ASCII values of characters in {rng.choice(WORDS)} and then return sum of exponentials of those values"
+        for _ in range(args.queries // 2)
+    ] + [f"{rng.choice(TOOLS)} of {rng.randrange(10**6)} and {rng.randrange(10**3)}" for _ in range(args.queries // 2)]
+
+    latencies = []
+    for query in queries:
+        t0 = time.perf_counter()
+        index.search(query, args.k, exclude={'run_id': 'run-0'})
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+
+    print(f"documents indexed:   {len(index)} (of {args.docs} added, cap {args.max_docs})")
+    print(f"build:               {build_s:.2f} s ({args.docs / build_s:,.0f} docs/s, "
+          f"{build_s / args.docs * 1e6:.1f} us per incremental add)")
+    print(f"index memory:        +{rss_delta:.0f} MB RSS")
+    print(f"query latency:       mean {statistics.mean(latencies) * 1e3:.2f} ms, "
+          f"p50 {latencies[len(latencies) // 2] * 1e3:.2f} ms, p95 {latencies[int(len(latencies) * 0.95)] * 1e3:.2f} ms")
+
+if __name__ == '__main__':
+    main()
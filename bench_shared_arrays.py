@@ -0,0 +1,46 @@
+"""Benchmark add_list calls with large arrays sent as JSON and as shared memory descriptors"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from mcp import ClientSession
+from shared_arrays import SharedArrayPool
+from transport import open_transport
+
+async def measure(session, pool: SharedArrayPool, values: list, calls: int) -> float:
+    """Median seconds per add_list call, descriptors included when the pool is enabled"""
+    latencies = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        with pool.share_arguments("add_list", {"l": values}) as arguments:
+            result = await session.call_tool("add_list", arguments=arguments)
+        latencies.append(time.perf_counter() - t0)
+        if result.isError or int(result.content[0].text) != sum(values):
+            raise RuntimeError(f"Wrong add_list result: {result.content[0].text}")
+    return statistics.median(latencies)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--transport", default="stdio")
+    parser.add_argument("--backends", default="shm,mmap")
+    args = parser.parse_args()
+
+    pools = {"json": SharedArrayPool(enabled=False)}
+    for backend in args.backends.split(","):
+        pools[backend] = SharedArrayPool(enabled=True, backend=backend, min_items=0)
+
+    async with open_transport(args.transport) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            print(f"{'items':>10} " + " ".join(f"{name + ' ms':>10}" for name in pools))
+            for size in map(int, args.sizes.split(",")):
+                values = [random.randrange(256) for _ in range(size)]
+                row = [await measure(session, pool, values, args.calls) for pool in pools.values()]
+                print(f"{size:>10} " + " ".join(f"{seconds * 1000:>10.2f}" for seconds in row))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Benchmark per-call MCP latency for the stdio and in-memory transports"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from mcp import ClientSession
+from transport import open_transport
+
+async def measure(transport: str, calls: int, warmup: int):
+    """Open a session over the given transport and time `calls` invocations of the add tool"""
+    started = time.perf_counter()
+    async with open_transport(transport) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            startup = time.perf_counter() - started
+
+            for _ in range(warmup):
+                await session.call_tool("add", arguments={"a": 1, "b": 2})
+
+            latencies = []
+            for i in range(calls):
+                t0 = time.perf_counter()
+                await session.call_tool("add", arguments={"a": i, "b": 2})
+                latencies.append(time.perf_counter() - t0)
+
+    latencies.sort()
+    return {
+        "startup_ms": startup * 1000,
+        "mean_us": statistics.mean(latencies) * 1e6,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p95_us": latencies[int(len(latencies) * 0.95)] * 1e6,
+        "calls_per_sec": len(latencies) / sum(latencies),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--transports", default="stdio,memory")
+    args = parser.parse_args()
+
+    results = {}
+    for transport in args.transports.split(","):
+        results[transport] = await measure(transport, args.calls, args.warmup)
+
+    print(f"{'transport':<10} {'startup ms':>11} {'mean us':>10} {'p50 us':>10} {'p95 us':>10} {'calls/s':>10}")
+    for transport, r in results.items():
+        print(
+            f"{transport:<10} {r['startup_ms']:>11.1f} {r['mean_us']:>10.1f} "
+            f"{r['p50_us']:>10.1f} {r['p95_us']:>10.1f} {r['calls_per_sec']:>10.0f}"
+        )
+    if "stdio" in results and "memory" in results:
+        speedup = results["stdio"]["mean_us"] / results["memory"]["mean_us"]
+        print(f"\nIn-memory transport is {speedup:.1f}x faster per call than stdio")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Micro-benchmark of LLM action validation: previous multi-step path vs the prebuilt union validator"""
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+from perception import (
+    ActionValidator, FunctionCallInput, PowerPointOperationInput, FinalAnswerOutput
+)
+
+TOOLS = [
+    SimpleNamespace(name='add', inputSchema={
+        'properties': {'a': {'type': 'integer'}, 'b': {'type': 'integer'}}, 'required': ['a', 'b']}),
+    SimpleNamespace(name='strings_to_chars_to_int', inputSchema={
+        'properties': {'string': {'type': 'string'}}, 'required': ['string']}),
+    SimpleNamespace(name='int_list_to_exponential_sum', inputSchema={
+        'properties': {'int_list': {'type': 'array', 'items': {}}}, 'required': ['int_list']}),
+    SimpleNamespace(name='add_text_in_powerpoint', inputSchema={
+        'properties': {'text': {'type': 'string'}}, 'required': ['text']}),
+]
+
+RESPONSES = [
+    '{"type": "function_call", "function": "strings_to_chars_to_int", "params": {"string": "HIMANSHU"}}',
+    '{"type": "function_call", "function": "int_list_to_exponential_sum", '
+    '"params": {"int_list": [72, 73, 77, 65, 78, 83, 72, 85]}}',
+    '{"type": "function_call", "function": "add", "params": {"a": 5, "b": 7}}',
+    '{"type": "powerpoint", "operation": "add_text_in_powerpoint", "params": {"text": "Final Result:\\n7.59e+33"}}',
+    '{"type": "final_answer", "value": 7.59982224609308e+33}',
+]
+
+def legacy_validate(response_text: str):
+    """The previous parse_and_validate_response body (without logging)"""
+    response_json = json.loads(response_text)
+    if not isinstance(response_json, dict) or 'type' not in response_json:
+        raise ValueError("Invalid response format")
+    valid_types = ['function_call', 'powerpoint', 'final_answer']
+    if response_json['type'] not in valid_types:
+        raise ValueError(f"Invalid response type. Expected one of {valid_types}")
+    if response_json['type'] == 'function_call':
+        return FunctionCallInput(**response_json)
+    elif response_json['type'] == 'powerpoint':
+        return PowerPointOperationInput(**response_json)
+    return FinalAnswerOutput(**response_json)
+
+def rate(fn, inputs, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for raw in inputs:
+            fn(raw)
+    return repeat * len(inputs) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    validator = ActionValidator()
+    validator.set_tools(TOOLS)
+    as_bytes = [r.encode() for r in RESPONSES]
+
+    envelope_only = ActionValidator()  # no tools registered: no parameter checks
+    legacy = rate(legacy_validate, RESPONSES, args.repeat)
+    union_envelope = rate(envelope_only.validate, RESPONSES, args.repeat)
+    union_str = rate(validator.validate, RESPONSES, args.repeat)
+    union_bytes = rate(validator.validate, as_bytes, args.repeat)
+
+    print(f"{'path':<36} {'validations/s':>14}")
+    print(f"{'previous (loads + checks + model)':<36} {legacy:>14,.0f}")
+    print(f"{'union validator, envelope only':<36} {union_envelope:>14,.0f}")
+    print(f"{'union validator + params, str':<36} {union_str:>14,.0f}")
+    print(f"{'union validator + params, bytes':<36} {union_bytes:>14,.0f}")
+    print("\nThe union validator also checks tool parameters, which the previous path did not.")
+
+    bad = '{"type": "function_call", "function": "add", "params": {"a": "five"}}'
+    try:
+        validator.validate(bad)
+    except ValueError as e:
+        print(f"\nRejected before dispatch: {bad}\n  {str(e).splitlines()[0]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+from mcp import types
+
+from agent_config import CAPABILITY_SNAPSHOT_PATH
+from logger_config import setup_logger
+from prompt_config import MATH_AGENT_SYSTEM_PROMPT
+from shared_arrays import SHARED_ARRAY_PARAM
+
+# Setup logger
+logger = setup_logger('capability_snapshot', 'capability_snapshot.log')
+
+# Bumped when the snapshot layout or the tool description format changes
+SNAPSHOT_FORMAT = 2
+# Snapshots kept in the file, one per server version and prompt
+MAX_SNAPSHOTS = 8
+
+def describe_tools(tools) -> str:
+    """
+    One numbered line per tool: name(parameter: type, ...) - description. The shared array
+    parameter is set by the Action layer, not by the model, and is left out.
+    """
+    lines = []
+    for i, tool in enumerate(tools):
+        try:
+            params = tool.inputSchema or {}
+            desc = getattr(tool, 'description', 'No description available')
+            name = getattr(tool, 'name', f'tool_{i}')
+
+            if 'properties' in params:
+                params_str = ', '.join(
+                    f"{param_name}: {param_info.get('type', 'unknown')}"
+                    for param_name, param_info in params['properties'].items()
+                    if param_name != SHARED_ARRAY_PARAM
+                )
+            else:
+                params_str = 'no parameters'
+            lines.append(f"{i+1}. {name}({params_str}) - {desc}")
+        except Exception as e:
+            logger.error("Error processing tool %s: %s", i, e)
+            lines.append(f"{i+1}. Error processing tool")
+    return "\n".join(lines)
+
+def build_system_prompt(tools) -> str:
+    """The agent's system prompt with the available tools appended"""
+    return MATH_AGENT_SYSTEM_PROMPT + """\nAvailable Tools: """ + describe_tools(tools)
+
+def snapshot_key(server_info) -> str:
+    """
+    Key of the capabilities of a server: its declared name and version (mcp-server.py declares a
+    hash of its own source) and a hash of the prompt configuration
+    """
+    prompt_hash = hashlib.blake2b(MATH_AGENT_SYSTEM_PROMPT.encode(), digest_size=8).hexdigest()
+    return f"{server_info.name}/{server_info.version}/{prompt_hash}/{SNAPSHOT_FORMAT}"
+
+class CapabilitySnapshot:
+    """Tool list and rendered system prompt of a server, as of an earlier start"""
+
+    __slots__ = ('tools', 'system_prompt')
+
+    def __init__(self, tools: List[types.Tool], system_prompt: str):
+        self.tools = tools
+        self.system_prompt = system_prompt
+
+def _read(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_snapshot(server_info, path: str = CAPABILITY_SNAPSHOT_PATH) -> Optional[CapabilitySnapshot]:
+    """Snapshot for the server that just initialized, None if there is none or it is stale"""
+    if not path:
+        return None
+    entry = _read(path).get(snapshot_key(server_info))
+    if entry is None:
+        logger.info("No capability snapshot for %s %s", server_info.name, server_info.version)
+        return None
+    try:
+        tools = [types.Tool.model_validate(tool) for tool in entry["tools"]]
+    except (KeyError, ValueError) as e:
+        logger.warning("Ignoring invalid capability snapshot: %s", e)
+        return None
+    logger.info("Loaded capability snapshot for %s %s: %s tools", server_info.name, server_info.version, len(tools))
+    return CapabilitySnapshot(tools, entry["system_prompt"])
+
+def save_snapshot(server_info, tools, system_prompt: str, path: str = CAPABILITY_SNAPSHOT_PATH):
+    """Store the capabilities of a server for the next start; the file is replaced atomically"""
+    if not path:
+        return
+    snapshots = _read(path)
+    snapshots[snapshot_key(server_info)] = {
+        "saved_at": time.time(),
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+        "system_prompt": system_prompt,
+    }
+    # Keep the most recently saved snapshots
+    newest = sorted(snapshots.items(), key=lambda item: item[1].get("saved_at", 0))[-MAX_SNAPSHOTS:]
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(newest), f)
+        os.replace(tmp_path, path)
+        logger.info("Saved capability snapshot for %s %s", server_info.name, server_info.version)
+    except OSError as e:
+        logger.warning("Could not save capability snapshot: %s", e)
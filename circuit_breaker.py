@@ -0,0 +1,153 @@
+import asyncio
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict
+
+from agent_config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, TOOL_TIMEOUT, TOOL_TIMEOUTS
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('circuit_breaker', 'circuit_breaker.log')
+
+# Breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised without calling the tool while its circuit breaker is open"""
+
+class ToolTimeoutError(asyncio.TimeoutError):
+    """A tool call exceeded its deadline"""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one tool. After failure_threshold failures in a row
+    the circuit opens and calls fail fast; after reset_timeout one probe call is let through
+    (half-open), which closes the circuit on success or opens it again on failure.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"calls": 0, "failures": 0, "timeouts": 0, "rejected": 0, "trips": 0}
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self._reject()
+            self.state = HALF_OPEN
+            logger.info("Circuit for %s half-open, probing", self.name)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self._reject()
+            self._probe_in_flight = True
+        self.stats["calls"] += 1
+
+    def _reject(self):
+        self.stats["rejected"] += 1
+        retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"Tool {self.name} is unavailable (circuit open, next probe in {retry_in:.1f}s)")
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info("Circuit for %s closed", self.name)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self, timeout: bool = False):
+        self.stats["failures"] += 1
+        if timeout:
+            self.stats["timeouts"] += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.stats["trips"] += 1
+                logger.warning("Circuit for %s opened after %s consecutive failure(s)", self.name, self.consecutive_failures)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, **self.stats}
+
+class ToolGuard:
+    """Per-tool deadlines and circuit breakers around tool calls"""
+
+    def __init__(self, default_timeout: float = TOOL_TIMEOUT, timeouts: Dict[str, float] = None,
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.default_timeout = default_timeout
+        self.timeouts = dict(TOOL_TIMEOUTS if timeouts is None else timeouts)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def timeout_for(self, tool: str) -> float:
+        return self.timeouts.get(tool, self.default_timeout)
+
+    def breaker(self, tool: str) -> CircuitBreaker:
+        breaker = self.breakers.get(tool)
+        if breaker is None:
+            breaker = self.breakers[tool] = CircuitBreaker(tool, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    async def call(self, tool: str, operation: Callable[..., Awaitable[Any]], *args,
+                   retry: Callable[..., Awaitable[Any]] = None, **kwargs) -> Any:
+        """
+        One logical call: await operation(*args, **kwargs) within the tool's deadline, admitted by
+        the tool's breaker and recorded in it once. `retry` (e.g. partial(retry_async, TOOL_RETRY))
+        runs the attempts, so retried failures count once. Timeouts, exceptions and results
+        flagged isError count as failures. On timeout only the agent stops waiting; the server
+        may still finish the call.
+        """
+        breaker = self.breaker(tool)
+        breaker.before_call()
+        attempt = partial(self._within_deadline, tool, operation)
+        try:
+            if retry is None:
+                result = await attempt(*args, **kwargs)
+            else:
+                result = await retry(attempt, *args, name=f"tool:{tool}", **kwargs)
+        except ToolTimeoutError:
+            breaker.record_failure(timeout=True)
+            raise
+        except asyncio.CancelledError:
+            breaker._probe_in_flight = False
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        if getattr(result, 'isError', False):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return result
+
+    async def _within_deadline(self, tool: str, operation: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        timeout = self.timeout_for(tool)
+        try:
+            return await asyncio.wait_for(operation(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Tool %s timed out after %gs", tool, timeout)
+            raise ToolTimeoutError(f"Tool {tool} timed out after {timeout:g}s")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Breaker state, call, failure, timeout and rejection counts per tool"""
+        return {tool: breaker.metrics() for tool, breaker in self.breakers.items()}
+
+_default_guard = None
+
+def get_tool_guard() -> ToolGuard:
+    """Process-wide tool guard, so breaker state survives reconnects"""
+    global _default_guard
+    if _default_guard is None:
+        _default_guard = ToolGuard()
+    return _default_guard
@@ -1,96 +1,265 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from logger_config import setup_logger
 from memory import Memory
-import logging
+from results import ToolResult, args_hash
+from perception import FunctionCallInput, PowerPointOperationInput, FinalAnswerOutput
+from agent_config import PLANNER_BYPASS_LLM
 
-# Setup logger with debug level
+# Setup logger
 logger = setup_logger('decision', 'decision.log')
-logger.setLevel(logging.DEBUG)
+
+# Tool whose result is the final answer of the canonical query
+FINAL_CALCULATION = 'int_list_to_exponential_sum'
+
+# Calls whose result feeds a known follow-up call: tool -> (follow-up tool, parameter receiving the result)
+FOLLOW_UP_CALLS = {
+    'strings_to_chars_to_int': ('int_list_to_exponential_sum', 'int_list'),
+}
+
+# Words of a query asking for a follow-up call; the planner only makes the call itself for such queries
+FOLLOW_UP_KEYWORDS = {
+    'int_list_to_exponential_sum': ('exponential',),
+}
+
+# Result rectangle of the visualization (inches)
+RESULT_RECTANGLE = {"x1": 2, "y1": 2, "x2": 7, "y2": 5}
+
+def visualization_operations(value) -> list:
+    """Slide operations showing a final result, applied as one apply_slide_operations batch"""
+    return [
+        {"operation": "open_powerpoint", "params": {}},
+        {"operation": "draw_rectangle", "params": dict(RESULT_RECTANGLE)},
+        {"operation": "add_text_in_powerpoint", "params": {"text": f"Final Result:\n{value}"}},
+        {"operation": "close_powerpoint", "params": {}},
+    ]
+
+# Planner states
+COMPUTE = 'compute'
+FOLLOW_UP = 'follow_up'
+VISUALIZE = 'visualize'
+ADD_TEXT = 'add_text'
+CLOSE = 'close'
+DONE = 'done'
+
+# Transition table, checked in order: (state, condition, action builder, deterministic).
+# Conditions and builders name DecisionMaker methods. A deterministic transition yields a
+# concrete action the agent executes directly; the others only steer the LLM prompt.
+TRANSITIONS = (
+    (DONE, '_visualization_done', '_final_answer', True),
+    (CLOSE, '_text_added_while_open', '_close_powerpoint', True),
+    (ADD_TEXT, '_open_without_text', '_add_text', True),
+    (VISUALIZE, '_visualization_untried', '_visualize', True),
+    (VISUALIZE, '_have_final_result', '_visualize_with_llm', False),
+    (FOLLOW_UP, '_have_follow_up_input', '_follow_up_call', True),
+    (COMPUTE, '_nothing_done', '_compute_starting', False),
+    (COMPUTE, '_always', '_compute_in_progress', False),
+)
 
 class DecisionMaker:
-    def __init__(self):
-        self.memory = Memory()
+    def __init__(self, memory: Memory, query: str = None):
+        self.memory = memory
+        self.query = (query or "").lower()
         self.text_added = False
         self.visualization_complete = False
+        self.state = COMPUTE
+        self._final_result = None
+        self._follow_up = None
+        self._planned_calls = set()
+        self._checkpoint = None
+        self.stats = {"planned": 0, "open_ended": 0, "llm_calls": 0}
         logger.info("Decision maker initialized")
 
     async def decide_next_action(self, current_state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Decide the next action based on current state and memory
-        Returns a decision dict with action type and parameters
+        Returns a decision dict with action type and parameters; decisions marked
+        "deterministic" are complete actions that need no LLM call
         """
         try:
-            # Get relevant context from memory
-            recent_responses = self.memory.get_recent_memories(type='iteration_response')
-            
-            # Check if text was just added successfully
-            if any("Text added successfully" in str(resp.content) for resp in recent_responses[-2:]):
+            # Check if text was added successfully in this run
+            if not self.text_added and self.memory.results.latest('add_text_in_powerpoint', run_id=self.memory.run_id):
                 self.text_added = True
                 logger.info("Text has been added to PowerPoint")
 
-            # If text has been added, close PowerPoint and finish
-            if self.text_added:
-                if self.memory.is_powerpoint_open and not self.visualization_complete:
-                    logger.info("Text added, closing PowerPoint")
-                    self.visualization_complete = True
-                    return {
-                        "type": "powerpoint",
-                        "operation": "close_powerpoint",
-                        "params": {}
-                    }
-                else:
-                    logger.info("All operations complete, returning final answer")
-                    return {
-                        "type": "final_answer",
-                        "value": 9.346221114186287e+36
-                    }
-
-            # Check if we have calculation results
-            have_calculation = any("returned" in str(resp.content) and any(
-                calc_marker in str(resp.content) 
-                for calc_marker in ["ASCII values", "exponential", "sum"]
-            ) for resp in recent_responses)
-
-            # If we haven't started any operations yet
-            if not recent_responses:
-                logger.info("Starting new computation sequence")
-                return {
-                    "type": "function_call",
-                    "phase": "computation",
-                    "status": "starting"
-                }
-
-            if have_calculation:
-                # If PowerPoint isn't open
-                if not self.memory.is_powerpoint_open:
-                    logger.info("Starting PowerPoint visualization phase")
-                    return {
-                        "type": "powerpoint",
-                        "operation": "open_powerpoint",
-                        "params": {}
-                    }
-                
-                # If PowerPoint is open but text hasn't been added
-                if self.memory.is_powerpoint_open and not self.text_added:
-                    logger.info("Adding calculation result to PowerPoint")
-                    return {
-                        "type": "powerpoint",
-                        "operation": "add_text_in_powerpoint",
-                        "params": {"text": "Final Result:\n9.346221114186287e+36"}
-                    }
-
-            # Continue computation if we don't have calculation results
-            logger.info("Continuing computation phase")
-            return {
-                "type": "function_call",
-                "phase": "computation",
-                "status": "in_progress"
-            }
+            self._final_result = self.final_calculation()
+            self._follow_up = None
+
+            for state, condition, build, deterministic in TRANSITIONS:
+                if getattr(self, condition)():
+                    decision = getattr(self, build)()
+                    break
+            if deterministic and not PLANNER_BYPASS_LLM:
+                deterministic = decision["type"] == "final_answer"
+            if deterministic and decision["type"] != "final_answer":
+                name = decision.get("function") or decision.get("operation")
+                self._planned_calls.add(self._call_key((name, decision["params"])))
+            if decision["type"] != "final_answer":
+                decision["deterministic"] = deterministic
+                self.stats["planned" if deterministic else "open_ended"] += 1
+            if state != self.state:
+                logger.info("Planner state %s -> %s", self.state, state)
+            self.state = state
+            return decision
 
         except Exception as e:
             logger.error(f"Error in decision making: {str(e)}")
             return None
 
+    # Conditions
+
+    def _visualization_done(self) -> bool:
+        return self.text_added and not self.memory.is_powerpoint_open
+
+    def _text_added_while_open(self) -> bool:
+        return self.text_added and self.memory.is_powerpoint_open
+
+    def _open_without_text(self) -> bool:
+        return self._final_result is not None and self.memory.is_powerpoint_open
+
+    def _have_final_result(self) -> bool:
+        return self._final_result is not None
+
+    def _visualization_untried(self) -> bool:
+        """The final result is known and its slide batch was not planned before; if it failed, the LLM takes over"""
+        return self._have_final_result() and self._call_key(self._visualization_call()) not in self._planned_calls
+
+    def _have_follow_up_input(self) -> bool:
+        """
+        The input of the final calculation is known and the query asks for it, so the call itself
+        is fully determined. For other queries the model decides what to do with the result.
+        """
+        follow_up = self._follow_up_candidate()
+        if follow_up is None or not self._query_asks_for(follow_up[0]):
+            return False
+        if self._call_key(follow_up) in self._planned_calls:
+            return False  # planned before and it did not produce a result: let the LLM take over
+        self._follow_up = follow_up
+        return True
+
+    @staticmethod
+    def _call_key(call: Tuple[str, Dict[str, Any]]) -> tuple:
+        return call[0], args_hash(call[1])
+
+    def _follow_up_candidate(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(tool, params) of the final calculation on the result of the step before it, if known"""
+        run_id = self.memory.run_id
+        for tool, (follow_up, param) in FOLLOW_UP_CALLS.items():
+            step = self.memory.results.latest(tool, run_id=run_id)
+            if follow_up == FINAL_CALCULATION and step is not None:
+                return follow_up, {param: step.value}
+        return None
+
+    def _query_asks_for(self, tool: str) -> bool:
+        return any(word in self.query for word in FOLLOW_UP_KEYWORDS.get(tool, ()))
+
+    def predict_next_call(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Most likely next function call while the LLM decides an open-ended step, for speculative
+        execution: the follow-up of the last computed step, unless it already has a result.
+        A call that was planned or sent speculatively before and still has no result failed
+        (successful results are cached), so it is not sent again.
+        """
+        if self._final_result is not None:
+            return None
+        follow_up = self._follow_up_candidate()
+        if follow_up is None or self._call_key(follow_up) in self._planned_calls:
+            return None
+        return follow_up
+
+    def speculation_sent(self, call: Tuple[str, Dict[str, Any]]):
+        """Record a predicted call the Speculator actually started, so it is not sent or planned again"""
+        self._planned_calls.add(self._call_key(call))
+
+    def _nothing_done(self) -> bool:
+        return not self.memory.count_memories('iteration_response')
+
+    def _always(self) -> bool:
+        return True
+
+    # Actions
+
+    def _final_answer(self) -> Dict[str, Any]:
+        # PowerPoint is closed, possibly by the same batch that added the text
+        self.visualization_complete = True
+        logger.info("All operations complete, returning final answer")
+        final_result = self._final_result
+        return {
+            "type": "final_answer",
+            "value": final_result.value if final_result else self.memory.get_last_calculation_result()
+        }
+
+    def _close_powerpoint(self) -> Dict[str, Any]:
+        logger.info("Text added, closing PowerPoint")
+        self.visualization_complete = True
+        return {"type": "powerpoint", "operation": "close_powerpoint", "params": {}}
+
+    def _add_text(self) -> Dict[str, Any]:
+        logger.info("Adding calculation result to PowerPoint")
+        return {
+            "type": "powerpoint",
+            "operation": "add_text_in_powerpoint",
+            "params": {"text": f"Final Result:\n{self._final_result.value}"}
+        }
+
+    def _visualization_call(self) -> Tuple[str, Dict[str, Any]]:
+        # Build the whole slide in one atomic batch
+        return "apply_slide_operations", {"operations": visualization_operations(self._final_result.value)}
+
+    def _visualize(self) -> Dict[str, Any]:
+        logger.info("Starting PowerPoint visualization phase")
+        operation, params = self._visualization_call()
+        return {"type": "powerpoint", "operation": operation, "params": params}
+
+    def _visualize_with_llm(self) -> Dict[str, Any]:
+        logger.info("Planned slide batch did not complete, asking the LLM")
+        return {"type": "powerpoint", "phase": "visualization", "status": "the planned slide batch failed"}
+
+    def _follow_up_call(self) -> Dict[str, Any]:
+        function, params = self._follow_up
+        logger.info("Calling %s on the result of the previous step", function)
+        return {"type": "function_call", "function": function, "params": params}
+
+    def _compute_starting(self) -> Dict[str, Any]:
+        logger.info("Starting new computation sequence")
+        return {"type": "function_call", "phase": "computation", "status": "starting"}
+
+    def _compute_in_progress(self) -> Dict[str, Any]:
+        # Continue computation if we don't have calculation results
+        logger.debug("Continuing computation phase")
+        return {"type": "function_call", "phase": "computation", "status": "in_progress"}
+
+    def planned_action(self, decision: Dict[str, Any]):
+        """Typed action for a deterministic decision, in the same form as a validated LLM response"""
+        if decision["type"] == "function_call":
+            return FunctionCallInput(function=decision["function"], params=decision["params"])
+        if decision["type"] == "powerpoint":
+            return PowerPointOperationInput(operation=decision["operation"], params=decision["params"])
+        return FinalAnswerOutput(value=decision["value"])
+
+    def final_calculation(self) -> Optional[ToolResult]:
+        """
+        Result of the final calculation for the current run. If this run already produced the input
+        of the final calculation and an earlier query computed it for the same input, that result is
+        reused so neither the LLM nor the tool is called again.
+        """
+        results = self.memory.results
+        run_id = self.memory.run_id
+        final_result = results.latest(FINAL_CALCULATION, run_id=run_id)
+        if final_result is not None:
+            return final_result
+
+        for tool, (follow_up, param) in FOLLOW_UP_CALLS.items():
+            if follow_up != FINAL_CALCULATION:
+                continue
+            step = results.latest(tool, run_id=run_id)
+            if step is None:
+                continue
+            cached = results.lookup(follow_up, {param: step.value})
+            if cached is not None:
+                logger.info("Reusing %s result from iteration %s of an earlier query", follow_up, cached.iteration + 1)
+                return self.memory.reuse_result(cached)
+        return None
+
     def validate_decision(self, decision: Dict[str, Any]) -> bool:
         """
         Validate that a decision is valid given current state
@@ -126,7 +295,7 @@ class DecisionMaker:
                     logger.warning("Invalid operation: PowerPoint must be open first")
                     return False
 
-            logger.info(f"Decision validated: {decision}")
+            logger.debug("Decision validated: %s", decision)
             return True
 
         except Exception as e:
@@ -137,4 +306,24 @@ class DecisionMaker:
         """Reset the decision maker state"""
         self.text_added = False
         self.visualization_complete = False
-        logger.info("Decision maker state reset")
\ No newline at end of file
+        self.state = COMPUTE
+        self._final_result = None
+        self._follow_up = None
+        self._planned_calls.clear()
+        self._checkpoint = None
+        logger.info("Decision maker state reset")
+
+    def checkpoint(self):
+        """Record the planner state together with Memory.checkpoint()"""
+        self._checkpoint = (self.state, self.text_added, self.visualization_complete, frozenset(self._planned_calls))
+
+    def rollback_to_checkpoint(self):
+        """
+        Return to the state of the last checkpoint along with Memory.rollback_to_checkpoint(), so
+        calls planned by an interrupted iteration are planned again rather than left to the LLM
+        """
+        if self._checkpoint is None:
+            self.reset()
+            return
+        self.state, self.text_added, self.visualization_complete, planned_calls = self._checkpoint
+        self._planned_calls = set(planned_calls)
\ No newline at end of file
@@ -1,32 +1,167 @@
+import atexit
+import copy
+import itertools
+import json
 import logging
 import logging.handlers
 import os
+import queue
+import threading
+
+from agent_config import (
+    LOG_ENABLED, LOG_LEVEL, LOG_LEVELS, LOG_SAMPLE_RATES, LOG_MAX_MESSAGE_CHARS, LOG_FORMAT
+)
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+
+def truncate_message(message: str, max_chars: int = LOG_MAX_MESSAGE_CHARS) -> str:
+    if max_chars and len(message) > max_chars:
+        return f"{message[:max_chars]}... [{len(message) - max_chars} chars truncated]"
+    return message
+
+class TruncatingFormatter(logging.Formatter):
+    """Text formatter that cuts long messages (prompts, arrays) to a bounded size"""
+
+    def __init__(self, fmt: str = None, max_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__(fmt)
+        self.max_chars = max_chars
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate_message(record.message, self.max_chars)
+        return super().formatMessage(record)
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def __init__(self, max_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": truncate_message(record.getMessage(), self.max_chars),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keep one in `rate` records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or next(self._counter) % self.rate == 0
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Merges msg % args into a copy of the record before enqueueing it, so mutable arguments
+    (lists, dicts) are logged as they were at the call; only records that passed the level
+    and sampling checks get here. Truncation, layout and file writes stay on the writer thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class FileRouter(logging.Handler):
+    """Writer-side handler sending each record to the log file of its logger"""
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        handler = self.routes.get(record.name)
+        if handler is None:
+            return False
+        handler.handle(record)
+        return True
+
+    def flush(self):
+        for handler in set(self.routes.values()):
+            handler.flush()
+
+    def close(self):
+        for handler in set(self.routes.values()):
+            handler.close()
+        super().close()
+
+_lock = threading.Lock()
+_queue = queue.SimpleQueue()
+_queue_handler = DeferredQueueHandler(_queue)
+_router = FileRouter()
+_file_handlers = {}
+_listener = None
+_configured = set()
+
+def _formatter() -> logging.Formatter:
+    if LOG_FORMAT == 'json':
+        return JsonLinesFormatter()
+    return TruncatingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+def _file_handler(log_file: str) -> logging.Handler:
+    """Rolling file handler, one per file - a new file is started when the size reaches 5MB"""
+    if LOG_FORMAT == 'json' and log_file.endswith('.log'):
+        log_file = f"{log_file[:-4]}.jsonl"
+    handler = _file_handlers.get(log_file)
+    if handler is None:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(LOG_DIR, log_file),
+            maxBytes=5*1024*1024,  # 5MB
+            backupCount=5
+        )
+        handler.setFormatter(_formatter())
+        _file_handlers[log_file] = handler
+    return handler
+
+def _start_listener():
+    global _listener
+    if _listener is None:
+        _listener = logging.handlers.QueueListener(_queue, _router)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Write out queued records and stop the background writer"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        _router.flush()
 
 def setup_logger(name, log_file):
-    # Create logs directory if it doesn't exist
-    log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Create logger
+    """
+    Logger writing to logs/<log_file> through the shared background writer. Calling it again
+    for the same name returns the configured logger without adding handlers.
+    """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    
-    # Create formatters
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Create handlers
-    # Rolling file handler - create a new file when size reaches 5MB
-    file_handler = logging.handlers.RotatingFileHandler(
-        os.path.join(log_dir, log_file),
-        maxBytes=5*1024*1024,  # 5MB
-        backupCount=5
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(file_formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+    with _lock:
+        if name in _configured:
+            return logger
+        _configured.add(name)
+        # Records stay in the queued pipeline; handlers on the root logger (e.g. FastMCP's
+        # console handler) would otherwise format and write each one synchronously
+        logger.propagate = False
+        if not LOG_ENABLED:
+            logger.setLevel(logging.CRITICAL + 1)
+            return logger
+
+        logger.setLevel(LOG_LEVELS.get(name, LOG_LEVEL))
+        rate = LOG_SAMPLE_RATES.get(name)
+        if rate and rate > 1:
+            logger.addFilter(SamplingFilter(rate))
+        _router.routes[name] = _file_handler(log_file)
+        logger.addHandler(_queue_handler)
+        _start_listener()
+    return logger
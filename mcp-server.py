@@ -1,22 +1,38 @@
 # basic import 
 from mcp.server.fastmcp import FastMCP, Image
+from mcp.server.fastmcp.exceptions import ToolError
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
 from PIL import Image as PILImage
+import asyncio
+import hashlib
+import importlib.metadata
 import math
 import sys
-from pywinauto.application import Application
-import win32gui
-import win32con
 import time
-from win32api import GetSystemMetrics
+try:
+    from pywinauto.application import Application
+    import win32gui
+    import win32con
+    from win32api import GetSystemMetrics
+    GUI_AVAILABLE = True
+except ImportError:
+    # Not on Windows: PowerPoint cannot be launched, slides are only written and rendered
+    GUI_AVAILABLE = False
 from pptx import Presentation
 from pptx.util import Inches
 import os
+import tempfile
 from pptx.dml.color import RGBColor
 from pptx.util import Pt
 from logger_config import setup_logger
+from agent_config import MCP_HEADLESS, MCP_SERVER_TOOLS
+from slide_renderer import get_slide_renderer
+from shared_arrays import exact_sum, make_descriptor, read_array
+from text_stream import scratch_output_path, stream_code_points
+from profiling import format_summary, get_profiler
+from typing import Optional
 
 # Setup logger
 logger = setup_logger('mcp_server', 'mcp_server.log')
@@ -25,6 +41,120 @@ logger = setup_logger('mcp_server', 'mcp_server.log')
 logger.info('Initializing MCP server with Calculator configuration')
 mcp = FastMCP("Calculator")
 
+# Version declared at initialize. It changes with this file and the MCP library, which determine
+# the tool schemas, so clients can reuse a cached tool list while it matches.
+# A shard exposing a subset of the tools declares a different version.
+with open(__file__, 'rb') as source:
+    digest = hashlib.blake2b(source.read(), digest_size=8)
+digest.update(",".join(sorted(MCP_SERVER_TOOLS)).encode())
+SERVER_VERSION = f"{importlib.metadata.version('mcp')}+{digest.hexdigest()}"
+mcp._mcp_server.version = SERVER_VERSION
+
+# SLIDE HELPERS (shared by the single operations and the batch tool)
+
+PRESENTATION_FILE = 'presentation.pptx'
+
+# Headless mode: the presentation file is still written, but PowerPoint is never launched or
+# killed and the waits for its GUI are skipped; use render_slide to preview the result
+HEADLESS = MCP_HEADLESS or not GUI_AVAILABLE
+if HEADLESS:
+    logger.info('Running headless: PowerPoint will not be launched')
+
+async def gui_wait(seconds: float):
+    """Give the PowerPoint GUI time to catch up (skipped when headless) without blocking other calls"""
+    if not HEADLESS:
+        await asyncio.sleep(seconds)
+
+def show_presentation(filename: str = PRESENTATION_FILE):
+    """Open the presentation in PowerPoint (skipped when headless)"""
+    if not HEADLESS:
+        os.startfile(filename)
+
+def rectangle_error(x1: int, y1: int, x2: int, y2: int):
+    """Error message for invalid rectangle coordinates, None if they are valid"""
+    if not (1 <= x1 <= 8 and 1 <= y1 <= 8 and 1 <= x2 <= 8 and 1 <= y2 <= 8):
+        return f"Coordinates must be between 1 and 8, got: ({x1},{y1}) to ({x2},{y2})"
+    if x2 <= x1 or y2 <= y1:
+        return f"End coordinates must be greater than start coordinates: ({x1},{y1}) to ({x2},{y2})"
+    return None
+
+# Rectangle a new presentation starts with, where the result is written
+DEFAULT_RECTANGLE = (2, 2, 6, 5)
+
+def new_presentation() -> Presentation:
+    """A new presentation with a title slide holding the default rectangle"""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    add_rectangle(slide, *DEFAULT_RECTANGLE)
+    return prs
+
+def add_rectangle(slide, x1: int, y1: int, x2: int, y2: int):
+    """Replace the shapes of a slide (text boxes are kept) with a rectangle, coordinates in inches"""
+    # Clear existing shapes except text boxes
+    for shape in list(slide.shapes):
+        if not shape.has_text_frame:
+            sp = shape._element
+            sp.getparent().remove(sp)
+    
+    # Convert coordinates to inches
+    left = Inches(x1)
+    top = Inches(y1)
+    width = Inches(x2 - x1)
+    height = Inches(y2 - y1)
+    
+    print(f"[MCP Tool] Rectangle dimensions - left={left}, top={top}, width={width}, height={height}")
+    
+    # Add rectangle
+    shape = slide.shapes.add_shape(
+        1,  # MSO_SHAPE.RECTANGLE
+        left, top, width, height
+    )
+    
+    # Make the rectangle more visible
+    shape.fill.solid()
+    shape.fill.fore_color.rgb = RGBColor(255, 255, 255)  # White fill
+    shape.line.color.rgb = RGBColor(0, 0, 0)  # Black border
+    shape.line.width = Pt(4)  # Thicker border
+    return shape
+
+def add_text(slide, text: str):
+    """Add a centered, bold text box inside the result rectangle"""
+    # Add a text box positioned inside the rectangle
+    left = Inches(2)  # Centered horizontally
+    top = Inches(3)   # Centered vertically
+    width = Inches(4)  # Width for the text
+    height = Inches(2) # Height for the text
+    
+    textbox = slide.shapes.add_textbox(left, top, width, height)
+    text_frame = textbox.text_frame
+    text_frame.clear()  # Clear existing text
+    text_frame.word_wrap = True
+    text_frame.vertical_anchor = 1  # Middle vertical alignment
+    
+    # Format the text with the exact final result
+    p = text_frame.add_paragraph()
+    p.text = text
+    p.alignment = 1  # Center align
+    
+    # Format the text with appropriate font
+    for run in p.runs:
+        run.font.size = Pt(28)  # Slightly smaller font for better fit
+        run.font.bold = True
+        run.font.color.rgb = RGBColor(0, 0, 0)  # Black text
+    return textbox
+
+def save_atomically(prs: Presentation, filename: str = PRESENTATION_FILE):
+    """Write to a temporary file next to the target, then swap it in; the old file survives a failed save"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(suffix='.pptx', dir=directory)
+    os.close(fd)
+    try:
+        prs.save(tmp_path)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
 # DEFINE TOOLS
 
 #addition tool
@@ -37,11 +167,12 @@ def add(a: int, b: int) -> int:
     return result
 
 @mcp.tool()
-def add_list(l: list) -> int:
+def add_list(l: list, shared_array: Optional[dict] = None) -> int:
     """Add all numbers in a list"""
-    logger.debug(f'Adding list of numbers: {l}')
-    result = sum(l)
-    logger.info(f'List addition result: {result}')
+    logger.debug('Adding list of numbers: %s', l)
+    # A shared array arrives as a descriptor in shared_array (l is then empty) and is read as a NumPy view
+    result = read_array(shared_array or l, exact_sum)
+    logger.info('List addition result: %s', result)
     return result
 
 # subtraction tool
@@ -104,7 +235,7 @@ def factorial(a: int) -> int:
     """factorial of a number"""
     logger.debug(f'Computing factorial of: {a}')
     result = int(math.factorial(a))
-    logger.info(f'Factorial result: {result}')
+    logger.info('Factorial result: %s', result)
     return result
 
 # log tool
@@ -174,30 +305,48 @@ def create_thumbnail(image_path: str) -> Image:
 @mcp.tool()
 def strings_to_chars_to_int(string: str) -> list[int]:
     """Return the ASCII values of the characters in a word"""
-    logger.info(f'Starting tool execution: strings_to_chars_to_int with param string={string}')
+    logger.info('Starting tool execution: strings_to_chars_to_int with param string=%s', string)
     result = [int(ord(char)) for char in string]
-    logger.info(f'Tool execution completed: strings_to_chars_to_int with result {result}')
+    logger.info('Tool execution completed: strings_to_chars_to_int with result %s', result)
+    return result
+
+@mcp.tool()
+def file_chars_to_int(path: str, write_codes: bool = False, histogram: bool = True, exponential_sum: bool = True) -> dict:
+    """Return the number of characters in a text file, a histogram of their ASCII/Unicode values
+    and the sum of their exponentials, reading the file in chunks. With write_codes the values
+    are also written to a scratch file and returned as "codes", which list tools accept"""
+    logger.info('Starting tool execution: file_chars_to_int with param path=%s', path)
+    if write_codes:
+        output_path = scratch_output_path()
+        with open(output_path, 'wb') as output:
+            result = stream_code_points(path, output, histogram, exponential_sum)
+        # First, so the descriptor survives when the rendered result is cut
+        result = {"codes": make_descriptor("mmap", output_path, "uint32", result["count"]), **result}
+    else:
+        result = stream_code_points(path, None, histogram, exponential_sum)
+    logger.info('Tool execution completed: file_chars_to_int counted %s characters', result["count"])
     return result
 
 @mcp.tool()
-def int_list_to_exponential_sum(int_list: list) -> float:
+def int_list_to_exponential_sum(int_list: list, shared_array: Optional[dict] = None) -> float:
     """Return sum of exponentials of numbers in a list"""
-    logger.info(f'Starting tool execution: int_list_to_exponential_sum with param int_list={int_list}')
-    result = sum(math.exp(i) for i in int_list)
-    logger.info(f'Tool execution completed: int_list_to_exponential_sum with result {result}')
+    logger.info('Starting tool execution: int_list_to_exponential_sum with param int_list=%s', int_list)
+    # math.exp summed in order, so a shared array gives exactly the same result as a JSON list
+    result = read_array(shared_array or int_list, lambda values: sum(math.exp(i) for i in values))
+    logger.info('Tool execution completed: int_list_to_exponential_sum with result %s', result)
     return result
 
 @mcp.tool()
 def fibonacci_numbers(n: int) -> list:
     """Return the first n Fibonacci Numbers"""
-    logger.info(f'Starting tool execution: fibonacci_numbers with param n={n}')
+    logger.info('Starting tool execution: fibonacci_numbers with param n=%s', n)
     if n <= 0:
         return []
     fib_sequence = [0, 1]
     for _ in range(2, n):
         fib_sequence.append(fib_sequence[-1] + fib_sequence[-2])
     result = fib_sequence[:n]
-    logger.info(f'Tool execution completed: fibonacci_numbers with result {result}')
+    logger.info('Tool execution completed: fibonacci_numbers with result %s', result)
     return result
 
 @mcp.tool()
@@ -205,8 +354,9 @@ async def close_powerpoint() -> dict:
     """Close PowerPoint"""
     try:
         # Close PowerPoint
-        os.system('taskkill /F /IM POWERPNT.EXE')
-        time.sleep(2)
+        if not HEADLESS:
+            os.system('taskkill /F /IM POWERPNT.EXE')
+        await gui_wait(2)
         
         return {
             "content": [
@@ -233,27 +383,19 @@ async def open_powerpoint() -> dict:
     try:
         # Close any existing PowerPoint instances
         await close_powerpoint()
-        time.sleep(3)  # Increased wait time
-        
-        # Create a new presentation
-        prs = Presentation()
+        await gui_wait(3)  # Increased wait time
         
-        # Add a title slide
-        title_slide_layout = prs.slide_layouts[0]
-        slide = prs.slides.add_slide(title_slide_layout)
+        # Create a new presentation with the rectangle for the result, as the batch does
+        prs = new_presentation()
         
         # Save the presentation
         filename = 'presentation.pptx'
         prs.save(filename)
-        time.sleep(5)  # Increased wait time for file save
+        await gui_wait(5)  # Increased wait time for file save
         
         # Open the presentation
-        os.startfile(filename)
-        time.sleep(10)  # Increased wait time for PowerPoint to open
-        
-        # Draw a rectangle for the result
-        await draw_rectangle(2, 2, 6, 5)
-        time.sleep(3)  # Wait for rectangle to be drawn
+        show_presentation(filename)
+        await gui_wait(10)  # Increased wait time for PowerPoint to open
         
         return {
             "content": [
@@ -294,72 +436,32 @@ async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
         print(f"[MCP Tool] Converted coordinates: ({x1},{y1}) to ({x2},{y2})")
         
         # Validate coordinates
-        if not (1 <= x1 <= 8 and 1 <= y1 <= 8 and 1 <= x2 <= 8 and 1 <= y2 <= 8):
-            error_msg = f"Coordinates must be between 1 and 8, got: ({x1},{y1}) to ({x2},{y2})"
-            print(f"{error_msg}")
-            return {"content": [TextContent(type="text", text=error_msg)]}
-        
-        if x2 <= x1 or y2 <= y1:
-            error_msg = f"End coordinates must be greater than start coordinates: ({x1},{y1}) to ({x2},{y2})"
+        error_msg = rectangle_error(x1, y1, x2, y2)
+        if error_msg:
             print(f"{error_msg}")
             return {"content": [TextContent(type="text", text=error_msg)]}
         
         # Wait before modifying the presentation
-        time.sleep(2)
+        await gui_wait(2)
         
         # Ensure PowerPoint is closed before modifying the file
         await close_powerpoint()
-        time.sleep(2)
+        await gui_wait(2)
         
         try:
             # Open the existing presentation
             prs = Presentation('presentation.pptx')
             slide = prs.slides[0]
             
-            # Store existing text boxes
-            text_boxes = []
-            for shape in slide.shapes:
-                if shape.has_text_frame:
-                    text = shape.text_frame.text
-                    left = shape.left
-                    top = shape.top
-                    width = shape.width
-                    height = shape.height
-                    text_boxes.append((text, left, top, width, height))
-            
-            # Clear existing shapes except text boxes
-            for shape in slide.shapes:
-                if not shape.has_text_frame:
-                    sp = shape._element
-                    sp.getparent().remove(sp)
-            
-            # Convert coordinates to inches
-            left = Inches(x1)
-            top = Inches(y1)
-            width = Inches(x2 - x1)
-            height = Inches(y2 - y1)
-            
-            print(f"[MCP Tool] Rectangle dimensions - left={left}, top={top}, width={width}, height={height}")
-            
-            # Add rectangle
-            shape = slide.shapes.add_shape(
-                1,  # MSO_SHAPE.RECTANGLE
-                left, top, width, height
-            )
-            
-            # Make the rectangle more visible
-            shape.fill.solid()
-            shape.fill.fore_color.rgb = RGBColor(255, 255, 255)  # White fill
-            shape.line.color.rgb = RGBColor(0, 0, 0)  # Black border
-            shape.line.width = Pt(4)  # Thicker border
+            add_rectangle(slide, x1, y1, x2, y2)
             
             # Save the presentation
             prs.save('presentation.pptx')
-            time.sleep(2)
+            await gui_wait(2)
             
             # Reopen PowerPoint
-            os.startfile('presentation.pptx')
-            time.sleep(5)
+            show_presentation('presentation.pptx')
+            await gui_wait(5)
             
             print("[MCP Tool] Rectangle drawn successfully")
             return {
@@ -391,46 +493,25 @@ async def add_text_in_powerpoint(text: str) -> dict:
         print(f"[MCP Tool] Received text to add: {text}")
         
         # Wait before adding text
-        time.sleep(2)
+        await gui_wait(2)
         
         # Ensure PowerPoint is closed before modifying the file
         await close_powerpoint()
-        time.sleep(2)
+        await gui_wait(2)
         
         # Open the existing presentation
         prs = Presentation('presentation.pptx')
         slide = prs.slides[0]
         
-        # Add a text box positioned inside the rectangle
-        left = Inches(2)  # Centered horizontally
-        top = Inches(3)   # Centered vertically
-        width = Inches(4)  # Width for the text
-        height = Inches(2) # Height for the text
-        
-        textbox = slide.shapes.add_textbox(left, top, width, height)
-        text_frame = textbox.text_frame
-        text_frame.clear()  # Clear existing text
-        text_frame.word_wrap = True
-        text_frame.vertical_anchor = 1  # Middle vertical alignment
-        
-        # Format the text with the exact final result
-        p = text_frame.add_paragraph()
-        p.text = "Final Result: 9.346221114186287e+36"
-        p.alignment = 1  # Center align
-        
-        # Format the text with appropriate font
-        run = p.runs[0]
-        run.font.size = Pt(28)  # Slightly smaller font for better fit
-        run.font.bold = True
-        run.font.color.rgb = RGBColor(0, 0, 0)  # Black text
+        add_text(slide, text)
         
         # Save and wait
         prs.save('presentation.pptx')
-        time.sleep(5)
+        await gui_wait(5)
         
         # Reopen PowerPoint
-        os.startfile('presentation.pptx')
-        time.sleep(10)
+        show_presentation('presentation.pptx')
+        await gui_wait(10)
         
         print(f"[MCP Tool] Text added successfully: {text}")
         return {
@@ -452,8 +533,95 @@ async def add_text_in_powerpoint(text: str) -> dict:
             ]
         }
 
+@mcp.tool()
+async def apply_slide_operations(operations: list[dict]) -> dict:
+    """Apply several PowerPoint operations as one atomic batch. Each operation is
+    {"operation": name, "params": {...}} with name open_powerpoint, draw_rectangle,
+    add_text_in_powerpoint or close_powerpoint"""
+    logger.info('Starting tool execution: apply_slide_operations with %s operations', len(operations))
+    index = 0
+    try:
+        # Build the result in memory; nothing touches the file until every operation succeeded
+        prs = None
+        reopen = True
+        applied = []
+        for index, op in enumerate(operations):
+            name = op.get('operation')
+            params = op.get('params') or {}
+            if name == 'open_powerpoint':
+                prs = new_presentation()
+                reopen = True
+            elif name == 'close_powerpoint':
+                reopen = False
+            elif name in ('draw_rectangle', 'add_text_in_powerpoint'):
+                if prs is None:
+                    prs = Presentation(PRESENTATION_FILE)
+                slide = prs.slides[0]
+                if name == 'draw_rectangle':
+                    x1, y1, x2, y2 = (int(float(str(params[key]))) for key in ('x1', 'y1', 'x2', 'y2'))
+                    error_msg = rectangle_error(x1, y1, x2, y2)
+                    if error_msg:
+                        raise ValueError(error_msg)
+                    add_rectangle(slide, x1, y1, x2, y2)
+                else:
+                    add_text(slide, str(params.get('text', '')))
+            else:
+                raise ValueError(f"Unknown slide operation: {name}")
+            applied.append(name)
+
+        # Commit: close PowerPoint once, swap in the new file, reopen once
+        await close_powerpoint()
+        if prs is not None:
+            save_atomically(prs, PRESENTATION_FILE)
+            if reopen:
+                show_presentation(PRESENTATION_FILE)
+                await gui_wait(5)
+
+        logger.info('Tool execution completed: apply_slide_operations applied %s', applied)
+        return {
+            "content": [
+                TextContent(
+                    type="text",
+                    text=f"Applied {len(applied)} slide operations: {', '.join(applied)}"
+                )
+            ]
+        }
+    except Exception as e:
+        error_msg = f"Error in slide operation {index + 1}, no changes were saved: {str(e)}"
+        print(f"{error_msg}")
+        logger.error(error_msg)
+        # Raised, so the client gets a result flagged isError rather than text to inspect
+        raise ToolError(error_msg) from e
+
+@mcp.tool()
+def render_slide(index: int = 0, format: str = "png"):
+    """Render a slide of the current presentation without PowerPoint, as a PNG image or SVG text"""
+    logger.info('Starting tool execution: render_slide(%s, %s)', index, format)
+    try:
+        data = get_slide_renderer().render_file(PRESENTATION_FILE, int(index), format.lower())
+        logger.info('Tool execution completed: render_slide returned %s bytes', len(data))
+        if format.lower() == "svg":
+            return data.decode()
+        return Image(data=data, format="png")
+    except Exception as e:
+        error_msg = f"Error rendering slide {index}: {str(e)}"
+        logger.error(error_msg)
+        return {"content": [TextContent(type="text", text=error_msg)]}
+
 # DEFINE RESOURCES
 
+# Rendered preview of a slide of the current presentation
+@mcp.resource("slide://{index}", mime_type="image/png")
+def get_slide_preview(index: str) -> bytes:
+    """Get a PNG preview of a slide"""
+    return get_slide_renderer().render_file(PRESENTATION_FILE, int(index), "png")
+
+# Top functions and allocations of the most recent profile capture (see PROFILE_TARGETS)
+@mcp.resource("profile://latest")
+def get_latest_profile() -> str:
+    """Get the most recent profile capture"""
+    return format_summary(get_profiler().latest_summary())
+
 # Add a dynamic greeting resource
 @mcp.resource("greeting://{name}")
 def get_greeting(name: str) -> str:
@@ -477,10 +645,22 @@ def debug_error(error: str) -> list[base.Message]:
         base.AssistantMessage("I'll help debug that. What have you tried so far?"),
     ]
 
+# Run as one shard of a sharded deployment: expose only the tools in MCP_SERVER_TOOLS
+if MCP_SERVER_TOOLS:
+    for tool in mcp._tool_manager.list_tools():
+        if tool.name not in MCP_SERVER_TOOLS:
+            del mcp._tool_manager._tools[tool.name]
+    logger.info('Exposing tools: %s', sorted(MCP_SERVER_TOOLS))
+
+# Profile the tools selected in PROFILE_TARGETS (no-op when none are)
+get_profiler().instrument_tools(mcp)
+
 if __name__ == "__main__":
     # Check if running with mcp dev command
     print("STARTING THE SERVER")
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()  # Run without transport for dev server
+    elif len(sys.argv) > 1 and sys.argv[1] in ("sse", "streamable-http"):
+        mcp.run(transport=sys.argv[1])  # Serve over HTTP on FASTMCP_HOST:FASTMCP_PORT
     else:
         mcp.run(transport="stdio")  # Run with stdio for direct execution
@@ -1,76 +1,354 @@
-from typing import List, Any, Optional
-from dataclasses import dataclass
-from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional
+from collections import deque
+import asyncio
+import heapq
+from itertools import islice
+import threading
+import time
+import uuid
+from agent_config import MEMORY_DEFAULT_CAP, MEMORY_TYPE_CAPS
+from prompt_context import HANDLE_PATTERN, ContextCompactor
+from memory_log import MEMORY_EVENT, STATE_EVENT, SQLiteMemoryLog
+from results import CALCULATION, ResultRegistry, ToolResult
+from perception import format_iteration_response, render_limits, render_value
+from retrieval import RetrievalIndex
+from agent_config import RETRIEVAL_TOP_K
 from logger_config import setup_logger
 
 # Setup logger
 logger = setup_logger('memory', 'memory.log')
 
-@dataclass
 class MemoryItem:
     """Represents a single memory item"""
-    timestamp: datetime
-    type: str  # 'llm_response', 'tool_result', 'iteration_response'
-    content: Any
-    metadata: dict = None
+    __slots__ = ('seq', 'timestamp', 'iteration', 'type', 'content', 'metadata')
+
+    def __init__(self, seq: int, timestamp: float, iteration: int, type: str, content: Any, metadata: dict = None):
+        self.seq = seq  # monotonically increasing position within the session
+        self.timestamp = timestamp  # seconds since the epoch
+        self.iteration = iteration
+        self.type = type  # 'llm_response', 'tool_result', 'iteration_response'
+        self.content = content
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"MemoryItem(seq={self.seq}, iteration={self.iteration}, type={self.type!r}, content={self.content!r:.80})"
+
+class MemoryStore:
+    """
+    Bounded memory storage: one ring buffer per memory type plus an index by iteration.
+    Appends and "last k of type T" lookups cost O(1) and O(k) regardless of history size.
+    """
+
+    def __init__(self, type_caps: Dict[str, int] = None, default_cap: int = MEMORY_DEFAULT_CAP):
+        self.type_caps = dict(MEMORY_TYPE_CAPS if type_caps is None else type_caps)
+        self.default_cap = default_cap
+        self._by_type: Dict[str, deque] = {}
+        self._by_iteration: Dict[int, Dict[int, MemoryItem]] = {}
+        self._size = 0
+        self.evicted = 0
+
+    def _buffer(self, type: str) -> deque:
+        buffer = self._by_type.get(type)
+        if buffer is None:
+            buffer = self._by_type[type] = deque(maxlen=self.type_caps.get(type, self.default_cap))
+        return buffer
+
+    def _unindex(self, item: MemoryItem):
+        bucket = self._by_iteration[item.iteration]
+        del bucket[item.seq]
+        if not bucket:
+            del self._by_iteration[item.iteration]
+
+    def append(self, item: MemoryItem):
+        """Store an item, evicting the oldest item of the same type when its buffer is full"""
+        buffer = self._buffer(item.type)
+        if len(buffer) == buffer.maxlen:
+            self._unindex(buffer[0])
+            self._size -= 1
+            self.evicted += 1
+        buffer.append(item)
+        self._by_iteration.setdefault(item.iteration, {})[item.seq] = item
+        self._size += 1
+
+    def recent(self, type: str, k: int = None) -> List[MemoryItem]:
+        """Last k items of a type, oldest first"""
+        buffer = self._by_type.get(type)
+        if not buffer:
+            return []
+        if k is None or k >= len(buffer):
+            return list(buffer)
+        items = list(islice(reversed(buffer), k))
+        items.reverse()
+        return items
+
+    def iter_recent(self, type: str = None) -> Iterator[MemoryItem]:
+        """Iterate items newest first, optionally restricted to a type"""
+        if type is not None:
+            return reversed(self._by_type.get(type, ()))
+        return heapq.merge(
+            *(reversed(buffer) for buffer in self._by_type.values()),
+            key=lambda m: m.seq, reverse=True
+        )
+
+    def latest(self, type: str) -> Optional[MemoryItem]:
+        """Most recent item of a type"""
+        buffer = self._by_type.get(type)
+        return buffer[-1] if buffer else None
+
+    def count(self, type: str) -> int:
+        """Number of retained items of a type"""
+        return len(self._by_type.get(type, ()))
+
+    def by_iteration(self, iteration: int, type: str = None) -> List[MemoryItem]:
+        """Items recorded during an iteration, oldest first"""
+        items = list(self._by_iteration.get(iteration, {}).values())
+        if type is not None:
+            items = [m for m in items if m.type == type]
+        return items
+
+    def get(self, iteration: int, seq: int) -> Optional[MemoryItem]:
+        """Look up a retained item by iteration and sequence number"""
+        return self._by_iteration.get(iteration, {}).get(seq)
+
+    def truncate_after(self, seq: int):
+        """Drop every item newer than seq"""
+        for buffer in self._by_type.values():
+            while buffer and buffer[-1].seq > seq:
+                self._unindex(buffer.pop())
+                self._size -= 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[MemoryItem]:
+        """Iterate all retained items oldest first"""
+        return heapq.merge(*self._by_type.values(), key=lambda m: m.seq)
 
 class Memory:
-    """Global memory management class"""
-    _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Memory, cls).__new__(cls)
-            cls._instance._initialize()
-        return cls._instance
+    """Memory for a single agent session"""
+
+    def __init__(self, session_id: str = None, type_caps: Dict[str, int] = None,
+                 default_cap: int = MEMORY_DEFAULT_CAP, log: SQLiteMemoryLog = None,
+                 index: RetrievalIndex = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.log = log
+        self.index = index
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        self.type_caps = type_caps
+        self.default_cap = default_cap
+        # Reentrant so compound operations can hold it across several calls
+        self.lock = threading.RLock()
+        self.context = ContextCompactor()
+        # Tool results outlive resets so later queries in the session can reuse them
+        self.results = ResultRegistry()
+        self._initialize()
     
     def _initialize(self):
         """Initialize the memory storage"""
-        self.memories: List[MemoryItem] = []
+        self.store = MemoryStore(self.type_caps, self.default_cap)
+        self._seq = 0
+        # Every reset starts a new run in the durable log
+        self.run_id = uuid.uuid4().hex
+        if self.log:
+            self.log.start_run(self.run_id, self.session_id)
         self.last_response: Optional[Any] = None
         self.iteration: int = 0
-        self.iteration_responses: List[str] = []
         self.powerpoint_opened: bool = False
+        self._checkpoint = None
+        # Retrieval documents this session created since the last checkpoint
+        self._indexed: List[int] = []
+        self.context.reset_stats()
         logger.info("Memory system initialized")
 
+    @property
+    def memories(self) -> List[MemoryItem]:
+        """All retained memories, oldest first"""
+        with self.lock:
+            return list(self.store)
+
+    @property
+    def iteration_responses(self) -> List[str]:
+        """Contents of the retained iteration responses, oldest first"""
+        with self.lock:
+            return [m.content for m in self.store.recent('iteration_response')]
+
     def add_memory(self, type: str, content: Any, metadata: dict = None):
         """Add a new memory item"""
-        memory_item = MemoryItem(
-            timestamp=datetime.now(),
-            type=type,
-            content=content,
-            metadata=metadata or {}
-        )
-        self.memories.append(memory_item)
-        logger.debug(f"Added memory: {type} - {content}")
+        with self.lock:
+            self._seq += 1
+            memory_item = MemoryItem(self._seq, time.time(), self.iteration, type, content, metadata or None)
+            self.store.append(memory_item)
+            self.last_access = time.monotonic()
+            if self.log:
+                self.log.append(self.run_id, self._seq, self.iteration, MEMORY_EVENT, type, content, memory_item.metadata)
+            if self.index is not None and type == 'iteration_response' and isinstance(content, str):
+                first_new = self.index.next_id
+                doc_id = self.index.add(content, {'run_id': self.run_id, 'iteration': self.iteration})
+                if doc_id >= first_new:
+                    self._indexed.append(doc_id)
 
-        # Update relevant state based on memory type
-        if type == 'llm_response':
-            self.last_response = content
-        elif type == 'iteration_response':
-            self.iteration_responses.append(content)
+            # Update relevant state based on memory type
+            if type == 'llm_response':
+                self.last_response = content
+        logger.debug("[%s] Added memory #%s: %s", self.session_id, self._seq, type)
 
     def get_recent_memories(self, limit: int = None, type: str = None) -> List[MemoryItem]:
-        """Get recent memories, optionally filtered by type"""
-        filtered = self.memories
-        if type:
-            filtered = [m for m in filtered if m.type == type]
-        return filtered[-limit:] if limit else filtered
-
-    def get_context_for_prompt(self) -> str:
-        """Generate context string from recent memories for prompt construction"""
-        if not self.iteration_responses:
+        """Get recent memories, oldest first, optionally filtered by type"""
+        with self.lock:
+            self.last_access = time.monotonic()
+            if type:
+                return self.store.recent(type, limit)
+            if limit is None:
+                return list(self.store)
+            items = list(islice(self.store.iter_recent(), limit))
+            items.reverse()
+            return items
+
+    def iter_recent_memories(self, type: str = None) -> Iterator[MemoryItem]:
+        """Iterate memories newest first without copying, optionally filtered by type"""
+        return self.store.iter_recent(type)
+
+    def count_memories(self, type: str) -> int:
+        """Number of retained memories of a type"""
+        return self.store.count(type)
+
+    def get_iteration_memories(self, iteration: int, type: str = None) -> List[MemoryItem]:
+        """Get the memories recorded during one iteration"""
+        with self.lock:
+            return self.store.by_iteration(iteration, type)
+
+    def get_context_for_prompt(self, query: str = None, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """
+        Generate a token-budgeted context string from recent memories for prompt construction.
+        With a query and a retrieval index, the most relevant steps of earlier runs are included too.
+        """
+        with self.lock:
+            items = self.store.recent('iteration_response')
+            related = self.get_related_steps(query, top_k) if query else ""
+            if not items:
+                return related
+            footer = "\nWhat should I do next?" if self.last_response else ""
+            context = self.context.build(items, footer)
+            return f"{related}\n\n{context}" if related else context
+
+    def get_related_steps(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """Most relevant iteration responses and final answers from earlier runs"""
+        if self.index is None or top_k <= 0:
             return ""
-        
-        context = "\n\n".join(self.iteration_responses)
-        if self.last_response:
-            context += "\nWhat should I do next?"
-        return context
+        hits = self.index.search(query, top_k, exclude={'run_id': self.run_id})
+        if not hits:
+            return ""
+        limit = self.context.max_value_chars
+        lines = [f"- {text[:limit]}" for _, text, _ in hits]
+        return "Relevant steps from earlier runs:\n" + "\n".join(lines)
+
+    def resolve_handle(self, handle: str) -> Optional[Any]:
+        """
+        Return the full value behind a 'ref:<iteration>:<seq>' handle used in compacted context:
+        the tool result of an iteration response that has one, otherwise the item's content
+        """
+        match = HANDLE_PATTERN.fullmatch(handle.strip())
+        if match is None:
+            return None
+        with self.lock:
+            item = self.store.get(int(match.group(1)), int(match.group(2)))
+        if item is None:
+            return None
+        metadata = item.metadata or {}
+        return metadata['result'] if 'result' in metadata else item.content
+
+    def resolve_references(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Parameters with every handle value replaced by the value it refers to"""
+        resolved = dict(params)
+        for name, value in params.items():
+            if isinstance(value, str) and HANDLE_PATTERN.fullmatch(value.strip()):
+                full = self.resolve_handle(value)
+                if full is None:
+                    raise ValueError(f"Reference {value} for parameter {name} is no longer available")
+                resolved[name] = full
+                logger.debug("Resolved %s for parameter %s", value, name)
+        return resolved
 
     def reset(self):
-        """Reset the memory state"""
-        self._initialize()
-        logger.info("Memory state reset")
+        """Reset the memory state of this session"""
+        with self.lock:
+            self._initialize()
+        logger.info("[%s] Memory state reset", self.session_id)
+
+    def checkpoint(self):
+        """Record the current state, including the tool results, as the last good iteration"""
+        with self.lock:
+            self._checkpoint = (
+                self._seq,
+                self.last_response,
+                self.iteration,
+                self.powerpoint_opened,
+                self.results.snapshot(),
+            )
+            self._indexed.clear()
+        logger.debug("Checkpoint recorded at iteration %s", self.iteration)
+
+    def rollback_to_checkpoint(self):
+        """
+        Discard memories, tool results and retrieval documents added after the last checkpoint
+        so an interrupted iteration can be resumed
+        """
+        with self.lock:
+            for doc_id in self._indexed:
+                self.index.remove(doc_id)
+            if self._checkpoint is None:
+                self._initialize()
+                return
+            seq, last_response, iteration, powerpoint_opened, results = self._checkpoint
+            self.store.truncate_after(seq)
+            self.results.restore(results)
+            self._indexed.clear()
+            if self.log:
+                self.log.discard_after(self.run_id, seq)
+            self._seq = seq
+            self.last_response = last_response
+            self.iteration = iteration
+            self.powerpoint_opened = powerpoint_opened
+        logger.info("Rolled back to checkpoint at iteration %s", iteration)
+
+    def restore_from_log(self, run_id: str) -> bool:
+        """
+        Replace the current state with the committed history of a logged run,
+        so the agent can resume it from its last completed iteration
+        """
+        if not self.log:
+            raise ValueError("Memory has no durable log to restore from")
+        events, completed, last_seq = self.log.load_committed(run_id)
+        if completed is None:
+            logger.warning("Run %s not found in memory log", run_id)
+            return False
+
+        with self.lock:
+            self.store = MemoryStore(self.type_caps, self.default_cap)
+            self.run_id = run_id
+            self.last_response = None
+            self.powerpoint_opened = False
+            for event in events:
+                if event['kind'] == MEMORY_EVENT:
+                    self.store.append(MemoryItem(
+                        event['seq'], event['timestamp'], event['iteration'],
+                        event['type'], event['content'], event['metadata']
+                    ))
+                    if event['type'] == 'llm_response':
+                        self.last_response = event['content']
+                    metadata = event['metadata'] or {}
+                    if event['type'] == 'iteration_response' and 'kind' in metadata:
+                        self.results.record(metadata['tool'], metadata.get('arguments') or {},
+                                            metadata.get('result'), event['iteration'],
+                                            run_id, metadata['kind'])
+                elif event['kind'] == STATE_EVENT and event['type'] == 'powerpoint_opened':
+                    self.powerpoint_opened = bool(event['content'])
+            self._seq = last_seq
+            self.iteration = completed
+            self._checkpoint = None
+        logger.info("Restored run %s: %s events, resuming at iteration %s", run_id, len(events), completed + 1)
+        return True
 
     @property
     def current_iteration(self) -> int:
@@ -79,8 +357,13 @@ class Memory:
     
     def increment_iteration(self):
         """Increment the iteration counter"""
-        self.iteration += 1
-        logger.debug(f"Iteration incremented to {self.iteration}")
+        with self.lock:
+            if self.log:
+                self._seq += 1
+                self.log.commit_iteration(self.run_id, self._seq, self.iteration)
+            self.iteration += 1
+            self.last_access = time.monotonic()
+        logger.debug("Iteration incremented to %s", self.iteration)
     
     @property
     def is_powerpoint_open(self) -> bool:
@@ -89,12 +372,122 @@ class Memory:
     
     def set_powerpoint_state(self, is_open: bool):
         """Set PowerPoint open/closed state"""
-        self.powerpoint_opened = is_open
-        logger.debug(f"PowerPoint state set to: {is_open}")
+        with self.lock:
+            self.powerpoint_opened = is_open
+            if self.log:
+                self._seq += 1
+                self.log.append(self.run_id, self._seq, self.iteration, STATE_EVENT, 'powerpoint_opened', is_open)
+        logger.debug("PowerPoint state set to: %s", is_open)
+
+    def reuse_result(self, result: ToolResult) -> ToolResult:
+        """Record an earlier tool result as the outcome of the current iteration, without calling the tool"""
+        with self.lock:
+            reused = self.results.reuse(result, self.iteration, self.run_id)
+            response_str = format_iteration_response(
+                render_value(result.value, *render_limits(result.tool)), self.iteration,
+                result.tool, result.arguments, note="reused earlier result"
+            )
+            self.add_memory('tool_result', result.value)
+            self.add_memory('iteration_response', response_str,
+                            {'tool': result.tool, 'arguments': result.arguments, 'result': result.value,
+                             'kind': result.kind})
+        return reused
 
     def get_last_calculation_result(self) -> Optional[str]:
-        """Get the last calculation result from memory"""
-        for memory in reversed(self.iteration_responses):
-            if "returned" in memory:
-                return memory.split("returned")[1].strip()
-        return None
\ No newline at end of file
+        """Get the value of the last calculation of the current run"""
+        result = self.results.latest(kind=CALCULATION, run_id=self.run_id)
+        return str(result.value) if result else None
+
+class MemoryRegistry:
+    """Registry of live session memories, used to inspect and evict idle sessions"""
+
+    def __init__(self):
+        self._sessions: Dict[str, Memory] = {}
+        self._lock = threading.Lock()
+        self._eviction: Optional[asyncio.Task] = None
+
+    def create(self, session_id: str = None, log: SQLiteMemoryLog = None, index: RetrievalIndex = None) -> Memory:
+        """Create and register a new session memory"""
+        memory = Memory(session_id, log=log, index=index)
+        with self._lock:
+            if memory.session_id in self._sessions:
+                raise ValueError(f"Session already exists: {memory.session_id}")
+            self._sessions[memory.session_id] = memory
+        logger.info("Created memory for session %s", memory.session_id)
+        return memory
+
+    def get(self, session_id: str) -> Optional[Memory]:
+        """Get the memory of a session, if it is still registered"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def get_or_create(self, session_id: str, log: SQLiteMemoryLog = None, index: RetrievalIndex = None) -> Memory:
+        """Get the memory of a session, creating it if needed"""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = self._sessions[session_id] = Memory(session_id, log=log, index=index)
+                logger.info("Created memory for session %s", session_id)
+            return memory
+
+    def remove(self, session_id: str) -> bool:
+        """Drop a session from the registry"""
+        with self._lock:
+            removed = self._sessions.pop(session_id, None) is not None
+        if removed:
+            logger.info("Removed memory for session %s", session_id)
+        return removed
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Summary of every registered session"""
+        now = time.monotonic()
+        with self._lock:
+            memories = list(self._sessions.values())
+        return [
+            {
+                "session_id": m.session_id,
+                "iteration": m.current_iteration,
+                "memories": len(m.store),
+                "idle_seconds": now - m.last_access,
+            }
+            for m in memories
+        ]
+
+    def evict_idle(self, max_idle_seconds: float) -> List[str]:
+        """Remove sessions that have not been accessed for max_idle_seconds"""
+        cutoff = time.monotonic() - max_idle_seconds
+        with self._lock:
+            idle = [sid for sid, m in self._sessions.items() if m.last_access < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+        if idle:
+            logger.info("Evicted idle sessions: %s", idle)
+        return idle
+
+    def schedule_eviction(self, max_idle_seconds: float) -> Optional[asyncio.Task]:
+        """
+        Evict idle sessions every quarter of max_idle_seconds for as long as the running event
+        loop lives; a task already running on this loop is reused
+        """
+        if max_idle_seconds <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        task = self._eviction
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._eviction = loop.create_task(self._evict_periodically(max_idle_seconds))
+        return task
+
+    async def _evict_periodically(self, max_idle_seconds: float):
+        while True:
+            await asyncio.sleep(max_idle_seconds / 4)
+            self.evict_idle(max_idle_seconds)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+# Process-wide registry of session memories
+memory_registry = MemoryRegistry()
+
+def create_memory(session_id: str = None, log: SQLiteMemoryLog = None, index: RetrievalIndex = None) -> Memory:
+    """Factory for session-scoped memories registered in the process-wide registry"""
+    return memory_registry.create(session_id, log=log, index=index)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent_config import MEMORY_LOG_PATH, MEMORY_LOG_BATCH_SIZE
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('memory_log', 'memory_log.log')
+
+# Event kinds recorded in the log
+MEMORY_EVENT = 'memory'          # an add_memory call
+STATE_EVENT = 'state'            # a change of session state such as PowerPoint open/closed
+ITERATION_EVENT = 'iteration'    # an iteration completed; everything before it is committed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    iteration INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    type TEXT,
+    content TEXT,
+    metadata TEXT,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (run_id, seq)
+) WITHOUT ROWID;
+-- Last commit marker of a run without scanning its events
+CREATE INDEX IF NOT EXISTS events_by_kind ON events (run_id, kind, seq);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    session_id TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+class SQLiteMemoryLog:
+    """
+    Append-only event log of agent memory in SQLite (WAL mode).
+    Events are buffered and written in one transaction per completed iteration
+    (or every batch_size events), so persistence costs one commit per iteration.
+    """
+
+    def __init__(self, path: str, batch_size: int = MEMORY_LOG_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: List[Tuple] = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info("Memory log opened at %s", path)
+
+    def start_run(self, run_id: str, session_id: str = None):
+        """Register a run so it can be listed and resumed later"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, session_id, created_at) VALUES (?, ?, ?)",
+                (run_id, session_id, time.time())
+            )
+
+    def append(self, run_id: str, seq: int, iteration: int, kind: str,
+               type: str = None, content: Any = None, metadata: dict = None):
+        """Buffer an event; serialization is deferred to the next flush"""
+        with self._lock:
+            self._pending.append((run_id, seq, iteration, kind, type, content, metadata, time.time()))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def commit_iteration(self, run_id: str, seq: int, iteration: int):
+        """Mark iteration as completed and durably write everything buffered so far"""
+        with self._lock:
+            self._pending.append((run_id, seq, iteration, ITERATION_EVENT, None, None, None, time.time()))
+            self._flush_locked()
+
+    def discard_after(self, run_id: str, seq: int):
+        """
+        Drop events of a run newer than seq (used when rolling back an iteration): the buffered
+        ones and those a batch flush already wrote
+        """
+        with self._lock:
+            self._pending = [e for e in self._pending if e[0] != run_id or e[1] <= seq]
+            self._conn.execute("DELETE FROM events WHERE run_id = ? AND seq > ?", (run_id, seq))
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        rows = [
+            (run_id, seq, iteration, kind, type,
+             None if content is None else json.dumps(content, default=str),
+             None if metadata is None else json.dumps(metadata, default=str),
+             timestamp)
+            for run_id, seq, iteration, kind, type, content, metadata, timestamp in self._pending
+        ]
+        self._pending = []
+        self._conn.execute("BEGIN")
+        try:
+            # Replace, so events re-recorded after a rollback overwrite the uncommitted originals
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events (run_id, seq, iteration, kind, type, content, metadata, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def load_committed(self, run_id: str) -> Tuple[List[Dict[str, Any]], Optional[int], int]:
+        """
+        Events of a run up to its last completed iteration, in order, together with
+        the number of completed iterations (None if the run is unknown) and the last committed seq
+        """
+        self.flush()
+        row = self._conn.execute(
+            "SELECT seq, iteration FROM events WHERE run_id = ? AND kind = ? ORDER BY seq DESC LIMIT 1",
+            (run_id, ITERATION_EVENT)
+        ).fetchone()
+        if row is None:
+            known = self._conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            return [], (0 if known else None), 0
+
+        last_seq, last_iteration = row
+        cursor = self._conn.execute(
+            "SELECT seq, iteration, kind, type, content, metadata, timestamp FROM events "
+            "WHERE run_id = ? AND seq <= ? AND kind != ? ORDER BY seq",
+            (run_id, last_seq, ITERATION_EVENT)
+        )
+        events = [
+            {
+                "seq": seq,
+                "iteration": iteration,
+                "kind": kind,
+                "type": type,
+                "content": None if content is None else json.loads(content),
+                "metadata": None if metadata is None else json.loads(metadata),
+                "timestamp": timestamp,
+            }
+            for seq, iteration, kind, type, content, metadata, timestamp in cursor
+        ]
+        return events, last_iteration + 1, last_seq
+
+    def iter_events(self, type: str = None):
+        """
+        Iterate the committed memory events of every run, ordered by (run_id, seq), optionally
+        restricted to a memory type. Each run is read by key up to its last commit marker
+        """
+        self.flush()
+        query = (
+            "SELECT e.run_id, e.seq, e.iteration, e.type, e.content FROM runs r "
+            "CROSS JOIN events e ON e.run_id = r.run_id AND e.seq <= "
+            "(SELECT MAX(seq) FROM events WHERE run_id = r.run_id AND kind = ?) "
+            "WHERE e.kind = ?"
+        )
+        params = [ITERATION_EVENT, MEMORY_EVENT]
+        if type is not None:
+            query += " AND e.type = ?"
+            params.append(type)
+        query += " ORDER BY r.run_id, e.seq"
+        for run_id, seq, iteration, type_, content in self._conn.execute(query, params):
+            yield {
+                "run_id": run_id,
+                "seq": seq,
+                "iteration": iteration,
+                "type": type_,
+                "content": None if content is None else json.loads(content),
+            }
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        """Runs in the log with their number of completed iterations"""
+        self.flush()
+        cursor = self._conn.execute(
+            "SELECT r.run_id, r.session_id, r.created_at, "
+            "(SELECT MAX(iteration) + 1 FROM events e WHERE e.run_id = r.run_id AND e.kind = ?) "
+            "FROM runs r ORDER BY r.created_at",
+            (ITERATION_EVENT,)
+        )
+        return [
+            {"run_id": run_id, "session_id": session_id, "created_at": created_at, "iterations": iterations or 0}
+            for run_id, session_id, created_at, iterations in cursor
+        ]
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+        logger.info("Memory log closed at %s", self.path)
+
+_default_log = None
+
+def get_memory_log(path: str = None) -> Optional[SQLiteMemoryLog]:
+    """Process-wide memory log at MEMORY_LOG_PATH, or None when persistence is disabled"""
+    global _default_log
+    path = path or MEMORY_LOG_PATH
+    if not path:
+        return None
+    if _default_log is None or _default_log.path != path:
+        _default_log = SQLiteMemoryLog(path)
+    return _default_log
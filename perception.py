@@ -1,7 +1,10 @@
 import json
 import re
-from pydantic import BaseModel, Field
-from typing import List, Union, Optional, Literal
+import zlib
+from mcp import types
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, create_model
+from typing import Annotated, Any, List, Union, Optional, Literal, Tuple
+from agent_config import RESULT_MAX_ITEMS, RESULT_MAX_CHARS, RESULT_TOOL_MAX_ITEMS
 from logger_config import setup_logger
 
 # Setup logger
@@ -26,9 +29,157 @@ class FinalAnswerOutput(BaseModel):
 class ArrayInput(BaseModel):
     values: List[int] = Field(..., min_items=1)
 
+# Characters that matter to the scanner outside and inside JSON strings
+_STRUCTURAL_CHARS = re.compile(r'[{}"]')
+_STRING_CHARS = re.compile(r'["\\]')
+_DECODER = json.JSONDecoder()
+
+def _decode_at(buf: str, start: int, limit: int) -> Tuple[Optional[dict], int]:
+    """
+    Decode the JSON object at buf[start:limit] as (object, end offset), or (None, offset of the
+    error). Growing windows are decoded, so the cost follows the error offset rather than the
+    length of the text; an error near the end of a window (or in a string it cuts) is retried
+    on a larger one.
+    """
+    size = 256
+    while True:
+        stop = min(start + size, limit)
+        window = buf[start:stop]
+        try:
+            obj, end = _DECODER.raw_decode(window)
+        except json.JSONDecodeError as e:
+            if stop == limit or (e.pos < len(window) - 16 and not e.msg.startswith('Unterminated string')):
+                return None, start + e.pos
+            size *= 4
+        else:
+            return obj, start + end
+
+class JsonObjectExtractor:
+    """
+    Incremental, bracket-aware scanner for the first complete top-level JSON object in text.
+    Text can be fed in chunks (e.g. a streamed LLM response); markdown fences, prose before the
+    object and anything after it are ignored. Each character is scanned once: the braces nested
+    in a candidate are recorded while it is scanned, and if the candidate is not valid JSON they
+    are tried in its place without scanning the text again. Braces inside the strings of an
+    enclosing candidate are not candidates.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._open: List[int] = []  # offsets of the unclosed braces of the current candidate
+        self._closed: List[Tuple[int, int]] = []  # spans of the braces closed inside it
+        self._in_string = False
+        self.text: Optional[str] = None  # source text of the extracted object
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        """Add text; returns the object as soon as it is complete, otherwise None"""
+        self._buf += chunk
+        return self._scan()
+
+    def finish(self) -> Optional[dict]:
+        """
+        Signal the end of input. An unterminated candidate (e.g. a stray '{' in prose) is
+        abandoned in favour of the first complete object nested in it.
+        """
+        if not self._open:
+            return None
+        return self._settle(None)
+
+    def _scan(self) -> Optional[dict]:
+        buf = self._buf
+        pos = self._pos
+        while True:
+            if not self._open:
+                start = buf.find('{', pos)
+                if start < 0:
+                    # Nothing but prose so far; drop it
+                    self._buf, self._pos = "", 0
+                    return None
+                buf = self._buf = buf[start:]
+                pos = 0
+
+            if self._in_string:
+                match = _STRING_CHARS.search(buf, pos)
+                if match is None:
+                    # pos may point past the end when the buffer ends with a backslash
+                    self._pos = max(pos, len(buf))
+                    return None
+                if match.group() == '\\':
+                    pos = match.end() + 1  # skip the escaped character
+                else:
+                    self._in_string = False
+                    pos = match.end()
+                continue
+
+            match = _STRUCTURAL_CHARS.search(buf, pos)
+            if match is None:
+                self._pos = len(buf)
+                return None
+            char, pos = match.group(), match.end()
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._open.append(pos - 1)
+            else:
+                start = self._open.pop()
+                if self._open:
+                    self._closed.append((start, pos))
+                    continue
+                obj = self._settle(pos)
+                if obj is not None:
+                    return obj
+                buf, pos = self._buf, self._pos
+
+    def _settle(self, end: Optional[int]) -> Optional[dict]:
+        """
+        Decode the candidate at the start of the buffer, which closed at `end` (None if the input
+        ended first). When decoding fails at some offset, the nested candidates that closed before
+        it were decoded successfully as part of it, and those around it fail the same way; only
+        the ones opening after it are decoded. Scanning resumes after the candidate.
+        """
+        buf = self._buf
+        nested = sorted(self._closed)
+        self._open, self._closed, self._in_string = [], [], False
+        start, i = 0, 0
+        while True:
+            obj, position = _decode_at(buf, start, len(buf) if end is None else end)
+            if obj is not None:
+                self.text = buf[start:position]
+                self._buf, self._pos = buf[position:], 0
+                return obj
+            failed_at = max(position, start + 1)
+            start = None
+            while i < len(nested):
+                span_start, span_end = nested[i]
+                i += 1
+                if span_start >= failed_at or span_end <= failed_at:
+                    start = span_start
+                    break
+            if start is None:
+                break
+        if end is None:
+            self._buf, self._pos = "", 0
+        else:
+            self._pos = end
+        return None
+
+def extract_json_object(text: str) -> Tuple[Optional[dict], Optional[str]]:
+    """First complete top-level JSON object in mixed text, with its source text; (None, None) if absent"""
+    extractor = JsonObjectExtractor()
+    obj = extractor.feed(text)
+    if obj is None:
+        obj = extractor.finish()
+    return obj, extractor.text if obj is not None else None
+
 def clean_llm_response(response_text: str) -> str:
     """Clean up the LLM response text by removing markdown and other formatting"""
-    logger.debug(f"Cleaning LLM response text: {response_text[:100]}...")
+    logger.debug("Cleaning LLM response text: %s...", response_text[:100])
+
+    # Prefer the exact text of the first JSON object, wherever it sits in the response
+    obj, obj_text = extract_json_object(response_text)
+    if obj is not None:
+        return obj_text
     
     # Remove markdown code block formatting if present
     response_text = response_text.strip()
@@ -38,93 +189,227 @@ def clean_llm_response(response_text: str) -> str:
     response_text = response_text.replace('json\n', '').strip()
     
     cleaned_text = response_text.strip('`').strip('"').strip()
-    logger.debug(f"Cleaned response text: {cleaned_text[:100]}...")
+    logger.debug("Cleaned response text: %s...", cleaned_text[:100])
     return cleaned_text
 
-def parse_and_validate_response(response_text: str):
-    """Parse and validate the LLM response against expected schemas"""
-    logger.info("Starting response parsing and validation")
-    try:
-        # Try to parse the cleaned response text
+# Alternative parameter names the LLM uses for some tools: tool -> {schema name: (aliases, ...)}
+PARAM_ALIASES = {
+    'int_list_to_exponential_sum': {'int_list': ('numbers',)},
+}
+
+# All LLM actions, told apart by their "type" field
+LLMAction = Annotated[
+    Union[FunctionCallInput, PowerPointOperationInput, FinalAnswerOutput],
+    Field(discriminator="type")
+]
+
+# Python types accepted for each JSON schema type. Arrays may also arrive as strings
+# ("[1, 2]" or "1,2") or as shared array descriptors, which the action layer converts.
+_SCHEMA_TYPES = {
+    'integer': int,
+    'number': float,
+    'string': str,
+    'boolean': bool,
+    'array': Union[list, str, dict],
+    'object': dict,
+}
+
+def build_params_model(tool) -> type:
+    """Pydantic model of a tool's parameters, derived from its MCP inputSchema"""
+    schema = tool.inputSchema or {}
+    required = set(schema.get('required', []))
+    fields = {}
+    for param_name, param_info in schema.get('properties', {}).items():
+        param_type = _SCHEMA_TYPES.get(param_info.get('type'), Any)
+        if param_name in required:
+            fields[param_name] = (param_type, ...)
+        else:
+            fields[param_name] = (Optional[param_type], None)
+    model = create_model(f"{tool.name}_params", __config__=ConfigDict(extra='ignore'), **fields)
+    return model
+
+def apply_param_aliases(tool_name: str, params: dict) -> dict:
+    """Rename aliased parameters to the names in the tool schema"""
+    aliases = PARAM_ALIASES.get(tool_name)
+    if not aliases:
+        return params
+    params = dict(params)
+    for param_name, names in aliases.items():
+        if param_name not in params:
+            for alias in names:
+                if alias in params:
+                    params[param_name] = params.pop(alias)
+                    break
+    return params
+
+class ActionValidator:
+    """
+    Validates raw LLM output into a typed action in one pass with a prebuilt discriminated-union
+    validator, then checks function call and PowerPoint parameters against the tool schemas.
+    """
+
+    def __init__(self):
+        self._adapter = TypeAdapter(LLMAction)
+        self._param_models = {}
+
+    def set_tools(self, tools):
+        """Build parameter validators for the tools of the current session"""
+        self._param_models = {tool.name: build_params_model(tool) for tool in tools}
+        logger.info("Parameter validators built for %s tools", len(self._param_models))
+
+    def validate(self, raw: Union[str, bytes]):
+        """Parse and validate a raw response (str or bytes) into a typed action"""
         try:
-            logger.debug("Attempting to parse JSON response")
-            response_json = json.loads(response_text)
-        except json.JSONDecodeError:
-            logger.debug("Initial JSON parse failed, attempting to extract JSON from text")
-            # If initial parse fails, try to extract JSON from the text
-            json_match = re.search(r'\{[^}]+\}', response_text)
-            if json_match:
-                response_text = json_match.group(0)
-                response_json = json.loads(response_text)
-                logger.debug("Successfully extracted and parsed JSON from text")
-            else:
-                logger.error("No valid JSON found in response")
+            action = self._adapter.validate_json(raw)
+        except ValidationError as e:
+            if not any(error['type'] == 'json_invalid' for error in e.errors()):
+                raise
+            # Not plain JSON: look for an object embedded in the text
+            text = raw.decode() if isinstance(raw, bytes) else raw
+            response_json, _ = extract_json_object(text)
+            if response_json is None:
                 raise ValueError("No valid JSON found in response")
-        
-        if not isinstance(response_json, dict) or 'type' not in response_json:
-            logger.error("Invalid response format: missing 'type' field or not a dictionary")
-            raise ValueError("Invalid response format")
-        
-        # Validate response against expected schemas
-        valid_types = ['function_call', 'powerpoint', 'final_answer']
-        logger.debug(f"Validating response type: {response_json['type']}")
-        if response_json['type'] not in valid_types:
-            logger.error(f"Invalid response type: {response_json['type']}")
-            raise ValueError(f"Invalid response type. Expected one of {valid_types}")
-        
-        # Validate against appropriate schema
-        logger.debug(f"Validating against {response_json['type']} schema")
-        if response_json['type'] == 'function_call':
-            result = FunctionCallInput(**response_json)
-        elif response_json['type'] == 'powerpoint':
-            result = PowerPointOperationInput(**response_json)
-        elif response_json['type'] == 'final_answer':
-            result = FinalAnswerOutput(**response_json)
-        
-        logger.info(f"Successfully validated response as {response_json['type']}")
+            action = self._adapter.validate_python(response_json)
+
+        if isinstance(action, FunctionCallInput):
+            self.validate_params(action.function, action.params, required=True)
+        elif isinstance(action, PowerPointOperationInput):
+            self.validate_params(action.operation, action.params, required=False)
+        return action
+
+    def validate_params(self, tool_name: str, params: dict, required: bool):
+        """Check parameters against the tool schema so bad arguments never reach the server"""
+        if not self._param_models:
+            return  # tools not known yet
+        model = self._param_models.get(tool_name)
+        if model is None:
+            if required:
+                raise ValueError(f"Unknown tool: {tool_name}")
+            return
+        model.model_validate(apply_param_aliases(tool_name, params))
+
+# Shared validator; the agent registers the session tools with set_tools
+action_validator = ActionValidator()
+
+def parse_and_validate_response(response_text: Union[str, bytes]):
+    """Parse and validate the LLM response against expected schemas"""
+    logger.debug("Starting response parsing and validation")
+    try:
+        result = action_validator.validate(response_text)
+        logger.debug("Successfully validated response as %s", result.type)
         return result
-            
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse JSON response: {e}")
-        raise
     except Exception as e:
         logger.error(f"Error validating response: {e}")
         raise
 
-def format_tool_response(result, iteration: int, func_name: str = None, arguments: dict = None) -> tuple[str, str]:
-    """Format the response from a tool execution"""
-    logger.debug(f"Formatting tool response for iteration {iteration}")
-    
-    # Get the full result content
+def parse_result_texts(texts: List[str]) -> Any:
+    """Typed value of a tool result from its text content items (one item per list element)"""
+    values = []
+    for text in texts:
+        try:
+            values.append(json.loads(text))
+        except (TypeError, ValueError):
+            values.append(text)
+    if len(values) == 1:
+        return values[0]
+    return values
+
+def extract_result_value(result) -> Any:
+    """Structured value of a tool call result"""
     if hasattr(result, 'content'):
-        logger.debug("Processing result with content attribute")
         if isinstance(result.content, list):
-            iteration_result = [
+            return parse_result_texts([
                 item.text if hasattr(item, 'text') else str(item)
                 for item in result.content
-            ]
+            ])
+        return str(result.content)
+    return str(result)
+
+def tool_result_from_value(value: Any) -> types.CallToolResult:
+    """Tool call result with the given structured value, as extract_result_value reads it back"""
+    items = value if isinstance(value, list) and len(value) > 1 else [value]
+    return types.CallToolResult(content=[
+        types.TextContent(type="text", text=item if isinstance(item, str) else json.dumps(item, default=str))
+        for item in items
+    ])
+
+def render_limits(func_name: str = None) -> Tuple[int, int]:
+    """(max list items, max characters) used when rendering the result of a tool"""
+    return RESULT_TOOL_MAX_ITEMS.get(func_name, RESULT_MAX_ITEMS), RESULT_MAX_CHARS
+
+def render_value(value: Any, max_items: int = RESULT_MAX_ITEMS, max_chars: int = RESULT_MAX_CHARS) -> str:
+    """
+    Bounded textual rendering of a tool result. Long lists show their head and tail with
+    length, min/max and a CRC32 checksum; long scalars and objects are cut with their length.
+    """
+    if isinstance(value, (list, tuple)):
+        n = len(value)
+        if n <= max_items:
+            text = f"[{', '.join(map(str, value))}]"
+            if len(text) <= max_chars:
+                return text
+        head_n = max(1, max_items // 2)
+        tail_n = max(1, max_items - head_n)
+        head = ', '.join(map(str, value[:head_n]))
+        tail = ', '.join(map(str, value[-tail_n:]))
+        crc = 0
+        for item in value:
+            crc = zlib.crc32(str(item).encode(), crc)
+        stats = [f"length={n}"]
+        try:
+            stats.append(f"min={min(value)}, max={max(value)}")
+        except (TypeError, ValueError):
+            pass
+        stats.append(f"crc32={crc:08x}")
+        return f"[{head}, ..., {tail}] ({', '.join(stats)})"
+
+    text = json.dumps(value, default=str) if isinstance(value, dict) else str(value)
+    if len(text) > max_chars:
+        return f"{text[:max_chars]}... ({len(text)} chars, crc32={zlib.crc32(text.encode()):08x})"
+    return text
+
+def fits_inline(value: Any, max_items: int = RESULT_MAX_ITEMS, max_chars: int = RESULT_MAX_CHARS) -> bool:
+    """True if render_value shows the value in full rather than abridged"""
+    if isinstance(value, (list, tuple)):
+        return len(value) <= max_items and len(f"[{', '.join(map(str, value))}]") <= max_chars
+    text = json.dumps(value, default=str) if isinstance(value, dict) else str(value)
+    return len(text) <= max_chars
+
+def render_arguments(arguments: dict, max_items: int = RESULT_MAX_ITEMS, max_chars: int = RESULT_MAX_CHARS) -> str:
+    """Tool arguments as text, large values abridged like results"""
+    parts = []
+    for name, value in arguments.items():
+        if isinstance(value, str) and len(value) <= max_chars:
+            text = repr(value)
         else:
-            iteration_result = str(result.content)
-    else:
-        logger.debug("Processing result without content attribute")
-        iteration_result = str(result)
-        
-    # Format the response based on result type
-    if isinstance(iteration_result, list):
-        result_str = f"[{', '.join(iteration_result)}]"
-    else:
-        result_str = str(iteration_result)
+            text = render_value(value, max_items, max_chars)
+        parts.append(f"'{name}': {text}")
+    return f"{{{', '.join(parts)}}}"
+
+def format_tool_response(result, iteration: int, func_name: str = None, arguments: dict = None) -> Tuple[str, Any]:
+    """
+    Format the response from a tool execution.
+    Returns the bounded iteration response text and the structured result value.
+    """
+    logger.debug("Formatting tool response for iteration %s", iteration)
+    
+    value = extract_result_value(result)
+    response_str = format_iteration_response(render_value(value, *render_limits(func_name)), iteration, func_name, arguments)
+    
+    logger.debug("Completed formatting response for iteration %s", iteration)
+    logger.debug("Formatted response: %s...", response_str[:100])
     
+    return response_str, value
+
+def format_iteration_response(result_str: str, iteration: int, func_name: str = None, arguments: dict = None,
+                              note: str = None) -> str:
+    """Describe the (already rendered) result of one iteration for the memory context"""
     # Create iteration response string
     if func_name and arguments:
         response_str = (
-            f"In the {iteration + 1} iteration you called {func_name} with {arguments} parameters, "
-            f"and the function returned {result_str}."
+            f"In the {iteration + 1} iteration you called {func_name} with {render_arguments(arguments)} parameters, "
+            f"and the function returned {result_str}"
         )
     else:
-        response_str = f"In the {iteration + 1} iteration the operation returned {result_str}."
-    
-    logger.info(f"Completed formatting response for iteration {iteration}")
-    logger.debug(f"Formatted response: {response_str[:100]}...")
-    
-    return response_str, iteration_result
\ No newline at end of file
+        response_str = f"In the {iteration + 1} iteration the operation returned {result_str}"
+    return f"{response_str} ({note})." if note else f"{response_str}."
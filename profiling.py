@@ -0,0 +1,197 @@
+import cProfile
+import functools
+import glob
+import inspect
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from agent_config import (
+    PROFILE_TARGETS, PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILE_MAX_CAPTURES, PROFILE_MEMORY, PROFILE_TOP_N
+)
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('profiling', 'profiling.log')
+
+class Profiler:
+    """
+    On-demand profiling of selected targets: tool names ("factorial") and agent stages
+    ("agent:llm"), or "*" for all. One in every `sample_rate` calls of a target is run under
+    cProfile (and tracemalloc); the pstats file, the allocation snapshot and a JSON summary are
+    written to `directory`, keeping the newest `max_captures` captures.
+    """
+
+    def __init__(self, targets=PROFILE_TARGETS, sample_rate: int = PROFILE_SAMPLE_RATE,
+                 directory: str = PROFILE_DIR, max_captures: int = PROFILE_MAX_CAPTURES,
+                 memory: bool = PROFILE_MEMORY, top_n: int = PROFILE_TOP_N):
+        self.targets = frozenset(targets)
+        self.sample_rate = max(1, sample_rate)
+        self.directory = directory
+        self.max_captures = max_captures
+        self.memory = memory
+        self.top_n = top_n
+        self._counts: Dict[str, int] = {}
+        self._active = False
+        self.latest: Optional[Dict[str, Any]] = None
+        self.stats = {"captures": 0, "skipped_busy": 0}
+
+    def enabled_for(self, target: str) -> bool:
+        return target in self.targets or "*" in self.targets
+
+    def _sample(self, target: str) -> bool:
+        """True for the first call of a target and every sample_rate-th call after it"""
+        count = self._counts.get(target, 0)
+        self._counts[target] = count + 1
+        return count % self.sample_rate == 0
+
+    @contextmanager
+    def capture(self, target: str) -> Iterator[None]:
+        """Profile the enclosed code if the target is selected and this call is sampled"""
+        if not self.enabled_for(target) or not self._sample(target):
+            yield
+            return
+        if self._active:
+            # cProfile allows one active profiler per thread; overlapping calls are not captured
+            self.stats["skipped_busy"] += 1
+            yield
+            return
+
+        self._active = True
+        trace_memory = self.memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = peak = None
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self._active = False
+            try:
+                self._save(target, profile, snapshot, peak, elapsed)
+            except OSError as e:
+                logger.warning("Could not save profile of %s: %s", target, e)
+
+    def wrap(self, target: str, fn: Callable) -> Callable:
+        """fn (sync or async) profiled as `target`; returned unchanged if the target is not selected"""
+        if not self.enabled_for(target):
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def profiled_async(*args, **kwargs):
+                with self.capture(target):
+                    return await fn(*args, **kwargs)
+            return profiled_async
+
+        @functools.wraps(fn)
+        def profiled(*args, **kwargs):
+            with self.capture(target):
+                return fn(*args, **kwargs)
+        return profiled
+
+    def instrument_tools(self, server) -> list:
+        """Wrap the selected tools of a FastMCP server in place; returns the wrapped tool names"""
+        wrapped = []
+        for tool in server._tool_manager.list_tools():
+            if self.enabled_for(tool.name):
+                tool.fn = self.wrap(tool.name, tool.fn)
+                wrapped.append(tool.name)
+        if wrapped:
+            logger.info("Profiling tools %s, 1 in %s calls", wrapped, self.sample_rate)
+        return wrapped
+
+    def _save(self, target: str, profile: cProfile.Profile, snapshot, peak, elapsed: float):
+        os.makedirs(self.directory, exist_ok=True)
+        safe_target = target.replace(":", "_").replace(os.sep, "_")
+        stem = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10 ** 9:09d}-{safe_target}")
+
+        profile.dump_stats(stem + ".pstats")
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_n]
+        summary = {
+            "target": target,
+            "time": time.time(),
+            "elapsed_ms": elapsed * 1000,
+            "functions": [
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({name})",
+                    "calls": calls,
+                    "total_ms": total_time * 1000,
+                    "cumulative_ms": cumulative * 1000,
+                }
+                for (filename, line, name), (_, calls, total_time, cumulative, _) in functions
+            ],
+        }
+        if snapshot is not None:
+            snapshot.dump(stem + ".tracemalloc")
+            summary["peak_kb"] = peak / 1024
+            summary["allocations"] = [
+                {"location": str(stat.traceback), "size_kb": stat.size / 1024, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:self.top_n]
+            ]
+        with open(stem + ".json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        self.latest = summary
+        self.stats["captures"] += 1
+        logger.info("Profiled %s (%.1f ms) to %s.*", target, elapsed * 1000, stem)
+        self._rotate()
+
+    def _rotate(self):
+        """Delete the files of all but the newest max_captures captures"""
+        summaries = sorted(glob.glob(os.path.join(self.directory, "*.json")))
+        for path in summaries[:-self.max_captures] if self.max_captures > 0 else []:
+            stem = path[:-len(".json")]
+            for suffix in (".json", ".pstats", ".tracemalloc"):
+                try:
+                    os.remove(stem + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def latest_summary(self) -> Optional[Dict[str, Any]]:
+        """Summary of the most recent capture, from this process or from the capture directory"""
+        if self.latest is not None:
+            return self.latest
+        summaries = sorted(glob.glob(os.path.join(self.directory, "*.json")))
+        if not summaries:
+            return None
+        with open(summaries[-1]) as f:
+            return json.load(f)
+
+def format_summary(summary: Optional[Dict[str, Any]]) -> str:
+    """Top functions and allocations of a capture summary as text"""
+    if summary is None:
+        return "No profile captured yet. Select targets with PROFILE_TARGETS."
+    lines = [f"Profile of {summary['target']}: {summary['elapsed_ms']:.1f} ms"
+             f" at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['time']))}",
+             "", f"{'cumulative ms':>14} {'own ms':>9} {'calls':>8}  function"]
+    for entry in summary["functions"]:
+        lines.append(f"{entry['cumulative_ms']:>14.2f} {entry['total_ms']:>9.2f} {entry['calls']:>8}  {entry['function']}")
+    if "allocations" in summary:
+        lines += ["", f"Allocations still held (peak {summary['peak_kb']:.1f} KB):",
+                  f"{'KB':>10} {'blocks':>8}  location"]
+        for entry in summary["allocations"]:
+            lines.append(f"{entry['size_kb']:>10.1f} {entry['count']:>8}  {entry['location']}")
+    return "\n".join(lines)
+
+_default_profiler = None
+
+def get_profiler() -> Profiler:
+    """Process-wide profiler configured from PROFILE_* settings"""
+    global _default_profiler
+    if _default_profiler is None:
+        _default_profiler = Profiler()
+    return _default_profiler
@@ -7,7 +7,7 @@ Your workflow must strictly follow this structured loop for each problem:
 1. Begin by identifying the necessary computations and perform **only** mathematical calculations first using a function call in JSON format:
    - For ASCII values, use 'strings_to_chars_to_int'
    - For exponential sums, use 'int_list_to_exponential_sum'
-2. Once calculations are complete, proceed to PowerPoint visualization in JSON format:
+2. Once calculations are complete, proceed to PowerPoint visualization in JSON format, as ONE 'apply_slide_operations' operation whose "operations" list is applied atomically:
    - Begin with PowerPoint open operation
    - Draw a rectangle to highlight results using coordinates (x1=2, y1=2, x2=7, y2=5) with 'draw_rectangle' tool
    - Display the final computed value
@@ -44,6 +44,7 @@ Constraints and practices:
 Accepted array formats:
 - Comma-separated: param1,param2,param3
 - Bracketed list: [param1,param2,param3]
+- Reference: a long result is shown abridged with "full value at ref:<iteration>:<n>"; pass "ref:<iteration>:<n>" as the parameter value to use the full result
 
 **Example outputs (use exactly these formats):**
 {
@@ -53,8 +54,13 @@ Accepted array formats:
 }
 {
   "type": "powerpoint",
-  "operation": "open_powerpoint",
-  "params": {"dummy": null}
+  "operation": "apply_slide_operations",
+  "params": {"operations": [
+    {"operation": "open_powerpoint", "params": {}},
+    {"operation": "draw_rectangle", "params": {"x1": 2, "y1": 2, "x2": 7, "y2": 5}},
+    {"operation": "add_text_in_powerpoint", "params": {"text": "Final Result:\n7.59982224609308e+33"}},
+    {"operation": "close_powerpoint", "params": {}}
+  ]}
 }
 {
   "type": "powerpoint",
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Sequence
+
+from agent_config import CONTEXT_TOKEN_BUDGET, CONTEXT_KEEP_RECENT, CONTEXT_MAX_VALUE_CHARS
+from logger_config import setup_logger
+from perception import fits_inline, render_limits
+
+# Setup logger
+logger = setup_logger('prompt_context', 'prompt_context.log')
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token for English text and numbers)"""
+    return (len(text) + 3) // 4
+
+# A handle passed by the model as a parameter value, in place of the value it refers to
+HANDLE_PATTERN = re.compile(r"ref:(\d+):(\d+)")
+
+def make_handle(item) -> str:
+    """Handle that resolves back to the full content (or tool result) of a memory item"""
+    return f"ref:{item.iteration}:{item.seq}"
+
+def args_digest(arguments: Dict[str, Any]) -> str:
+    """Short stable digest of tool arguments"""
+    canonical = json.dumps(arguments, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:8]
+
+def truncate(text: str, limit: int, handle: str) -> str:
+    """Cut text to limit characters, pointing at the handle holding the full value"""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars, full value at {handle}]"
+
+class ContextCompactor:
+    """
+    Build the memory context for a prompt within a token budget.
+    The most recent iterations are kept verbatim, older ones become one-line summaries
+    and the oldest summaries are dropped when the budget is still exceeded.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, keep_recent: int = CONTEXT_KEEP_RECENT,
+                 max_value_chars: int = CONTEXT_MAX_VALUE_CHARS):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.max_value_chars = max_value_chars
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"prompts": 0, "raw_tokens": 0, "context_tokens": 0}
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.stats["raw_tokens"] - self.stats["context_tokens"]
+
+    def summarize(self, item) -> str:
+        """Compact structured summary of one iteration response"""
+        metadata = item.metadata or {}
+        tool = metadata.get("tool")
+        if not tool:
+            return f"Iteration {item.iteration + 1}: {truncate(str(item.content), self.max_value_chars // 2, make_handle(item))}"
+
+        arguments = metadata.get("arguments") or {}
+        args_str = json.dumps(arguments, default=str)
+        if len(args_str) > 60:
+            args_str = f"args#{args_digest(arguments)}"
+        return f"Iteration {item.iteration + 1}: {tool}({args_str}) -> {self.summarize_result(metadata.get('result'), item)}"
+
+    def summarize_result(self, result: Any, item) -> str:
+        if isinstance(result, (list, tuple)):
+            if len(result) <= 6:
+                text = f"[{', '.join(map(str, result))}]"
+            else:
+                head = ', '.join(map(str, result[:3]))
+                tail = ', '.join(map(str, result[-2:]))
+                text = f"[{head}, ..., {tail}] ({len(result)} items, full value at {make_handle(item)})"
+        else:
+            text = str(result)
+        return truncate(text, self.max_value_chars // 2, make_handle(item))
+
+    def render_recent(self, item) -> str:
+        """A recent iteration verbatim; when its tool result was abridged, the handle to the full value is added"""
+        handle = make_handle(item)
+        text = truncate(str(item.content), self.max_value_chars, handle)
+        metadata = item.metadata or {}
+        if ('result' in metadata and handle not in text
+                and not fits_inline(metadata['result'], *render_limits(metadata.get('tool')))):
+            text = f"{text} [full value at {handle}]"
+        return text
+
+    def build(self, items: Sequence, footer: str = "") -> str:
+        """Render iteration responses (oldest first) into a context string within the budget"""
+        if not items:
+            return ""
+
+        recent = list(items[-self.keep_recent:]) if self.keep_recent else []
+        older = list(items[:len(items) - len(recent)])
+
+        recent_parts = [self.render_recent(item) for item in recent]
+        older_parts: List[str] = [self.summarize(item) for item in older]
+
+        fixed_tokens = sum(estimate_tokens(p) for p in recent_parts) + estimate_tokens(footer)
+        older_tokens = [estimate_tokens(p) for p in older_parts]
+        budget_left = self.token_budget - fixed_tokens
+
+        # Drop the oldest summaries until the rest fits in the budget
+        dropped = 0
+        total_older = sum(older_tokens)
+        while dropped < len(older_parts) and total_older > budget_left:
+            total_older -= older_tokens[dropped]
+            dropped += 1
+        parts = older_parts[dropped:]
+        if dropped:
+            parts.insert(0, f"[{dropped} earlier iteration(s) omitted]")
+        parts.extend(recent_parts)
+
+        context = "\n\n".join(parts) + footer
+
+        raw_tokens = sum(estimate_tokens(str(item.content)) + 1 for item in items) + estimate_tokens(footer)
+        context_tokens = estimate_tokens(context)
+        self.stats["prompts"] += 1
+        self.stats["raw_tokens"] += raw_tokens
+        self.stats["context_tokens"] += context_tokens
+        logger.debug("Context built: %s iterations, %s -> %s tokens, %s dropped", len(items), raw_tokens, context_tokens, dropped)
+        return context
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from agent_config import RESULT_REGISTRY_MAX_ENTRIES
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('results', 'results.log')
+
+# Kinds of recorded results
+CALCULATION = 'calculation'
+POWERPOINT = 'powerpoint'
+
+def canonical_args(arguments: Optional[Dict[str, Any]]) -> str:
+    """Canonical JSON form of tool arguments, independent of key order"""
+    return json.dumps(arguments or {}, sort_keys=True, separators=(',', ':'), default=str)
+
+def args_hash(arguments: Optional[Dict[str, Any]]) -> str:
+    """Stable hash of tool arguments"""
+    return hashlib.sha1(canonical_args(arguments).encode()).hexdigest()
+
+class ToolResult:
+    """A typed tool result: the call that produced it and its value"""
+    __slots__ = ('tool', 'arguments', 'args_hash', 'value', 'kind', 'iteration', 'run_id', 'timestamp')
+
+    def __init__(self, tool: str, arguments: Dict[str, Any], value: Any,
+                 kind: str, iteration: int, run_id: str = None):
+        self.tool = tool
+        self.arguments = arguments
+        self.args_hash = args_hash(arguments)
+        self.value = value
+        self.kind = kind
+        self.iteration = iteration
+        self.run_id = run_id
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"ToolResult(tool={self.tool!r}, iteration={self.iteration}, value={self.value!r:.80})"
+
+class ResultRegistry:
+    """
+    Tool results of a session indexed by (tool, argument hash) and by tool.
+    It survives memory resets, so values computed for one query are reused by the next.
+    """
+
+    def __init__(self, max_entries: int = RESULT_REGISTRY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._by_key: "OrderedDict[tuple, ToolResult]" = OrderedDict()
+        self._by_tool: Dict[str, ToolResult] = {}
+        self._by_kind: Dict[str, ToolResult] = {}
+        self.hits = 0
+
+    def record(self, tool: str, arguments: Dict[str, Any], value: Any, iteration: int,
+               run_id: str = None, kind: str = CALCULATION) -> ToolResult:
+        """Register the result of a tool call"""
+        result = ToolResult(tool, arguments, value, kind, iteration, run_id)
+        key = (tool, result.args_hash)
+        self._by_key.pop(key, None)
+        self._by_key[key] = result
+        if len(self._by_key) > self.max_entries:
+            self._by_key.popitem(last=False)
+        self._by_tool[tool] = result
+        self._by_kind[kind] = result
+        logger.debug("Recorded result of %s at iteration %s", tool, iteration)
+        return result
+
+    def lookup(self, tool: str, arguments: Dict[str, Any]) -> Optional[ToolResult]:
+        """Result of an earlier identical call, if any"""
+        result = self._by_key.get((tool, args_hash(arguments)))
+        if result is not None:
+            self.hits += 1
+            self._by_key.move_to_end((tool, result.args_hash))
+        return result
+
+    def reuse(self, result: ToolResult, iteration: int, run_id: str = None) -> ToolResult:
+        """Re-register an earlier result as produced by the current iteration of a run"""
+        return self.record(result.tool, result.arguments, result.value, iteration, run_id, result.kind)
+
+    def latest(self, tool: str = None, kind: str = None, run_id: str = None) -> Optional[ToolResult]:
+        """Most recent result of a tool (or of a kind), optionally only if produced in the given run"""
+        if tool is not None:
+            result = self._by_tool.get(tool)
+        else:
+            result = self._by_kind.get(kind or CALCULATION)
+        if result is None or (run_id is not None and result.run_id != run_id):
+            return None
+        return result
+
+    def snapshot(self) -> tuple:
+        """Copy of the registry contents, for restore()"""
+        return OrderedDict(self._by_key), dict(self._by_tool), dict(self._by_kind)
+
+    def restore(self, snapshot: tuple):
+        """Put back the contents saved by snapshot(), dropping results recorded since"""
+        by_key, by_tool, by_kind = snapshot
+        self._by_key = OrderedDict(by_key)
+        self._by_tool = dict(by_tool)
+        self._by_kind = dict(by_kind)
+
+    def clear(self):
+        self._by_key.clear()
+        self._by_tool.clear()
+        self._by_kind.clear()
+
+    def __len__(self) -> int:
+        return len(self._by_key)
@@ -0,0 +1,163 @@
+import hashlib
+import heapq
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent_config import RETRIEVAL_ENABLED, RETRIEVAL_MAX_DOCS, RETRIEVAL_MAX_DOC_CHARS
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('retrieval', 'retrieval.log')
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+# Boilerplate words of iteration responses; they match every document and carry no signal
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "of", "in", "to", "with", "you", "is", "it", "for", "then", "that", "those",
+    "iteration", "called", "parameters", "function", "returned", "operation",
+})
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class _Doc:
+    __slots__ = ('text', 'length', 'terms', 'metadata', 'digest')
+
+    def __init__(self, text: str, length: int, terms: Tuple[str, ...], metadata: dict, digest: bytes):
+        self.text = text
+        self.length = length
+        self.terms = terms
+        self.metadata = metadata
+        self.digest = digest
+
+class RetrievalIndex:
+    """
+    Incremental BM25 index over past iteration responses and final answers.
+    Holds at most max_docs documents; the oldest are evicted first and identical
+    texts are stored once.
+    """
+
+    def __init__(self, max_docs: int = RETRIEVAL_MAX_DOCS, max_doc_chars: int = RETRIEVAL_MAX_DOC_CHARS,
+                 k1: float = 1.5, b: float = 0.75):
+        self.max_docs = max_docs
+        self.max_doc_chars = max_doc_chars
+        self.k1 = k1
+        self.b = b
+        self._docs: "OrderedDict[int, _Doc]" = OrderedDict()
+        self._by_digest: Dict[bytes, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, text: str, metadata: dict = None) -> int:
+        """Index a document and return its id"""
+        text = text[:self.max_doc_chars]
+        digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        doc_id = self._by_digest.get(digest)
+        if doc_id is not None:
+            # Already indexed: refresh its recency and metadata instead of storing a duplicate
+            doc = self._docs[doc_id]
+            doc.metadata = metadata or {}
+            self._docs.move_to_end(doc_id)
+            return doc_id
+
+        terms = Counter(tokenize(text))
+        doc_id = self._next_id
+        self._next_id += 1
+        length = sum(terms.values())
+        # Only the distinct terms are kept per document (for eviction); frequencies live in the postings
+        self._docs[doc_id] = _Doc(text, length, tuple(terms), metadata or {}, digest)
+        self._by_digest[digest] = doc_id
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+        if len(self._docs) > self.max_docs:
+            self._evict_oldest()
+        return doc_id
+
+    @property
+    def next_id(self) -> int:
+        """Id the next new (not duplicate) document will get; ids only grow"""
+        return self._next_id
+
+    def remove(self, doc_id: int) -> bool:
+        """Drop a document; False if it is not indexed (e.g. already evicted)"""
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        self._unindex(doc_id, doc)
+        return True
+
+    def _evict_oldest(self):
+        doc_id, doc = self._docs.popitem(last=False)
+        self._unindex(doc_id, doc)
+
+    def _unindex(self, doc_id: int, doc: _Doc):
+        del self._by_digest[doc.digest]
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, k: int = 5, exclude: Dict[str, Any] = None) -> List[Tuple[float, str, dict]]:
+        """
+        Top-k documents for a query as (score, text, metadata), best first.
+        Documents whose metadata matches every key/value of exclude are skipped.
+        """
+        n = len(self._docs)
+        if not n:
+            return []
+        avg_length = self._total_length / n
+        k1, b = self.k1, self.b
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                length = self._docs[doc_id].length
+                score = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        if exclude:
+            items = exclude.items()
+            scores = {
+                doc_id: score for doc_id, score in scores.items()
+                if not all(self._docs[doc_id].metadata.get(key) == value for key, value in items)
+            }
+        top = heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+        return [(score, self._docs[doc_id].text, self._docs[doc_id].metadata) for doc_id, score in top]
+
+    def add_from_log(self, memory_log) -> int:
+        """Index every iteration response stored in a durable memory log"""
+        count = 0
+        for event in memory_log.iter_events(type='iteration_response'):
+            if isinstance(event['content'], str):
+                self.add(event['content'], {'run_id': event['run_id'], 'iteration': event['iteration']})
+                count += 1
+        logger.info("Indexed %s iteration responses from memory log (%s unique)", count, len(self))
+        return count
+
+_default_index = None
+
+def get_retrieval_index(memory_log=None) -> Optional[RetrievalIndex]:
+    """Process-wide retrieval index, bootstrapped from the memory log on first use; None if disabled"""
+    global _default_index
+    if not RETRIEVAL_ENABLED:
+        return None
+    if _default_index is None:
+        _default_index = RetrievalIndex()
+        if memory_log is not None:
+            _default_index.add_from_log(memory_log)
+    return _default_index
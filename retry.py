@@ -0,0 +1,80 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Tuple, Type
+
+from agent_config import (
+    LLM_RETRY_ATTEMPTS, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY,
+    TOOL_RETRY_ATTEMPTS, TOOL_RETRY_BASE_DELAY, TOOL_RETRY_MAX_DELAY,
+    SESSION_RETRY_ATTEMPTS, SESSION_RETRY_BASE_DELAY, SESSION_RETRY_MAX_DELAY,
+)
+from circuit_breaker import CircuitOpenError
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('retry', 'retry.log')
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with jitter for a single kind of operation"""
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 5.0
+    multiplier: float = 2.0
+    jitter: float = 0.5  # fraction of the delay that is randomized
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+    give_up_on: Tuple[Type[BaseException], ...] = ()
+
+    def delay_for(self, attempt: int) -> float:
+        """Backoff delay before the given retry attempt (1-based)"""
+        delay = min(self.max_delay, self.base_delay * (self.multiplier ** (attempt - 1)))
+        spread = delay * self.jitter
+        return max(0.0, delay - spread + random.random() * 2 * spread)
+
+    def should_retry(self, error: BaseException) -> bool:
+        """Check if an error is considered transient under this policy"""
+        if self.give_up_on and isinstance(error, self.give_up_on):
+            return False
+        return isinstance(error, self.retry_on)
+
+# Argument and validation errors will fail the same way on every attempt, and a tool whose
+# circuit is open is not called again until the breaker lets a probe through
+_PERMANENT_ERRORS = (ValueError, TypeError, KeyError, CircuitOpenError)
+
+LLM_RETRY = RetryPolicy(
+    max_attempts=LLM_RETRY_ATTEMPTS,
+    base_delay=LLM_RETRY_BASE_DELAY,
+    max_delay=LLM_RETRY_MAX_DELAY,
+)
+
+TOOL_RETRY = RetryPolicy(
+    max_attempts=TOOL_RETRY_ATTEMPTS,
+    base_delay=TOOL_RETRY_BASE_DELAY,
+    max_delay=TOOL_RETRY_MAX_DELAY,
+    give_up_on=_PERMANENT_ERRORS,
+)
+
+SESSION_RETRY = RetryPolicy(
+    max_attempts=SESSION_RETRY_ATTEMPTS,
+    base_delay=SESSION_RETRY_BASE_DELAY,
+    max_delay=SESSION_RETRY_MAX_DELAY,
+)
+
+async def retry_async(policy: RetryPolicy, operation: Callable[..., Awaitable[Any]], *args,
+                      name: str = None, **kwargs) -> Any:
+    """Await operation(*args, **kwargs), retrying transient failures according to policy"""
+    name = name or getattr(operation, '__name__', 'operation')
+    attempt = 1
+    while True:
+        try:
+            return await operation(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt >= policy.max_attempts or not policy.should_retry(e):
+                logger.error("%s failed after %s attempt(s): %s", name, attempt, e)
+                raise
+            delay = policy.delay_for(attempt)
+            logger.warning("%s failed on attempt %s/%s: %s; retrying in %.2fs", name, attempt, policy.max_attempts, e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
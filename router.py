@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from mcp import ClientSession, types
+
+from agent_config import IDEMPOTENT_TOOLS, MCP_SHARDS, ROUTER_COOLDOWN, SHARD_GROUPS
+from logger_config import setup_logger
+from transport import open_transport
+
+# Setup logger
+logger = setup_logger('router', 'router.log')
+
+class NoReplicaError(RuntimeError):
+    """No replica exposes the tool, or every replica exposing it is unhealthy"""
+
+class Replica:
+    """One MCP server process of a shard, with its load and health"""
+
+    __slots__ = ('name', 'session', 'tools', 'in_flight', 'calls', 'failures', 'unhealthy_until')
+
+    def __init__(self, name: str, session):
+        self.name = name
+        self.session = session
+        self.tools: List[types.Tool] = []
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+class ToolRouter:
+    """
+    Several MCP server sessions behind the ClientSession interface the agent uses (initialize,
+    list_tools, call_tool). Tools are merged by name; each call goes to the healthy replica
+    exposing the tool with the fewest calls in flight. A replica whose call raises is marked
+    unhealthy for `cooldown` seconds, and calls to idempotent tools are retried on the next one.
+    Tool errors (isError results) are answers, not health problems.
+    """
+
+    def __init__(self, replicas: List[Replica], cooldown: float = ROUTER_COOLDOWN,
+                 failover_tools=IDEMPOTENT_TOOLS):
+        self.replicas = replicas
+        self.cooldown = cooldown
+        self.failover_tools = frozenset(failover_tools)
+        self._routes: Dict[str, List[Replica]] = {}
+        self._tools: List[types.Tool] = []
+        self.stats = {"calls": 0, "failovers": 0}
+
+    async def initialize(self) -> types.InitializeResult:
+        """Initialize every replica and build the routing table from their tool lists"""
+        results = await asyncio.gather(*(replica.session.initialize() for replica in self.replicas))
+        listings = await asyncio.gather(*(replica.session.list_tools() for replica in self.replicas))
+
+        self._routes.clear()
+        merged = {}
+        for replica, listing in zip(self.replicas, listings):
+            replica.tools = listing.tools
+            for tool in listing.tools:
+                merged.setdefault(tool.name, tool)
+                self._routes.setdefault(tool.name, []).append(replica)
+        self._tools = list(merged.values())
+        logger.info("Routing %s tools over %s replicas: %s", len(self._tools), len(self.replicas),
+                    {replica.name: len(replica.tools) for replica in self.replicas})
+
+        # One identity for the whole deployment, so capability snapshots follow the shard layout
+        digest = hashlib.blake2b(digest_size=8)
+        for replica, result in zip(self.replicas, results):
+            digest.update(f"{replica.name}:{result.serverInfo.version};".encode())
+        server_info = results[0].serverInfo.model_copy(update={"version": f"router+{digest.hexdigest()}"})
+        return results[0].model_copy(update={"serverInfo": server_info})
+
+    async def list_tools(self) -> types.ListToolsResult:
+        return types.ListToolsResult(tools=list(self._tools))
+
+    def _pick(self, name: str, exclude=()) -> Replica:
+        """The least-loaded healthy replica exposing a tool; unhealthy ones only if none is healthy"""
+        replicas = [replica for replica in self._routes.get(name, ()) if replica not in exclude]
+        if not replicas:
+            raise NoReplicaError(f"No replica available for tool {name}")
+        now = time.monotonic()
+        healthy = [replica for replica in replicas if replica.healthy(now)]
+        return min(healthy or replicas, key=lambda replica: (replica.in_flight, replica.calls))
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, **kwargs):
+        self.stats["calls"] += 1
+        tried = []
+        while True:
+            replica = self._pick(name, exclude=tried)
+            replica.in_flight += 1
+            replica.calls += 1
+            try:
+                return await replica.session.call_tool(name, arguments=arguments, **kwargs)
+            except Exception as e:
+                replica.failures += 1
+                replica.unhealthy_until = time.monotonic() + self.cooldown
+                tried.append(replica)
+                logger.warning("Replica %s failed on %s: %s", replica.name, name, e)
+                if name not in self.failover_tools or len(tried) >= len(self._routes.get(name, ())):
+                    raise
+                self.stats["failovers"] += 1
+            finally:
+                replica.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "replicas": {
+                replica.name: {
+                    "calls": replica.calls,
+                    "in_flight": replica.in_flight,
+                    "failures": replica.failures,
+                    "healthy": replica.healthy(now),
+                }
+                for replica in self.replicas
+            },
+        }
+
+@asynccontextmanager
+async def open_router(shards: Dict[str, int] = None, env: Dict[str, str] = None):
+    """
+    Start the stdio server processes of each shard group (e.g. {"math": 4, "slides": 1}),
+    each exposing only its group's tools, and yield a ToolRouter over them
+    """
+    shards = shards or MCP_SHARDS
+    base_env = {**os.environ, **(env or {})}
+    async with AsyncExitStack() as stack:
+        replicas = []
+        for group, count in shards.items():
+            if group not in SHARD_GROUPS:
+                raise ValueError(f"Unknown shard group: {group}; choose from {sorted(SHARD_GROUPS)}")
+            shard_env = {**base_env, "MCP_SERVER_TOOLS": ",".join(sorted(SHARD_GROUPS[group]))}
+            for i in range(count):
+                read, write = await stack.enter_async_context(open_transport("stdio", env=shard_env))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                replicas.append(Replica(f"{group}-{i}", session))
+        logger.info("Started %s shard replicas: %s", len(replicas), dict(shards))
+        yield ToolRouter(replicas)
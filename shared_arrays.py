@@ -0,0 +1,214 @@
+import atexit
+import mmap
+import os
+import tempfile
+from array import array
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Iterator, Optional
+
+from agent_config import (
+    SHARED_ARRAYS_ENABLED, SHARED_ARRAY_BACKEND, SHARED_ARRAY_MIN_ITEMS, SHARED_ARRAY_TOOLS
+)
+from logger_config import setup_logger
+
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy the server reads shared arrays as typed memoryviews, still without copying
+    np = None
+
+# Setup logger
+logger = setup_logger('shared_arrays', 'shared_arrays.log')
+
+# Key marking a tool argument as a shared array descriptor instead of a JSON list
+DESCRIPTOR_KEY = "__shared_array__"
+# Optional tool parameter carrying the descriptor; the advertised list parameter is then sent empty
+SHARED_ARRAY_PARAM = "shared_array"
+
+# Element types that can be shared: dtype name -> array typecode
+DTYPES = {"int64": "q", "float64": "d", "uint32": "I"}
+
+def is_descriptor(value: Any) -> bool:
+    return isinstance(value, dict) and DESCRIPTOR_KEY in value
+
+def make_descriptor(backend: str, name: str, dtype: str, count: int, pid: int = None) -> Dict[str, Any]:
+    """Descriptor of `count` values of `dtype` in a shared memory segment or a raw binary file"""
+    return {
+        DESCRIPTOR_KEY: 1,
+        "backend": backend,
+        "name": name,
+        "dtype": dtype,
+        "shape": [count],
+        "pid": pid,
+    }
+
+def _pack(values: list) -> Optional[array]:
+    """Values as a typed array, None if they are not all int64 or all floats"""
+    if all(type(item) is int for item in values):
+        typecode = "q"
+    elif all(type(item) in (int, float) for item in values):
+        typecode = "d"
+    else:
+        return None
+    try:
+        return array(typecode, values)
+    except OverflowError:
+        return None  # integers beyond int64 stay in JSON
+
+class SharedArrayPool:
+    """
+    Client side of the shared array exchange. Large list arguments are written once into a
+    shared memory segment ("shm") or a memory-mapped temporary file ("mmap"), and the tool gets
+    a descriptor (backend, name, dtype, shape) instead of the JSON list. The pool owns every
+    segment it creates and unlinks it when the call is done, or at exit.
+    """
+
+    def __init__(self, enabled: bool = SHARED_ARRAYS_ENABLED, backend: str = SHARED_ARRAY_BACKEND,
+                 min_items: int = SHARED_ARRAY_MIN_ITEMS, tools: Dict[str, str] = None):
+        if backend not in ("shm", "mmap"):
+            raise ValueError(f"Unknown shared array backend: {backend}")
+        self.enabled = enabled
+        self.backend = backend
+        self.min_items = min_items
+        self.tools = dict(SHARED_ARRAY_TOOLS if tools is None else tools)
+        self._segments: Dict[str, Any] = {}
+        self.stats = {"shared": 0, "bytes": 0, "released": 0}
+
+    def share(self, values: list) -> Optional[Dict[str, Any]]:
+        """Place a list in shared memory and return its descriptor, None if it cannot be shared"""
+        packed = _pack(values)
+        if packed is None:
+            return None
+        dtype = "int64" if packed.typecode == "q" else "float64"
+        size = max(1, len(packed) * packed.itemsize)
+
+        if self.backend == "shm":
+            segment = shared_memory.SharedMemory(create=True, size=size)
+            name = segment.name
+            segment.buf[:len(packed) * packed.itemsize] = packed.tobytes()
+        else:
+            fd, name = tempfile.mkstemp(prefix="mcp_array_", suffix=".bin")
+            with os.fdopen(fd, "wb") as f:
+                packed.tofile(f)
+            segment = name
+
+        self._segments[name] = segment
+        self.stats["shared"] += 1
+        self.stats["bytes"] += size
+        logger.debug("Shared %s %s values in %s %s", len(packed), dtype, self.backend, name)
+        return make_descriptor(self.backend, name, dtype, len(packed), os.getpid())
+
+    def release(self, descriptor: Dict[str, Any]):
+        """Free the memory behind a descriptor created by this pool"""
+        segment = self._segments.pop(descriptor["name"], None)
+        if segment is None:
+            return
+        try:
+            if isinstance(segment, str):
+                os.remove(segment)
+            else:
+                segment.close()
+                segment.unlink()
+        except (OSError, BufferError) as e:
+            logger.warning("Could not release shared array %s: %s", descriptor["name"], e)
+        self.stats["released"] += 1
+
+    @contextmanager
+    def share_arguments(self, tool: str, arguments: Optional[Dict[str, Any]]) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Arguments of one tool call with its large array parameter emptied and the descriptor in
+        SHARED_ARRAY_PARAM; the shared memory is released when the call is done.
+        """
+        param = self.tools.get(tool) if self.enabled else None
+        values = arguments.get(param) if param and arguments else None
+        descriptor = None
+        if isinstance(values, list) and len(values) >= self.min_items:
+            descriptor = self.share(values)
+        if descriptor is None:
+            yield arguments
+            return
+        try:
+            yield {**arguments, param: [], SHARED_ARRAY_PARAM: descriptor}
+        finally:
+            self.release(descriptor)
+
+    def close(self):
+        """Release every segment still owned by the pool"""
+        for name in list(self._segments):
+            self.release({"name": name})
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+def _attach(descriptor: Dict[str, Any]):
+    """(view, close) for a descriptor: a NumPy array (or typed memoryview) over the shared bytes"""
+    dtype = descriptor["dtype"]
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported shared array dtype: {dtype}")
+    count = int(descriptor["shape"][0])
+    nbytes = count * array(DTYPES[dtype]).itemsize
+
+    if descriptor["backend"] == "shm":
+        segment = shared_memory.SharedMemory(name=descriptor["name"])
+        if descriptor.get("pid") != os.getpid():
+            # Only the creating process owns the segment; stop this process's tracker unlinking it at exit
+            resource_tracker.unregister(segment._name, "shared_memory")
+        buffer, close = segment.buf, segment.close
+    elif descriptor["backend"] == "mmap":
+        if not nbytes:
+            return array(DTYPES[dtype]), lambda: None  # empty files cannot be mapped
+        with open(descriptor["name"], "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapped)
+
+        def close():
+            buffer.release()
+            mapped.close()
+    else:
+        raise ValueError(f"Unknown shared array backend: {descriptor['backend']}")
+
+    if np is not None:
+        view = np.frombuffer(buffer, dtype=dtype, count=count)
+    else:
+        view = buffer[:nbytes].cast(DTYPES[dtype])
+    return view, close
+
+def read_array(value: Any, reader):
+    """
+    Apply `reader` to an array argument: a plain list is passed through, a shared array descriptor
+    is attached as a zero-copy view for the duration of the call. `reader` must not keep the view.
+    """
+    if not is_descriptor(value):
+        return reader(value)
+    view, close = _attach(value)
+    try:
+        return reader(view)
+    finally:
+        del view
+        close()
+
+def exact_sum(values) -> Any:
+    """
+    Sum of a list or a shared array view, equal to sum() of the same values as a JSON list.
+    Integer views are summed in int64 only where no partial sum can overflow.
+    """
+    if np is None or not isinstance(values, np.ndarray) or not len(values):
+        return sum(values)
+    if values.dtype.kind in "iu":
+        bound = max(abs(int(values.min())), abs(int(values.max())))
+        if bound * len(values) < 2 ** 63:
+            return int(values.sum(dtype=np.int64))
+        return sum(map(int, values))  # Python ints: exact at any size
+    # Left to right like sum(), not NumPy's pairwise summation
+    return sum(values.tolist())
+
+_default_pool = None
+
+def get_shared_array_pool() -> SharedArrayPool:
+    """Process-wide shared array pool; its segments are released at exit"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = SharedArrayPool()
+        atexit.register(_default_pool.close)
+    return _default_pool
@@ -0,0 +1,266 @@
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from html import escape
+from typing import List, Optional, Tuple
+
+from lxml import etree
+from PIL import Image, ImageDraw, ImageFont
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from pptx.enum.text import MSO_ANCHOR, PP_ALIGN
+from pptx.util import Emu
+
+from agent_config import SLIDE_RENDER_CACHE_SIZE, SLIDE_RENDER_DPI
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('slide_renderer', 'slide_renderer.log')
+
+EMU_PER_INCH = 914400
+DEFAULT_FONT_PT = 18
+# Fill and outline of shapes without explicit formatting (the default theme's accent color)
+DEFAULT_FILL = (68, 114, 196)
+DEFAULT_LINE = (47, 82, 143)
+
+_FONT_FILES = {
+    False: ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf"),
+    True: ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf"),
+}
+_FONT_DIRS = ("/usr/share/fonts/truetype/dejavu", "/usr/share/fonts/dejavu", "/Library/Fonts",
+              "C:\\Windows\\Fonts")
+
+class TextLine:
+    """One rendered line of a text frame"""
+    __slots__ = ('text', 'size_px', 'bold', 'color', 'align')
+
+    def __init__(self, text: str, size_px: float, bold: bool, color: tuple, align: str):
+        self.text = text
+        self.size_px = size_px
+        self.bold = bold
+        self.color = color
+        self.align = align
+
+class ShapeBox:
+    """Geometry, fill, outline and text of one shape, in pixels"""
+    __slots__ = ('left', 'top', 'width', 'height', 'fill', 'line', 'line_width', 'lines', 'anchor', 'wrap')
+
+    def __init__(self, left, top, width, height):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.fill = None
+        self.line = None
+        self.line_width = 0
+        self.lines: List[TextLine] = []
+        self.anchor = 'top'
+        self.wrap = True
+
+def _rgb(color_format) -> Optional[tuple]:
+    """RGB tuple of a python-pptx color, None if it is not an explicit RGB color"""
+    try:
+        rgb = color_format.rgb
+    except (AttributeError, TypeError):
+        return None
+    return None if rgb is None else (rgb[0], rgb[1], rgb[2])
+
+_ALIGN = {PP_ALIGN.CENTER: 'center', PP_ALIGN.RIGHT: 'right'}
+_ANCHOR = {MSO_ANCHOR.MIDDLE: 'middle', MSO_ANCHOR.BOTTOM: 'bottom'}
+
+class SlideRenderer:
+    """
+    Rasterizes the rectangles and text boxes written by mcp-server.py to PNG (with PIL) or SVG,
+    without an office suite. Renders are cached by a hash of the slide XML, so previewing an
+    unchanged slide again is a dictionary lookup.
+    """
+
+    def __init__(self, dpi: int = SLIDE_RENDER_DPI, cache_size: int = SLIDE_RENDER_CACHE_SIZE):
+        self.dpi = dpi
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._fonts = {}
+        self.stats = {"renders": 0, "hits": 0}
+
+    def render_file(self, path: str, index: int = 0, fmt: str = 'png') -> bytes:
+        """Render slide `index` of a .pptx file"""
+        return self.render(Presentation(path), index, fmt)
+
+    def render(self, prs, index: int = 0, fmt: str = 'png') -> bytes:
+        """Render slide `index` of an open presentation as PNG or SVG bytes"""
+        if fmt not in ('png', 'svg'):
+            raise ValueError(f"Unsupported format: {fmt}")
+        slide = prs.slides[index]
+        key = self.content_hash(prs, slide, fmt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return cached
+
+        width, height = self._px(prs.slide_width), self._px(prs.slide_height)
+        boxes = [box for box in (self._shape_box(shape) for shape in slide.shapes) if box is not None]
+        data = self._render_png(width, height, boxes) if fmt == 'png' else self._render_svg(width, height, boxes)
+        self.stats["renders"] += 1
+        self._cache[key] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        logger.debug("Rendered slide %s as %s: %s shapes, %s bytes", index, fmt, len(boxes), len(data))
+        return data
+
+    def content_hash(self, prs, slide, fmt: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{fmt}:{self.dpi}:{prs.slide_width}x{prs.slide_height}:".encode())
+        digest.update(etree.tostring(slide._element))
+        return digest.hexdigest()
+
+    def _px(self, emu) -> int:
+        return round(Emu(emu or 0) * self.dpi / EMU_PER_INCH)
+
+    def _shape_box(self, shape) -> Optional[ShapeBox]:
+        if shape.width is None or shape.height is None:
+            return None
+        box = ShapeBox(self._px(shape.left), self._px(shape.top), self._px(shape.width), self._px(shape.height))
+
+        if shape.shape_type == MSO_SHAPE_TYPE.AUTO_SHAPE:
+            box.fill = DEFAULT_FILL
+            box.line = DEFAULT_LINE
+            box.line_width = max(1, round(self.dpi / 96))
+            if shape.fill.type is not None:
+                box.fill = _rgb(shape.fill.fore_color) if shape.fill.type == 1 else None  # MSO_FILL.SOLID
+            line_color = _rgb(shape.line.color) if shape.line.fill.type is not None else None
+            if line_color is not None:
+                box.line = line_color
+            if shape.line.width:
+                box.line_width = max(1, self._px(shape.line.width))
+
+        if shape.has_text_frame:
+            frame = shape.text_frame
+            box.anchor = _ANCHOR.get(frame.vertical_anchor, 'top')
+            box.wrap = frame.word_wrap is not False
+            for paragraph in frame.paragraphs:
+                runs = paragraph.runs
+                font = runs[0].font if runs else paragraph.font
+                size_px = (font.size.pt if font.size else DEFAULT_FONT_PT) * self.dpi / 72
+                color = _rgb(font.color) or (0, 0, 0)
+                align = _ALIGN.get(paragraph.alignment, 'left')
+                # Line breaks (<a:br/>, "\v" in paragraph.text) start new lines with the same formatting
+                for part in paragraph.text.split('\v'):
+                    box.lines.append(TextLine(part, size_px, bool(font.bold), color, align))
+            while box.lines and not box.lines[-1].text:
+                box.lines.pop()
+            while box.lines and not box.lines[0].text:
+                box.lines.pop(0)
+
+        if box.fill is None and box.line is None and not box.lines:
+            return None  # e.g. an empty placeholder
+        return box
+
+    def _font(self, size_px: float, bold: bool):
+        key = (round(size_px), bold)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._load_font(*key)
+            self._fonts[key] = font
+        return font
+
+    @staticmethod
+    def _load_font(size: int, bold: bool):
+        for name in _FONT_FILES[bold]:
+            for directory in ("",) + _FONT_DIRS:
+                try:
+                    return ImageFont.truetype(os.path.join(directory, name) if directory else name, size)
+                except OSError:
+                    continue
+        return ImageFont.load_default(size)
+
+    def _wrap(self, line: TextLine, width: int) -> List[str]:
+        font = self._font(line.size_px, line.bold)
+        words = line.text.split(' ')
+        wrapped, current = [], ''
+        for word in words:
+            candidate = f"{current} {word}" if current else word
+            if current and font.getlength(candidate) > width:
+                wrapped.append(current)
+                current = word
+            else:
+                current = candidate
+        wrapped.append(current)
+        return wrapped
+
+    def _layout(self, box: ShapeBox) -> List[Tuple[TextLine, str, float, float]]:
+        """(line, text, x anchor, baseline-free top y) of every wrapped text line in a box"""
+        inset = self.dpi * 0.1  # default text frame insets, 0.1 inch
+        inner_width = max(1, box.width - 2 * inset)
+        rows = []
+        for line in box.lines:
+            parts = self._wrap(line, inner_width) if box.wrap else [line.text]
+            rows.extend((line, part) for part in parts)
+        heights = [line.size_px * 1.2 for line, _ in rows]
+        total = sum(heights)
+        if box.anchor == 'middle':
+            y = box.top + (box.height - total) / 2
+        elif box.anchor == 'bottom':
+            y = box.top + box.height - inset - total
+        else:
+            y = box.top + inset
+        laid_out = []
+        for (line, text), height in zip(rows, heights):
+            if line.align == 'center':
+                x = box.left + box.width / 2
+            elif line.align == 'right':
+                x = box.left + box.width - inset
+            else:
+                x = box.left + inset
+            laid_out.append((line, text, x, y))
+            y += height
+        return laid_out
+
+    def _render_png(self, width: int, height: int, boxes: List[ShapeBox]) -> bytes:
+        image = Image.new('RGB', (width, height), (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        for box in boxes:
+            if box.fill is not None or box.line is not None:
+                draw.rectangle(
+                    (box.left, box.top, box.left + box.width, box.top + box.height),
+                    fill=box.fill, outline=box.line, width=box.line_width if box.line is not None else 0
+                )
+            for line, text, x, y in self._layout(box):
+                anchor = {'center': 'ma', 'right': 'ra'}.get(line.align, 'la')
+                draw.text((x, y), text, fill=line.color, font=self._font(line.size_px, line.bold), anchor=anchor)
+        output = io.BytesIO()
+        image.save(output, format='PNG', optimize=False)
+        return output.getvalue()
+
+    def _render_svg(self, width: int, height: int, boxes: List[ShapeBox]) -> bytes:
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                 f'viewBox="0 0 {width} {height}">',
+                 f'<rect width="{width}" height="{height}" fill="#ffffff"/>']
+        for box in boxes:
+            if box.fill is not None or box.line is not None:
+                fill = '#%02x%02x%02x' % box.fill if box.fill is not None else 'none'
+                stroke = (f' stroke="#%02x%02x%02x" stroke-width="{box.line_width}"' % box.line
+                          if box.line is not None else '')
+                parts.append(f'<rect x="{box.left}" y="{box.top}" width="{box.width}" height="{box.height}" '
+                             f'fill="{fill}"{stroke}/>')
+            for line, text, x, y in self._layout(box):
+                anchor = {'center': 'middle', 'right': 'end'}.get(line.align, 'start')
+                weight = ' font-weight="bold"' if line.bold else ''
+                parts.append(f'<text x="{x:.1f}" y="{y + line.size_px:.1f}" font-family="DejaVu Sans, Arial, sans-serif" '
+                             f'font-size="{line.size_px:.1f}"{weight} fill="#%02x%02x%02x" text-anchor="{anchor}">'
+                             % line.color + f'{escape(text)}</text>')
+        parts.append('</svg>')
+        return '\n'.join(parts).encode()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+_default_renderer = None
+
+def get_slide_renderer() -> SlideRenderer:
+    """Process-wide slide renderer, so its cache is shared by all callers"""
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = SlideRenderer()
+    return _default_renderer
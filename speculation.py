@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from agent_config import PURE_TOOLS, SPECULATION_ENABLED
+from logger_config import setup_logger
+from results import args_hash
+
+# Setup logger
+logger = setup_logger('speculation', 'speculation.log')
+
+class Speculation:
+    """A predicted tool call started ahead of the LLM's answer"""
+    __slots__ = ('tool', 'args_hash', 'task', 'started_at', 'finished_at')
+
+    def __init__(self, tool: str, arguments: Dict[str, Any], task: asyncio.Task):
+        self.tool = tool
+        self.args_hash = args_hash(arguments)
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+class Speculator:
+    """
+    Starts the predicted next call of a pure tool while the LLM is thinking. The call goes through
+    the action layer's tool call cache, so when the model asks for the same call its real
+    execution joins the in-flight request or hits the cached result. A wrong prediction is left
+    to finish in the background and its result is simply not used; pure tools have no side effects.
+    """
+
+    def __init__(self, enabled: bool = SPECULATION_ENABLED, pure_tools=PURE_TOOLS):
+        self.enabled = enabled
+        self.pure_tools = frozenset(pure_tools)
+        self._pending: Optional[Speculation] = None
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "failed": 0, "time_saved": 0.0}
+
+    def start(self, action, tool: str, params: Dict[str, Any]) -> bool:
+        """Start a predicted call; returns False if it cannot be run speculatively"""
+        self.discard()
+        if not self.enabled or tool not in self.pure_tools:
+            return False
+        try:
+            arguments = action.prepare_arguments(tool, params)
+        except ValueError as e:
+            logger.debug("Not speculating on %s: %s", tool, e)
+            return False
+
+        task = asyncio.ensure_future(action._call_tool(tool, arguments))
+        speculation = Speculation(tool, arguments, task)
+        task.add_done_callback(lambda t: self._finished(speculation, t))
+        self._pending = speculation
+        self.stats["started"] += 1
+        logger.info("Speculatively calling %s", tool)
+        return True
+
+    def _finished(self, speculation: Speculation, task: asyncio.Task):
+        speculation.finished_at = time.perf_counter()
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["failed"] += 1
+            logger.warning("Speculative call to %s failed: %s", speculation.tool, task.exception())
+
+    def resolve(self, action, response_json) -> bool:
+        """Compare the model's action with the prediction; True if the speculative call is used"""
+        speculation, self._pending = self._pending, None
+        if speculation is None:
+            return False
+        matched = False
+        if response_json.type == 'function_call' and response_json.function == speculation.tool:
+            try:
+                arguments = action.prepare_arguments(response_json.function, response_json.params)
+                matched = args_hash(arguments) == speculation.args_hash
+            except ValueError:
+                pass
+
+        if not matched:
+            self.stats["misses"] += 1
+            logger.info("Speculation on %s discarded, the model chose differently", speculation.tool)
+            return False
+        # Only the part of the call that overlapped the LLM call is saved
+        saved = (speculation.finished_at or time.perf_counter()) - speculation.started_at
+        self.stats["hits"] += 1
+        self.stats["time_saved"] += saved
+        logger.info("Speculation on %s committed, %.3fs of tool time overlapped the LLM", speculation.tool, saved)
+        return True
+
+    def discard(self):
+        """Drop a pending prediction without using it (e.g. the LLM call failed)"""
+        if self._pending is not None:
+            self.stats["misses"] += 1
+            self._pending = None
+
+    @property
+    def hit_rate(self) -> float:
+        resolved = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / resolved if resolved else 0.0
@@ -0,0 +1,39 @@
+"""Smoke test of the agent loop: run_session against the in-process server with a scripted model"""
+import asyncio
+import os
+import sys
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MCP_HEADLESS", "1")
+os.environ.setdefault("GEMINI_API_KEY", "smoke-test")
+pytest.importorskip("google.genai")
+
+import agent
+import transport
+from bench_planner import QUERY, ScriptedModel
+from memory import Memory
+
+def test_run_session_reaches_final_answer(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # the slide tools write presentation.pptx to the working directory
+    memory = Memory("smoke-test")
+    model = ScriptedModel(memory, latency=0.0)
+
+    async def fake_llm(client, prompt, timeout=10):
+        return SimpleNamespace(text=await model.respond())
+
+    monkeypatch.setattr(agent, "generate_with_timeout", fake_llm)
+    monkeypatch.setattr(agent, "open_session", partial(transport.open_session, "memory"))
+    monkeypatch.setattr(agent, "MCP_SHARDS", {})
+    monkeypatch.setattr(agent, "load_snapshot", lambda server_info: None)
+    monkeypatch.setattr(agent, "save_snapshot", lambda *args, **kwargs: None)
+
+    asyncio.run(agent.run_session(memory, QUERY))
+
+    responses = memory.iteration_responses
+    assert responses and responses[-1].startswith("Final answer:")
+    assert memory.results.latest('int_list_to_exponential_sum', run_id=memory.run_id) is not None
+    assert model.calls >= 1
@@ -0,0 +1,40 @@
+"""List tools over the in-process server: float lists, as JSON and as shared arrays"""
+import asyncio
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MCP_HEADLESS", "1")
+
+from mcp import ClientSession
+
+from shared_arrays import SharedArrayPool, np
+from transport import open_transport
+
+FLOATS = [1.5, 2.25, -0.125, 1e10]
+
+async def call(pool: SharedArrayPool, tool: str, arguments: dict):
+    async with open_transport("memory") as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            with pool.share_arguments(tool, arguments) as shared:
+                return await session.call_tool(tool, arguments=shared)
+
+POOLS = [pytest.param(SharedArrayPool(enabled=False), id="json")]
+if np is not None:
+    POOLS.append(pytest.param(SharedArrayPool(enabled=True, backend="mmap", min_items=0), id="shared"))
+
+@pytest.mark.parametrize("pool", POOLS)
+def test_add_list_accepts_floats(pool):
+    result = asyncio.run(call(pool, "add_list", {"l": FLOATS}))
+    assert not result.isError, result.content[0].text
+    assert float(result.content[0].text) == sum(FLOATS)
+
+@pytest.mark.parametrize("pool", POOLS)
+def test_exponential_sum_accepts_floats(pool):
+    result = asyncio.run(call(pool, "int_list_to_exponential_sum", {"int_list": FLOATS[:3]}))
+    assert not result.isError, result.content[0].text
+    assert float(result.content[0].text) == sum(math.exp(x) for x in FLOATS[:3])
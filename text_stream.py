@@ -0,0 +1,114 @@
+import glob
+import math
+import os
+import tempfile
+from array import array
+from collections import Counter
+from typing import IO, Iterable, Iterator, Optional, Union
+
+from agent_config import TEXT_STREAM_CHUNK_CHARS, TEXT_STREAM_SCRATCH_DIR, TEXT_STREAM_SCRATCH_KEEP
+from logger_config import setup_logger
+
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy the histogram is counted per character with Counter, which is slower
+    np = None
+
+# Setup logger
+logger = setup_logger('text_stream', 'text_stream.log')
+
+# Code points are stored as unsigned 32-bit integers ("uint32" in shared array descriptors)
+CODE_POINT_TYPECODE = 'I'
+
+# math.exp of every code point with a finite exponential (0..709), looked up instead of recomputed
+_EXP = [math.exp(code) for code in range(710)]
+
+def read_chunks(source: Union[str, IO[str]], chunk_size: int = TEXT_STREAM_CHUNK_CHARS) -> Iterator[str]:
+    """Text of a file path or an open text handle, chunk_size characters at a time"""
+    if isinstance(source, str):
+        # newline='' keeps \r\n as two characters, like the string would have
+        with open(source, 'r', encoding='utf-8', newline='') as handle:
+            yield from read_chunks(handle, chunk_size)
+        return
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def to_code_points(chunk: str) -> array:
+    """Code points of a text chunk as a compact array, converted in C rather than with ord()"""
+    codes = array(CODE_POINT_TYPECODE)
+    codes.frombytes(chunk.encode('utf-32-le'))
+    return codes
+
+def code_point_chunks(chunks: Iterable[str]) -> Iterator[array]:
+    """Each text chunk as an array of code points"""
+    return map(to_code_points, chunks)
+
+class CodePointSummary:
+    """Aggregates over a stream of code point chunks, so the full list is never built"""
+
+    def __init__(self, histogram: bool = True, exponential_sum: bool = True):
+        self.count = 0
+        self.histogram = Counter() if histogram else None
+        self.exponential_sum = 0 if exponential_sum else None
+        self.overflow = False
+
+    def update(self, chunk: str, codes: array):
+        self.count += len(codes)
+        if self.histogram is not None:
+            if np is not None:
+                values, counts = np.unique(np.frombuffer(codes, dtype=np.uint32), return_counts=True)
+                self.histogram.update(dict(zip(values.tolist(), counts.tolist())))
+            else:
+                self.histogram.update(map(ord, chunk))
+        if self.exponential_sum is not None and not self.overflow:
+            try:
+                # Summed in order from the running total: the same float as int_list_to_exponential_sum
+                self.exponential_sum = sum(map(_EXP.__getitem__, codes), self.exponential_sum)
+            except IndexError:
+                self.overflow = True  # a code point above 709 has no finite exponential
+
+    def as_dict(self) -> dict:
+        summary = {"count": self.count}
+        if self.histogram is not None:
+            summary["histogram"] = dict(sorted(self.histogram.items()))
+        if self.exponential_sum is not None:
+            summary["exponential_sum"] = None if self.overflow else float(self.exponential_sum)
+        return summary
+
+def stream_code_points(source: Union[str, IO[str]], output: Optional[IO[bytes]] = None,
+                       histogram: bool = True, exponential_sum: bool = True,
+                       chunk_size: int = TEXT_STREAM_CHUNK_CHARS) -> dict:
+    """
+    Convert a text file or handle to code points chunk by chunk. The code points are written to
+    `output` as raw uint32 values if given, and the requested aggregates are returned.
+    Memory use depends on the chunk size, not on the size of the input.
+    """
+    summary = CodePointSummary(histogram, exponential_sum)
+    for chunk in read_chunks(source, chunk_size):
+        codes = to_code_points(chunk)
+        summary.update(chunk, codes)
+        if output is not None:
+            codes.tofile(output)
+    logger.debug("Streamed %s code points", summary.count)
+    return summary.as_dict()
+
+def scratch_output_path(directory: str = TEXT_STREAM_SCRATCH_DIR, keep: int = TEXT_STREAM_SCRATCH_KEEP) -> str:
+    """
+    New file for code points in the scratch directory. Its name is unique, so a descriptor of it
+    never refers to different values; all but the newest `keep` files are deleted.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='codes_', suffix='.bin', dir=directory)
+    os.close(fd)
+    outputs = sorted(glob.glob(os.path.join(directory, 'codes_*.bin')), key=os.path.getmtime)
+    for old in outputs[:-keep] if keep > 0 else []:
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from agent_config import IDEMPOTENT_TOOLS, PURE_TOOLS, TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_TTL
+from logger_config import setup_logger
+from results import args_hash
+
+# Setup logger
+logger = setup_logger('tool_cache', 'tool_cache.log')
+
+class ToolCallCache:
+    """
+    Agent-side de-duplication of tool calls, shared by all sessions of the process.
+    Concurrent identical calls to idempotent tools are collapsed into one in-flight request
+    (singleflight; if the caller that started the call is cancelled, a waiter calls again), and
+    successful results of pure tools are kept with LRU and TTL eviction.
+    Calls to other tools always go to the server.
+    """
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, ttl: float = TOOL_CACHE_TTL,
+                 pure_tools=PURE_TOOLS, shared_tools=IDEMPOTENT_TOOLS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.pure_tools = frozenset(pure_tools)
+        self.shared_tools = frozenset(shared_tools) | self.pure_tools
+        self._results: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, result)
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.stats = {"calls": 0, "hits": 0, "coalesced": 0, "misses": 0, "evictions": 0}
+
+    async def call(self, tool: str, arguments: Optional[Dict[str, Any]],
+                   fetch: Callable[..., Awaitable[Any]]) -> Any:
+        """Result of tool(arguments), calling fetch(tool, arguments) only when needed"""
+        self.stats["calls"] += 1
+        if tool not in self.shared_tools:
+            return await fetch(tool, arguments)
+
+        key = (tool, args_hash(arguments))
+        while True:
+            cached = self._get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                logger.debug("Cache hit for %s", tool)
+                return cached
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.stats["coalesced"] += 1
+            logger.debug("Joining in-flight call to %s", tool)
+            try:
+                # Shielded: a cancelled waiter must not cancel the call the others are waiting for
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The caller that started the call was cancelled; the waiters take it over
+                logger.debug("In-flight call to %s was cancelled, calling again", tool)
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fetch(tool, arguments)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so an unawaited failure is not reported again
+            raise
+        else:
+            future.set_result(result)
+            if tool in self.pure_tools and not getattr(result, 'isError', False):
+                self._put(key, result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def _get(self, key: tuple) -> Any:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._results[key]
+            self.stats["evictions"] += 1
+            return None
+        self._results.move_to_end(key)
+        return result
+
+    def _put(self, key: tuple, result: Any):
+        self._results.pop(key, None)
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def clear(self):
+        self._results.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+_default_cache = None
+
+def get_tool_cache() -> ToolCallCache:
+    """Process-wide tool call cache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ToolCallCache()
+    return _default_cache
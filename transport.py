@@ -0,0 +1,84 @@
+import importlib.util
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_client_server_memory_streams
+
+from agent_config import MCP_TRANSPORT, MCP_SERVER_SCRIPT, MCP_SERVER_URL
+from logger_config import setup_logger
+
+# Setup logger
+logger = setup_logger('transport', 'transport.log')
+
+_server_module = None
+
+def load_server_module(script_path: str = MCP_SERVER_SCRIPT):
+    """Import mcp-server.py as a module (the file name is not a valid identifier)"""
+    global _server_module
+    if _server_module is None:
+        logger.info("Importing MCP server in-process from %s", script_path)
+        spec = importlib.util.spec_from_file_location("mcp_server", script_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["mcp_server"] = module
+        spec.loader.exec_module(module)
+        _server_module = module
+    return _server_module
+
+@asynccontextmanager
+async def memory_client(server=None):
+    """
+    Run a FastMCP server in the current event loop and yield (read, write)
+    streams connected to it, mirroring the interface of stdio_client
+    """
+    if server is None:
+        server = load_server_module().mcp
+    low_level_server = server._mcp_server
+
+    async with create_client_server_memory_streams() as (client_streams, server_streams):
+        server_read, server_write = server_streams
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(
+                lambda: low_level_server.run(
+                    server_read,
+                    server_write,
+                    low_level_server.create_initialization_options()
+                )
+            )
+            try:
+                logger.info("In-process MCP server started")
+                yield client_streams
+            finally:
+                tg.cancel_scope.cancel()
+                logger.info("In-process MCP server stopped")
+
+def open_transport(transport: str = None, env: dict = None, url: str = None):
+    """
+    Return an async context manager yielding (read, write) streams for the configured transport.
+    A stdio server process inherits this process's environment (PROFILE_*, MCP_HEADLESS, LOG_*)
+    updated with `env`; `url` overrides MCP_SERVER_URL for the sse transport.
+    """
+    transport = (transport or MCP_TRANSPORT).lower()
+    if transport == "memory":
+        return memory_client()
+    if transport == "stdio":
+        server_params = StdioServerParameters(
+            command="python",
+            args=[MCP_SERVER_SCRIPT, "dev"],
+            env={**os.environ, **(env or {})}
+        )
+        return stdio_client(server_params)
+    if transport == "sse":
+        return sse_client(url or MCP_SERVER_URL)
+    raise ValueError(f"Unknown MCP transport: {transport}")
+
+@asynccontextmanager
+async def open_session(transport: str = None):
+    """ClientSession (not yet initialized) over the configured transport"""
+    async with open_transport(transport) as (read, write):
+        async with ClientSession(read, write) as session:
+            yield session